@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+"""@package FormatParseBenchmark Teledyne LeCroy quantumdata Python API
+benchmark for parsing video format parameters"""
+
+# Copyright (c) 2019 Teledyne LeCroy, Inc.
+
+## @file FormatParseBenchmark.py
+## @brief Times parsing received format output and converting parameters
+
+# This program doesn't need a quantumdata instrument. It times the work
+# getReceivedFormat does with the instrument output, and the conversion of
+# parameters to codes done by updateFormatParameters. The earlier way of
+# creating and parsing parameters, scanning the list of tags, is timed
+# alongside for comparison
+
+# You'll need to set your PYTHONPATH or append to sys.path
+# sys.path.append('fully qualified path to wherever lib is installed')
+
+from __future__ import print_function
+from tlqd import *
+from timeit import timeit
+
+# Make received format output with every parameter in it
+lines = []
+for tag in TLqdVideoFormatParameters.tags:
+    if tag.type == float:
+        lines.append(tag.shortTag + ': 148.5')
+    else:
+        lines.append(tag.shortTag + ': 1')
+output = '\n'.join(lines)
+
+# parseFormat only needs the instrument object, not a connection
+qdDev = TLqdInstrument.__new__(TLqdInstrument)
+params = qdDev.parseFormat(output)
+
+def createByScan():
+    # Setting each tag in turn, as parameters used to be created
+    ret = TLqdVideoFormatParameters.__new__(TLqdVideoFormatParameters)
+    for tag in TLqdVideoFormatParameters.tags:
+        ret.__dict__[tag.longTag] = None
+    return ret
+
+def parseByScan():
+    # Looking each line up in the list of tags, as parseFormat used to
+    ret = createByScan()
+    sep = ': '
+    for entry in output.split('\n'):
+        pos = entry.find(sep)
+        if pos > 0:
+            key = entry[:pos]
+            value = entry[pos+len(sep):]
+            for tag in TLqdVideoFormatParameters.tags:
+                if tag.shortTag == key:
+                    ret.__dict__[tag.longTag] = tag.type(value)
+    return ret
+
+# Parameters with enumerated types, such as polarities and color spaces,
+# go through the type checks in getCode
+enumerated = []
+for tag in TLqdVideoFormatParameters.tags:
+    value = params.__dict__[tag.longTag]
+    if value is not None and tag.type != int and tag.type != float:
+        enumerated.append((tag.type, value))
+
+def getCodes():
+    for tag in TLqdVideoFormatParameters.tags:
+        value = params.__dict__[tag.longTag]
+        if value is not None:
+            params.getCode(tag.type, value)
+
+def getEnumeratedCodes():
+    for type, value in enumerated:
+        params.getCode(type, value)
+
+count = 10000
+for name, function in [('Creating by tag scan', createByScan),
+                       ('TLqdVideoFormatParameters()',
+                        TLqdVideoFormatParameters),
+                       ('Parsing by tag scan', parseByScan),
+                       ('parseFormat', lambda: qdDev.parseFormat(output)),
+                       ('getCode for every parameter', getCodes),
+                       ('getCode for enumerated types', getEnumeratedCodes)]:
+    seconds = timeit(function, number=count)
+    print('%-30s %8.1f us' % (name, seconds / count * 1e6))
@@ -6,7 +6,13 @@
 @file tlqd.py
 @brief API library for a Teledyne LeCroy quantumdata instrument
 
-Interface class for a Teledyne LeCroy quantumdata instrument"""
+Interface class for a Teledyne LeCroy quantumdata instrument
+
+Capture artifacts are transferred as the instrument writes them; the
+library has no description of their binary formats. TLqdCaptureReader
+maps files whose fixed-size record layout the caller gives it, but
+doesn't decode packets, data islands or control periods. For those, use
+the instrument's own interpretation with capture(interpret=True)."""
 
 import sys
 
@@ -362,6 +368,28 @@ class TLqdInstrument(object):
         self.connected = False
         ## @param cardUsed Card in use
         self.cardUsed = None
+        ## @param timing Seconds spent in each test phase since last cleared
+        self.timing = {}
+        ## @param sharedOptions Test options for files already uploaded by
+        # runAllSteps
+        self.sharedOptions = ''
+        ## @param dpSteps TLqdStep list of the last DP compliance test
+        self.dpSteps = []
+        ## @param dpBatch TLqdDpBatch in progress, or None
+        self.dpBatch = None
+        ## @param captureMemory Capture memory of a card in bytes, used to
+        # turn a capture size into a percentage
+        self.captureMemory = None
+        ## @param frameBuffer Buffer reused by grabFrame
+        self.frameBuffer = None
+        ## @param formatSnapshot Format parameter codes by tag, as last set
+        # by updateFormatParameters with diff, or None when not known
+        self.formatSnapshot = None
+        ## @param videoDigests MD5 digests of capture images, by (path,
+        # size, modification time), used by saveVideoImage
+        self.videoDigests = {}
+        ## @param videoImage Capture image last uploaded by saveVideoImage
+        self.videoImage = None
 
         ## @param i2crVerb Verb to read I2C
         self.i2crVerb = 'i2cr'
@@ -417,6 +445,56 @@ class TLqdInstrument(object):
         return self.strip(self.strip(result, self.prompt, allOc=True),
                           cmd).rstrip('\n') # Toss trailing NLs
 
+    ## Seconds commandBurst waits without new output before giving up
+    burstTimeout = 10
+
+    ## @cond
+    def commandBurst(self, cmds):
+
+        """Send several commands at once, then read all their output
+
+        Raises RuntimeError when the instrument stops sending output before
+        every command has returned a prompt
+
+        @param self The TLqdInstrument object
+        @param cmds List of commands to send
+        @return list of string output, one per command"""
+
+        from time import time
+
+        if len(self.prompt) == 0 or len(cmds) < 2:
+            return [self.command(cmd) for cmd in cmds]
+
+        cmds = [cmd.rstrip('\n') + '\n' for cmd in cmds]
+        self.channel.send(''.join(cmds).encode('utf-8'))
+
+        result = ""
+        lastInput = time()
+        noSpaceTag = 'ERROR: Very Low Storage Space'
+        while result.count(self.prompt) < len(cmds):
+            latest = self.receive()
+
+            # Check for disk space issue, which can span two reads
+            start = max(len(result) - len(noSpaceTag), 0)
+            if (result[start:] + latest).find(noSpaceTag) >= 0:
+                self.close()
+                raise RuntimeError(noSpaceTag)
+
+            if len(latest):
+                lastInput = time()
+            elif time() - lastInput > self.burstTimeout:
+                raise RuntimeError('Output for ' +
+                                   str(result.count(self.prompt)) + ' of ' +
+                                   str(len(cmds)) + ' commands from ' +
+                                   self.ipAddr)
+            result = result + latest
+
+        # Strip the command from each output, as command does
+        outputs = result.split(self.prompt)[:len(cmds)]
+        return [self.strip(output, cmd).rstrip('\n')
+                for output, cmd in zip(outputs, cmds)]
+    ## @endcond
+
     ## @cond
     def strip(self, inp, target, allOc=False):
 
@@ -536,6 +614,30 @@ class TLqdInstrument(object):
             ftp.quit()
             lFile.close()
 
+    def readFile(self, remote):
+
+        """Read a file from the quantumdata instrument via FTP into memory
+
+        @param self the TLqdInstrument object
+        @param remote File name on the quantumdata instrument
+        @return file contents, empty if the file doesn't exist"""
+
+        from ftplib import FTP, error_perm
+        ftp = FTP(self.ipAddr, self.user, self.passwd)
+        ftp.login(self.user, self.passwd)
+
+        data = []
+        try:
+            ftp.retrbinary('RETR ' + remote, data.append)
+        except error_perm:
+            pass
+        ftp.quit()
+
+        ret = b('').join(data)
+        if not isinstance(ret, str):
+            ret = ret.decode('latin-1')
+        return ret
+
     def putFile(self, local, remote=None):
 
         """Put a file on the quantumdata instrument via FTP
@@ -582,7 +684,8 @@ class TLqdInstrument(object):
 
         @param self the TLqdInstrument object
         @param remote Directory name on the quantumdata instrument
-        @param force If set, will remove non-empty directories
+        @param force If set, will remove non-empty directories and everything
+            below them
         @return True if the remote directory was removed"""
 
         from ftplib import FTP
@@ -594,7 +697,7 @@ class TLqdInstrument(object):
             if force:
                 for sub in ftp.nlst(remote):
                     if not self.deleteFile(sub):
-                        self.deleteDirectory(sub)
+                        self.deleteDirectory(sub, True)
 
             ret = ftp.rmd(remote)
         except:
@@ -858,6 +961,7 @@ class TLqdInstrument(object):
         @param vic Video identification code
         @return TLqdResult"""
 
+        self.formatSnapshot = None
         cmd = TLqdApiTag + 'set_format ' + str(name)
         needsSubsampling = False
         if colorSpace:
@@ -887,8 +991,7 @@ class TLqdInstrument(object):
         @return TLqdResult"""
 
         # Transfer the file to the quantumdata instrument
-        RemoteVideoFile = '/tmp/ApiTestvideo.img'
-        self.putFile(localDirectory+ '/video.img', RemoteVideoFile)
+        RemoteVideoFile = self.saveVideoImage(localDirectory + '/video.img')
 
         cmd = TLqdApiTag + 'create_bitmap_or_txt'
         cmd =  cmd + ' -i ' + RemoteVideoFile
@@ -913,6 +1016,125 @@ class TLqdInstrument(object):
 
         return self.compileCommandResult(result)
 
+    def createBitmapsorText(self, frames, mode=None, localDirectory=None,
+                            qdDirectory=None, table=None, stream=None):
+
+        """Create Bitmap or Text files for many video frames
+
+        The capture image is uploaded once, or not at all when the
+        instrument already has it. Each frame is rendered to a
+        "frame<n>" sub-directory, which is transferred and, unless
+        qdDirectory is given, removed from the instrument before the
+        next frame is rendered.
+
+        @param self the TLqdInstrument object
+        @param frames List or range of frame numbers to render
+        @param mode Optional TLqdExportMode
+        @param localDirectory Folder with video.img, where a "frame<n>"
+            folder is created for each frame
+        @param qdDirectory Optional Instrument directory path to render in
+        @param table Optional TLqdResultTable to add a row per frame to
+        @param stream Optional file-like object to stream rows to when no
+            table is given
+        @return TLqdResultTable"""
+
+        import os
+        from time import time
+
+        if table is None:
+            table = TLqdResultTable(['frame'], stream)
+
+        RemoteVideoFile = self.saveVideoImage(localDirectory + '/video.img')
+
+        cmd = TLqdApiTag + 'create_bitmap_or_txt'
+        cmd = cmd + ' -i ' + RemoteVideoFile
+        if mode:
+            cmd = cmd + ' -m ' + str(mode)
+
+        deleteRemote = qdDirectory is None
+        qdDirectory = self.prepareDirectories(localDirectory, qdDirectory)
+        try:
+            for frame in frames:
+                start = time()
+                frameDirectory = qdDirectory + '/frame' + str(frame)
+                localFrameDirectory = os.path.join(localDirectory,
+                                                   'frame' + str(frame))
+                if not os.path.exists(localFrameDirectory):
+                    os.mkdir(localFrameDirectory)
+
+                frameCmd = cmd
+                if frame:
+                    frameCmd = frameCmd + ' -f ' + str(frame)
+                result = self.compileCommandResult(
+                    self.command(frameCmd + ' -d ' + frameDirectory))
+                self.transferResults(localFrameDirectory, frameDirectory)
+                if deleteRemote:
+                    self.command('exec rm -fr ' + frameDirectory)
+                table.add({'frame': frame}, result, time() - start)
+        finally:
+            # Clean up the directory on the quantumdata instrument
+            if deleteRemote:
+                self.command('exec rm -fr ' + qdDirectory)
+
+        return table
+
+    def saveVideoImage(self, local):
+
+        """Transfer a capture image to the quantumdata instrument
+
+        The file on the instrument is named after the MD5 digest of the
+        image, so an image that is already there isn't sent again. The
+        digest is kept until the local file's size or modification time
+        changes. The image this object uploaded before is removed.
+
+        @param self the TLqdInstrument object
+        @param local Local video.img file
+        @return file name on the quantumdata instrument"""
+
+        import hashlib
+        import os
+        from ftplib import FTP, error_perm
+
+        stat = os.stat(local)
+        key = (os.path.abspath(local), stat.st_size, stat.st_mtime)
+        if key not in self.videoDigests:
+            digest = hashlib.md5()
+            lFile = open(local, 'rb')
+            block = lFile.read(1 << 20)
+            while block:
+                digest.update(block)
+                block = lFile.read(1 << 20)
+            lFile.close()
+            self.videoDigests[key] = digest.hexdigest()
+        remote = '/tmp/ApiTestvideo_' + self.videoDigests[key] + '.img'
+
+        ftp = FTP(self.ipAddr, self.user, self.passwd)
+        ftp.login(self.user, self.passwd)
+        try:
+            ftp.voidcmd('TYPE I')
+            try:
+                if ftp.size(remote) == stat.st_size:
+                    return remote
+            except error_perm:
+                pass
+
+            if self.videoImage is not None and self.videoImage != remote:
+                try:
+                    ftp.delete(self.videoImage)
+                except error_perm:
+                    pass
+                self.videoImage = None
+
+            lFile = open(local, 'rb')
+            try:
+                ftp.storbinary('STOR ' + remote, lFile)
+            finally:
+                lFile.close()
+            self.videoImage = remote
+        finally:
+            ftp.quit()
+        return remote
+
     def updateVtem(self, vrrEn=None, mConst=None, reducedBlanking=None,
                    fvaFactorM1=None, baseVfront=None, baseRefreshRate=None):
 
@@ -1568,11 +1790,15 @@ class TLqdInstrument(object):
         @return TLqdCrcParameters"""
 
         sep = ':'
-        tag = ['Rx DSC CRC', 'Rx Video', 'Tx DSC CRC', 'Tx Video',
-               'Rx SW DSC Video', 'Rx HW DSC Video', 'crc_R_Cr',
-               'crc_G_Y', 'crc_B_Cb', 'crc_0', 'crc_1', 'crc_2']
-        crcRxDsc, crcRx, crcTxDsc, crcTx, crcSwDsc, crcHwDsc = False, False, False, False, False, False
-        crcRCr = crcGY = crcBCb = crc0 = crc1 = crc2 = 0
+        # Section headers and the values read in them
+        sections = {'Rx DSC CRC': 'rxDsc', 'Rx Video': 'rx',
+                    'Tx DSC CRC': 'txDsc', 'Tx Video': 'tx',
+                    'Rx SW DSC Video': 'swDsc', 'Rx HW DSC Video': 'hwDsc'}
+        dscTags = {'crc_0': 0, 'crc_1': 1, 'crc_2': 2}
+        videoTags = {'crc_R_Cr': 0, 'crc_G_Y': 1, 'crc_B_Cb': 2}
+        seen = set()
+        dscCrc = [0, 0, 0]
+        videoCrc = [0, 0, 0]
         dscStatus = ''
         option = ''
 
@@ -1582,44 +1808,25 @@ class TLqdInstrument(object):
             pos = entry.find(sep)
             if pos > 0:
                 key = entry[:pos].strip()
-                if tag[0] == key:
-                    crcRxDsc = True
-                if tag[1] == key:
-                    crcRx = True
-                if tag[2] == key:
-                    crcTxDsc = True
-                if tag[3] == key:
-                    crcTx = True
-                if tag[4] == key:
-                    crcSwDsc = True
-                if tag[5] == key:
-                    crcHwDsc = True
-                if not crcSwDsc and not crcHwDsc:
+                if key in sections:
+                    seen.add(sections[key])
+                if 'swDsc' not in seen and 'hwDsc' not in seen:
                     option = key
-            if pos < 0:
+            elif pos < 0:
                 value = entry.split()
-                if crcRxDsc or crcTxDsc:
-                    if tag[9] == value[0]:
-                        crc0 = value[1]
-                    if tag[10] == value[0]:
-                        crc1 = value[1]
-                    if tag[11] == value[0]:
-                        crc2 = value[1]
-                if crcSwDsc and not crcHwDsc or crcRx or crcTx:
-                    if tag[6] == value[0]:
-                        crcRCr = value[1]
-                    if tag[7] == value[0]:
-                        crcGY = value[1]
-                    if tag[8] == value[0]:
-                        crcBCb = value[1]
-                elif not crcSwDsc and crcHwDsc:
-                    if tag[6] == value[0]:
-                        crcRCr = value[1]
-                    if tag[7] == value[0]:
-                        crcGY = value[1]
-                    if tag[8] == value[0]:
-                        crcBCb = value[1]
-
+                if len(value) < 2:
+                    continue
+                if value[0] in dscTags and \
+                    ('rxDsc' in seen or 'txDsc' in seen):
+                    dscCrc[dscTags[value[0]]] = value[1]
+                # Only one of the software and hardware DSC sections
+                if value[0] in videoTags and \
+                    (('swDsc' in seen) != ('hwDsc' in seen) or
+                     'rx' in seen or 'tx' in seen):
+                    videoCrc[videoTags[value[0]]] = value[1]
+
+        crc0, crc1, crc2 = dscCrc
+        crcRCr, crcGY, crcBCb = videoCrc
         return TLqdCrcParameters(option, crc0, crc1, crc2, crcRCr, crcGY,
                                  crcBCb, dscStatus)
     ## @endcond
@@ -1914,45 +2121,8 @@ class TLqdInstrument(object):
         @param stepFileInfo Step file information to execute the test
         @return String containing additional step information"""
 
-        import re
-        qdStep = TLqdStep()
-
-        stepInfo = re.findall('.*{pattern},(.*\d+\s+\d+.*)'.format(pattern="PASS"), stepFileInfo)
-        passOption = self.dpGetExtraStep(stepInfo)
-        if passOption:
-            qdStep.passOption = True
-        stepInfo = re.findall('.*{pattern},(.*\d+\s+\d+.*)'.format(pattern="FAIL"), stepFileInfo)
-        failOption = self.dpGetExtraStep(stepInfo)
-        if failOption:
-            qdStep.failOption = True
-        stepInfo = re.findall('.*{pattern},(.*\d+\s+\d+.*)'.format(pattern="OK"), stepFileInfo)
-        okOption = self.dpGetExtraStep(stepInfo)
-        if okOption:
-            qdStep.okOption = True
-        stepInfo = re.findall('.*{pattern},(.*\d+\s+\d+.*)'.format(pattern="NO"), stepFileInfo)
-        noOption = self.dpGetExtraStep(stepInfo)
-        if noOption:
-            qdStep.noOption = True
-        stepInfo = re.findall('.*{pattern},(.*\d+\s+\d+.*)'.format(pattern="REPLAY"), stepFileInfo)
-        replayOption = self.dpGetExtraStep(stepInfo)
-        if replayOption:
-            qdStep.replayOption = True
-        qdStep.description = re.findall(r'.*text:((?:[^.]*.){5})', stepFileInfo, flags=re.MULTILINE)
-
-        ret = str(callback(qdStep)).upper()
-
-        extraStep = ''
-        if ret == "PASS":
-            extraStep = passOption
-        elif ret == "FAIL":
-            extraStep = failOption
-        elif ret == "OK":
-            extraStep = okOption
-        elif ret == "REPLAY":
-            extraStep = replayOption
-        elif ret == "NO":
-            extraStep = noOption
-        return extraStep
+        engine = TLqdDpStepEngine(self, callback)
+        return engine.respond(engine.parse(stepFileInfo))
 
     def dpInitialize(self):
 
@@ -1973,7 +2143,6 @@ class TLqdInstrument(object):
         @param self the TLqdInstrument object
         @return TLqdResult"""
 
-        import re
         import tempfile
         from os import close
         resultFileInfo = ''
@@ -1986,25 +2155,43 @@ class TLqdInstrument(object):
         lFile = open(localFile, "r")
         resultFileInfo = lFile.read()
 
+        return self.dpCompileComplianceResult(resultFileInfo)
+
+    ## @cond
+    def dpCompileComplianceResult(self, resultFileInfo):
+
+        """Compile the compliance test results file
+
+        @param self the TLqdInstrument object
+        @param resultFileInfo Results file contents
+        @return TLqdResult"""
+
+        import re
+
         result = 'PASS'
         info = []
         errors = []
 
+        entry = re.compile(r'(Note|Warn|Skipped|Fail)_\d:')
         for line in resultFileInfo.split('\n'):
-            if re.search(r'^.*Note_\d:.*$', line.strip()):
+            found = entry.findall(line)
+            if not found:
+                continue
+            if 'Note' in found:
                 info.append(line)
-            if re.search(r'^.*Warn_\d:.*$', line.strip()):
+            if 'Warn' in found:
                 info.append(line)
-            if re.search(r'^.*Skipped_\d:.*$', line.strip()):
+            if 'Skipped' in found:
                 info.append(line)
                 result = 'SKIPPED'
-            if re.search(r'^.*Fail_\d:.*$', line.strip()):
+            if 'Fail' in found:
                 errors.append(line)
 
         if errors:
             result = 'FAIL'
 
         return TLqdResult(TLqdStatus(result), info, errors)
+    ## @endcond
 
     def dpProcessComplianceResults(self, testName, tp):
 
@@ -2073,45 +2260,20 @@ class TLqdInstrument(object):
         @param tp TLqdTestParameters
         @return TLqdResult"""
 
-        # Remove the logs before test execution
-        self.dpInitialize()
+        # Remove the logs before test execution, done once for a batch
+        if self.dpBatch is None:
+            self.dpInitialize()
 
         # Transfer Cdf file to Remote Directory
         if tp.cdf:
             self.putFile(tp.cdf, CdfFile)
 
-        results = self.compileCommandResult(self.command(cmd))
-        if results.status == "PASS" and callback:
-            while True:
-                import tempfile
-                from os import close
-                stepFileInfo = ''
-                extraStep = ''
-
-                localFile = tempfile.mkstemp('.log', 'tlqdctssteps')
-                close(localFile[0])
-
-                localFile = localFile[1]
-                self.getFile(DpStepsFile, localFile)
-                lFile = open(localFile, "r")
-                stepFileInfo = lFile.read()
-
-                # Test finished in case no more steps exist
-                if len(stepFileInfo) == 0:
-                    break
-
-                extraStep = self.dpProcessComplianceStepFile(callback,
-                    stepFileInfo)
-                self.deleteFile(DpStepsFile)
+        engine = TLqdDpStepEngine(self, callback)
+        self.dpSteps = engine.steps
+        results = engine.run(cmd)
 
-                if len(extraStep) == 0:
-                    raise RuntimeError('Step file {stepsFile} is empty'.format(stepsFile=DpStepsFile))
-                else:
-                    newCmd = cmd + ' -s ' + extraStep
-                    results = self.compileCommandResult(self.command(newCmd))
-
-                if results.status != "PASS":
-                    break
+        if self.dpBatch is not None:
+            return self.dpBatch.finish(testName, tp, results)
 
         if results.status != "PASS":
             return results
@@ -2356,6 +2518,12 @@ class TLqdInstrument(object):
         if self.cardUsed is not None:
             prefix = 'OUT' + str(self.cardUsed) + '0:'
         return self.command(prefix + cmd)
+
+    def outCommandBurst(self, cmds):
+        prefix = ''
+        if self.cardUsed is not None:
+            prefix = 'OUT' + str(self.cardUsed) + '0:'
+        return self.commandBurst([prefix + cmd for cmd in cmds])
     ## @endcond
 
     def getFormatParameters(self, all=False):
@@ -2378,31 +2546,75 @@ class TLqdInstrument(object):
                         params.__dict__[tag.longTag] = tag.type(value)
         return params
 
-    def updateFormatParameters(self, params):
+    def updateFormatParameters(self, params, diff=False):
 
         """Update video format parameters
 
+        With diff, only the parameters that differ from formatSnapshot are
+        sent, all at once followed by FMTU. The snapshot is read with
+        getFormatParameters the first time and kept up to date afterwards;
+        an update without diff clears it. Set formatSnapshot to None if the
+        format is changed some other way.
+
         @param self the TLqdInstrument object
         @param params TLqdVideoFormatParameters
+        @param diff Set to only send changed parameters
         @return TLqdResult"""
 
+        snapshot = None
+        if diff:
+            if self.formatSnapshot is None:
+                self.formatSnapshot = self.getFormatCodes(
+                    self.getFormatParameters(all=True))
+            snapshot = self.formatSnapshot
+        else:
+            # Parameters are sent one at a time, so the snapshot is stale
+            self.formatSnapshot = None
+
         errs = []
+        changed = []
         for tag in TLqdVideoFormatParameters.tags:
             if tag.longTag in params.__dict__:
                 value = params.__dict__[tag.longTag]
                 if value is not None:
                     code = params.getCode(tag.type, value)
-                    if code is not None:
-                        self.outCommand(tag.shortTag + ' ' + str(code))
-                    else:
+                    if code is None:
                         if len(errs):
                             errs.append(', ')
                         errs.append(str(value))
+                    elif snapshot is None:
+                        self.outCommand(tag.shortTag + ' ' + str(code))
+                    elif snapshot.get(tag.shortTag) != str(code):
+                        changed.append((tag.shortTag, str(code)))
         if len(errs):
             errs = ['Invalid parameters: ' + ''.join(errs)]
             return TLqdResult(TLqdStatus.FAIL, [], errs)
 
-        return self.compileCommandResult(self.outCommand('FMTU'))
+        if snapshot is None:
+            return self.compileCommandResult(self.outCommand('FMTU'))
+
+        if len(changed) == 0:
+            return TLqdResult(TLqdStatus.PASS, [], [])
+        cmds = [tag + ' ' + code for tag, code in changed]
+        ret = self.compileCommandResult(
+            self.outCommandBurst(cmds + ['FMTU'])[-1])
+        if ret.status == TLqdStatus.PASS:
+            snapshot.update(dict(changed))
+        else:
+            self.formatSnapshot = None
+        return ret
+
+    ## @cond
+    def getFormatCodes(self, params):
+        codes = {}
+        for tag in TLqdVideoFormatParameters.tags:
+            value = params.__dict__.get(tag.longTag)
+            if value is not None:
+                code = params.getCode(tag.type, value)
+                if code is not None:
+                    codes[tag.shortTag] = str(code)
+        return codes
+    ## @endcond
 
     def useFormatParameters(self, params):
 
@@ -2413,6 +2625,7 @@ class TLqdInstrument(object):
         @return TLqdResult"""
 
         # Make sure the required parameters are present
+        self.formatSnapshot = None
         errs = []
         for tag in TLqdVideoFormatParameters.tags:
             if tag.longTag in params.__dict__:
@@ -2654,14 +2867,20 @@ class TLqdInstrument(object):
     ## @endcond
 
     ## @cond
-    def transferResults(self, localDirectory, qdDirectory):
+    def transferResults(self, localDirectory, qdDirectory,
+                        artifactFilter=None, failed=False, relative=''):
 
         """Transfer remote data to local using FTP
 
         @param self the TLqdInstrument object
         @param localDirectory Folder path to store test result artifacts
         @param qdDirectory instrument directory path with test result
-            artifacts"""
+            artifacts
+        @param artifactFilter Optional TLqdArtifactFilter choosing the files
+            to transfer
+        @param failed Set if the test or capture failed, for the filter
+        @param relative Path of qdDirectory within the results, for the
+            filter"""
 
         if localDirectory is None or qdDirectory is None:
             return
@@ -2674,22 +2893,35 @@ class TLqdInstrument(object):
 
         ftp.retrlines('LIST ' + qdDirectory, found.append)
 
-        from os import mkdir
+        from os import makedirs, mkdir
         from os import path
 
         for f in found:
             if f.find('cannot access') >= 0 or f.find('No such file') >= 0:
                 return
+
+        selected = None
+        if artifactFilter is not None:
+            selected = artifactFilter.select(found, failed, relative)
+
+        for f in found:
             pos = f.find(':') # Find the colon in the timestamp
             if pos > 0:
                 name = f[pos+4:]
                 lf = self.appendFile(localDirectory, name)
                 rf = self.appendFile(qdDirectory, name)
                 if f[0] == 'd': # Sub-directory
-                    if not path.exists(lf):
+                    # With a filter, the folder is made once a file in it
+                    # is kept
+                    if artifactFilter is None and not path.exists(lf):
                         mkdir(lf)
-                    self.transferResults(lf, rf)
+                    self.transferResults(lf, rf, artifactFilter, failed,
+                                         relative + name + '/')
+                elif selected is not None and name not in selected:
+                    continue
                 else:
+                    if not path.exists(localDirectory):
+                        makedirs(localDirectory)
                     lFile = open(lf, "wb")
                     ftp.retrbinary('RETR ' + rf, lFile.write)
                     lFile.close()
@@ -2803,6 +3035,143 @@ class TLqdInstrument(object):
             return TLqdPixel(error=ret.errors)
         return TLqdPixel(error=ret.status)
 
+    def getPixels(self, region):
+
+        """Get many pixels at once
+
+        Grabs one video frame and reads the pixels from it, so values are
+        always 8 bits per component (0 to 255), whatever the received bit
+        depth. They are returned as uint16 so differences and sums of
+        them don't wrap. Use getPixel for values at the received bit
+        depth.
+
+        Needs NumPy.
+
+        @param self the TLqdInstrument object
+        @param region (x, y, width, height) rectangle, or list of (x, y)
+            points, all inside the frame
+        @return NumPy uint16 array of 8 bit values, (height, width, 3) for
+            a rectangle or (points, 3) for a list of points; components are
+            red/Cr, green/Y and blue/Cb"""
+
+        import numpy
+
+        if isinstance(region, tuple) and len(region) == 4:
+            x, y, width, height = region
+            if width <= 0 or height <= 0:
+                raise RuntimeError('Empty region: ' + str(region))
+            ys, xs = numpy.mgrid[y:y+height, x:x+width]
+            shape = (height, width, 3)
+        else:
+            points = numpy.array(region, dtype=int).reshape(-1, 2)
+            xs, ys = points[:, 0], points[:, 1]
+            shape = (len(points), 3)
+
+        frame = self.grabFrame(reuse=True)
+        frameHeight, frameWidth = frame.shape[:2]
+        if xs.size and (xs.min() < 0 or ys.min() < 0 or
+                        xs.max() >= frameWidth or ys.max() >= frameHeight):
+            raise RuntimeError('Region ' + str(region) + ' is outside the ' +
+                               str(frameWidth) + 'x' + str(frameHeight) +
+                               ' frame')
+        return frame[ys, xs].astype(numpy.uint16).reshape(shape)
+
+    def grabFrame(self, reuse=False):
+
+        """Grab a frame of video into memory
+
+        The bitmap is streamed over FTP straight into a buffer kept by the
+        instrument object and decoded in place. With reuse, the frame is a
+        view of that buffer and is overwritten by the next grab; otherwise
+        it is copied out.
+
+        Needs NumPy.
+
+        @param self the TLqdInstrument object
+        @param reuse Set to return a view of the shared buffer
+        @return (height, width, 3) NumPy uint8 array of red/Cr, green/Y and
+            blue/Cb, top line first"""
+
+        from ftplib import FTP
+
+        ftp = FTP(self.ipAddr, self.user, self.passwd)
+        ftp.login(self.user, self.passwd)
+        try:
+            frame = self.grabFrameWith(ftp)
+        finally:
+            ftp.quit()
+        if reuse:
+            return frame
+        return frame.copy()
+
+    def grabFrames(self, count=None, reuse=False):
+
+        """Grab frames of video continuously
+
+        Like grabFrame, using one FTP connection and one buffer for all
+        the frames. With reuse, each frame is a view of the buffer and is
+        only valid until the next one is grabbed.
+
+        @param self the TLqdInstrument object
+        @param count Optional number of frames, forever by default
+        @param reuse Set to yield views of the shared buffer
+        @return generator of (height, width, 3) NumPy uint8 arrays"""
+
+        from ftplib import FTP
+
+        ftp = FTP(self.ipAddr, self.user, self.passwd)
+        ftp.login(self.user, self.passwd)
+        try:
+            grabbed = 0
+            while count is None or grabbed < count:
+                frame = self.grabFrameWith(ftp)
+                if reuse:
+                    yield frame
+                else:
+                    yield frame.copy()
+                grabbed = grabbed + 1
+        finally:
+            ftp.quit()
+
+    ## @cond
+    def grabFrameWith(self, ftp):
+        cmd = TLqdApiTag + 'get_video_frame ' + str(RemoteVideoBitmapFile)
+        ret = self.compileCommandResult(self.command(cmd))
+        if ret.status != TLqdStatus.PASS:
+            raise RuntimeError('Cannot get video frame: ' +
+                               ' '.join(ret.errors))
+
+        ftp.voidcmd('TYPE I')
+        size = ftp.size(RemoteVideoBitmapFile) or 0
+        if self.frameBuffer is None or len(self.frameBuffer) < size:
+            self.frameBuffer = bytearray(size)
+        # Views in use stop a bytearray from growing, so keep the view in a
+        # list and replace both when more room is needed
+        state = [memoryview(self.frameBuffer), 0]
+        def store(block):
+            end = state[1] + len(block)
+            if end > len(self.frameBuffer):
+                grown = bytearray(max(end, 2 * len(self.frameBuffer)))
+                grown[:state[1]] = state[0][:state[1]]
+                self.frameBuffer = grown
+                state[0] = memoryview(grown)
+            state[0][state[1]:end] = block
+            state[1] = end
+        ftp.retrbinary('RETR ' + RemoteVideoBitmapFile, store)
+        return self.decodeBitmap(state[0][:state[1]])
+
+    def decodeBitmap(self, data):
+
+        """Decode an uncompressed 24 or 32 bit bitmap without copying
+
+        @param self the TLqdInstrument object
+        @param data Bitmap file contents, bytes or a writable buffer
+        @return (height, width, 3) uint8 view of red, green, blue, top line
+            first"""
+
+        return TLqdDecodeBitmap(data)
+    ## @endcond
+
     ## @cond
     def compileInfoframeResult(self, output):
 
@@ -2894,20 +3263,42 @@ class TLqdInstrument(object):
 
         return self.getInfoframe('VS')
 
+    ## Infoframes and packets read by getAllInfoframes
+    allInfoframes = ['AVI', 'Audio', 'DRM', 'VS', 'GCP']
+
+    def getAllInfoframes(self, infoframes=None):
+
+        """Get several infoframes at once
+
+        The queries are sent together and their output read back in one go.
+        Use TLqdDecodeInfoframe to decode the octets.
+
+        @param self the TLqdInstrument object
+        @param infoframes Optional list of infoframe IDs, defaults to
+            allInfoframes
+        @return dictionary of infoframe ID to tuple of (result, error or
+            decoded infoframe, infoframe octets)"""
+
+        if infoframes is None:
+            infoframes = self.allInfoframes
+        outputs = self.commandBurst([TLqdApiTag + 'infoframe ' + str(name)
+                                     for name in infoframes])
+        ret = {}
+        for name, output in zip(infoframes, outputs):
+            ret[name] = self.compileInfoframeResult(output)
+        return ret
+
     ## @cond
     def parseFormat(self, format):
 
         params = TLqdVideoFormatParameters()
-        sep = ': '
+        values = params.__dict__
+        parsers = TLqdVideoFormatParameters.parsers
         for entry in self.listify(format):
-            pos = entry.find(sep)
-            if pos > 0:
-                key = entry[:pos]
-                value = entry[pos+len(sep):]
-                for tag in TLqdVideoFormatParameters.tags:
-
-                    if tag.shortTag == key:
-                        params.__dict__[tag.longTag] = tag.type(value)
+            shortTag, sep, value = entry.partition(': ')
+            parser = parsers.get(shortTag)
+            if parser is not None and sep:
+                values[parser[0]] = parser[1](value)
         return params
     ## @endcond
 
@@ -2921,6 +3312,94 @@ class TLqdInstrument(object):
         format = self.command(TLqdApiTag + 'get_received_format')
         return self.parseFormat(format)
 
+    def getCaptureBytes(self, frames=None, durationMs=None, format=None):
+
+        """Compute the capture memory needed for a number of frames or a
+        length of time
+
+        The link data rate is the FRL or DP lane rate times the number of
+        lanes when the format has them, otherwise the TMDS character rate
+        (pixel rate adjusted for bit depth and 4:2:2 or 4:2:0 sampling) on
+        three channels of 10 bits
+
+        @param self the TLqdInstrument object
+        @param frames Number of frames
+        @param durationMs Length of time in milliseconds, if frames isn't
+            given
+        @param format Optional TLqdVideoFormatParameters, defaults to the
+            received format
+        @return bytes"""
+
+        if format is None:
+            format = self.getReceivedFormat()
+
+        pixelRate = format.PixelRate
+        if not pixelRate:
+            pixelRate = format.HorizontalTotal * format.VerticalTotal * \
+                format.FrameRate
+        elif pixelRate < 100000:
+            # Reported in MHz
+            pixelRate = pixelRate * 1e6
+
+        if format.LaneRate and format.NumberLanes:
+            # Lane rates are reported in Gbps, or Mbps on some firmware
+            laneRate = format.LaneRate
+            if laneRate < 100:
+                laneRate = laneRate * 1e9
+            elif laneRate < 100000:
+                laneRate = laneRate * 1e6
+            bitRate = laneRate * format.NumberLanes
+        else:
+            characterRate = pixelRate
+            if format.SamplingMode == TLqdSubsampling.SS420:
+                characterRate = characterRate / 2
+            if format.SamplingMode != TLqdSubsampling.SS422 and \
+                format.NumberBitsPerColor:
+                characterRate = characterRate * \
+                    max(format.NumberBitsPerColor, 8) / 8.0
+            bitRate = characterRate * 3 * 10
+
+        if frames is not None:
+            frameRate = format.FrameRate
+            if not frameRate:
+                frameRate = pixelRate / (format.HorizontalTotal *
+                                         format.VerticalTotal)
+            seconds = float(frames) / frameRate
+        elif durationMs is not None:
+            seconds = durationMs / 1000.0
+        else:
+            raise RuntimeError('Capture size needs frames or durationMs')
+
+        return int(bitRate * seconds / 8 + 0.5)
+
+    def getCaptureSizePct(self, frames=None, durationMs=None, format=None,
+                          memory=None):
+
+        """Compute the capture size percentage for a number of frames or a
+        length of time
+
+        Use the result as the capture sizePct or
+        TLqdTestParameters.captureSizePct
+
+        @param self the TLqdInstrument object
+        @param frames Number of frames
+        @param durationMs Length of time in milliseconds, if frames isn't
+            given
+        @param format Optional TLqdVideoFormatParameters, defaults to the
+            received format
+        @param memory Optional capture memory in bytes, defaults to
+            captureMemory
+        @return whole percentage, 1 - 100"""
+
+        if memory is None:
+            memory = self.captureMemory
+        if not memory:
+            raise RuntimeError('Set captureMemory to the capture memory ' +
+                               'size of the card')
+        needed = self.getCaptureBytes(frames, durationMs, format)
+        pct = -(-needed * 100 // memory)
+        return int(min(max(pct, 1), 100))
+
     def testAudio(self):
 
         """Evaluate incoming audio
@@ -2959,10 +3438,13 @@ class TLqdInstrument(object):
         @param testParameters TLqdTestParameters
         @return TLqdResult"""
 
+        from time import time
+
         # Make sure there is an object to reference
         if testParameters is None:
             testParameters = TLqdTestParameters() # Dummy values
 
+        start = time()
         if testParameters.edidFile is not None:
             cmd = cmd + self.saveEdidFile(testParameters.edidFile)
         elif testParameters.edidData is not None:
@@ -2973,6 +3455,8 @@ class TLqdInstrument(object):
 
         if testParameters.cdf is not None:
             cmd = cmd + self.saveCdfFile(testParameters.cdf)
+        cmd = cmd + self.sharedOptions
+        start = self.addTiming('upload', start)
 
         # Pass along save captures indicator if saving locally
         if (testParameters.localDirectory is not None or \
@@ -2987,6 +3471,7 @@ class TLqdInstrument(object):
             qdDirectory = self.prepareDirectories(testParameters.localDirectory,
                                                   testParameters.qdDirectory)
             cmd = cmd + ' -U' + qdDirectory
+            start = self.addTiming('prepare', start)
         if testParameters.captureSizePct is not None:
             cmd = cmd + ' -J' + str(testParameters.captureSizePct)
         elif testParameters.captureSizeFrames is not None:
@@ -3001,25 +3486,55 @@ class TLqdInstrument(object):
             firstcmd += ' -z' + str(TLqdCallbackState.init)
 
         output = self.command(TLqdApiTag + firstcmd)
+        start = self.addTiming('test', start)
         if callback:
             pos = cmd.find('-i')
             stepNumber = 0
             if pos >= 0:
                 stepNumber = cmd[pos+2:pos+4]
             result = self.setupCallback(callback, stepNumber, self.compileTestResults(output))
+            start = self.addTiming('callback', start)
 
             if result.status == "PASS":
                 if testParameters.callbackSrcSet:
                     secondcmd += ' -z' + str(TLqdCallbackState.complete)
                     output = self.command(TLqdApiTag + secondcmd)
+                    start = self.addTiming('test', start)
 
-        self.transferResults(testParameters.localDirectory, qdDirectory)
+        results = self.compileTestResults(output)
+        self.transferResults(testParameters.localDirectory, qdDirectory,
+                             testParameters.artifactFilter,
+                             results.status == TLqdStatus.FAIL)
+        start = self.addTiming('transfer', start)
 
         # Clean up the directory on the quantumdata instrument
         if deleteRemote and qdDirectory is not None:
             self.command('exec rm -fr ' + qdDirectory)
+            self.addTiming('cleanup', start)
+
+        return results
+    ## @endcond
+
+    ## @cond
+    def addTiming(self, phase, start):
+
+        """Add the time since start to a test phase
+
+        The phases of runTest are 'upload' (EDID and CDF files), 'prepare'
+        (result directories), 'test' (hot plug, capture and analysis on the
+        instrument), 'callback' (waiting for the source callback), 'transfer'
+        (artifacts) and 'cleanup'
+
+        @param self the TLqdInstrument object
+        @param phase Phase name
+        @param start Time the phase started
+        @return the current time, to start the next phase"""
+
+        from time import time
 
-        return self.compileTestResults(output)
+        now = time()
+        self.timing[phase] = self.timing.get(phase, 0) + now - start
+        return now
     ## @endcond
 
     ## @cond
@@ -3227,6 +3742,123 @@ class TLqdInstrument(object):
         return self.runRequireHpTest(cmd, testParameters)
     ## @endcond
 
+    def getTestSteps(self, test):
+
+        """Get the valid step numbers of a multi-step test
+
+        The range is read from the stepNumber description of the test method,
+        such as "Test step number, 1 - 4" or "Test step number, 1 or 2"
+
+        @param self the TLqdInstrument object
+        @param test Test method or method name, such as 'runHf1_10'
+        @return list of step numbers, empty if the range isn't documented"""
+
+        import re
+
+        if isinstance(test, str):
+            test = getattr(self, test)
+        for line in (test.__doc__ or '').split('\n'):
+            if line.find('@param stepNumber') < 0:
+                continue
+            line = line[line.find('@param stepNumber') + 17:]
+            found = re.search(r'(\d+)\s*-\s*(\d+)', line)
+            if found:
+                return list(range(int(found.group(1)),
+                                  int(found.group(2)) + 1))
+            return [int(n) for n in re.findall(r'\d+', line)]
+        return []
+
+    def runAllSteps(self, test, steps=None, testParameters=None, **args):
+
+        """Run every step of a multi-step test with shared setup
+
+        The EDID and CDF files are uploaded and the result directory prepared
+        once. Each step writes its artifacts to a "step<n>" sub-directory,
+        all of which are transferred at the end before the remote directory
+        is removed. A step that raises an exception is reported as failed and
+        the remaining steps still run.
+
+        @param self the TLqdInstrument object
+        @param test Test method or method name taking stepNumber and
+            testParameters, such as 'runHf1_10'; sink tests without
+            testParameters, such as 'runHf2_9', are run step by step
+            without the shared setup
+        @param steps Optional list of step numbers, defaults to the range
+            from getTestSteps
+        @param testParameters TLqdTestParameters, only for tests taking
+            testParameters
+        @param args Other arguments of the test, such as vic or callbackforSS
+        @return TLqdResultTable with a row for each step"""
+
+        import copy
+        from time import time
+
+        if isinstance(test, str):
+            test = getattr(self, test)
+        if steps is None:
+            steps = self.getTestSteps(test)
+            if len(steps) == 0:
+                raise RuntimeError(test.__name__ +
+                                   ' has no documented step range')
+        takesParameters = TLqdTakesArgument(test, 'testParameters')
+        if not takesParameters and testParameters is not None:
+            raise RuntimeError(test.__name__ + ' does not take testParameters')
+        if testParameters is None:
+            testParameters = TLqdTestParameters() # Dummy values
+
+        table = TLqdResultTable(['step'])
+
+        start = time()
+        options = ''
+        if testParameters.edidFile is not None:
+            options = options + self.saveEdidFile(testParameters.edidFile)
+        elif testParameters.edidData is not None:
+            options = options + self.saveEdidData(testParameters.edidData)
+        if testParameters.cdf is not None:
+            options = options + self.saveCdfFile(testParameters.cdf)
+        qdDirectory = None
+        deleteRemote = testParameters.qdDirectory is None
+        if (testParameters.localDirectory is not None or
+            testParameters.qdDirectory is not None):
+            qdDirectory = self.prepareDirectories(testParameters.localDirectory,
+                                                  testParameters.qdDirectory)
+        self.addTiming('upload', start)
+
+        stepParameters = copy.copy(testParameters)
+        stepParameters.edidFile = None
+        stepParameters.edidData = None
+        stepParameters.cdf = None
+        stepParameters.localDirectory = None
+
+        self.sharedOptions = options
+        try:
+            for step in steps:
+                if qdDirectory is not None:
+                    stepParameters.qdDirectory = qdDirectory + '/step' + \
+                        str(step)
+                start = time()
+                stepArgs = dict(args)
+                if takesParameters:
+                    stepArgs['testParameters'] = copy.copy(stepParameters)
+                try:
+                    result = test(stepNumber=step, **stepArgs)
+                except Exception as e:
+                    result = TLqdResult(TLqdStatus.FAIL, [], [str(e)])
+                table.add({'step': step}, result, time() - start)
+        finally:
+            self.sharedOptions = ''
+
+        start = time()
+        self.transferResults(testParameters.localDirectory, qdDirectory,
+                             testParameters.artifactFilter,
+                             len(table.failures()) > 0)
+        start = self.addTiming('transfer', start)
+        if deleteRemote and qdDirectory is not None:
+            self.command('exec rm -fr ' + qdDirectory)
+            self.addTiming('cleanup', start)
+
+        return table
+
     def run7_16(self, vic, callbackforSS=False, testParameters=None):
 
         """Execute HDMI 1.4 source test 7-16
@@ -7272,7 +7904,7 @@ class TLqdInstrument(object):
                 timing=False, interpret=False, interpretScambling=False,
                 triggerData=None, triggerMask=None, triggerLaneMask=None,
                 triggerDpcdAddress=None, captureTimeLimit=None,
-                getDsc=False, getAca=False):
+                getDsc=False, getAca=False, artifactFilter=None):
         """Perform a capture
 
         @param self the TLqdInstrument object
@@ -7296,6 +7928,8 @@ class TLqdInstrument(object):
         @param captureTimeLimit capture until this time limit in milliseconds
         @param getDsc Extract and uncompress Dsc frames
         @param getAca Collect ACA logs during capture
+        @param artifactFilter Optional TLqdArtifactFilter choosing the files
+            to transfer to localDirectory
         @return TLqdResult"""
 
         cmd = 'capture -t' + str(type) + ' -s' + str(sizePct)
@@ -7338,14 +7972,15 @@ class TLqdInstrument(object):
             qdDirectory = self.prepareDirectories(localDirectory, qdDirectory)
             cmd = cmd + ' -d' + qdDirectory
 
-        result = self.command(TLqdApiTag + cmd)
-        self.transferResults(localDirectory, qdDirectory)
+        result = self.compileCommandResult(self.command(TLqdApiTag + cmd))
+        self.transferResults(localDirectory, qdDirectory, artifactFilter,
+                             result.status == TLqdStatus.FAIL)
 
         # Clean up the directory on the quantumdata instrument
         if deleteRemote and qdDirectory is not None:
             self.command('exec rm -fr ' + qdDirectory)
 
-        return self.compileCommandResult(result)
+        return result
 
     ## @cond
     def parseDpcd(self, input):
@@ -8516,6 +9151,23 @@ def TlqdCreateBitmaporText(qdDev, frame, mode=None, localDirectory=None, qdDirec
 
     return qdDev.createBitmaporText(frame, mode, localDirectory, qdDirectory)
 
+def TlqdCreateBitmapsorText(qdDev, frames, mode=None, localDirectory=None,
+                            qdDirectory=None, stream=None):
+    """Create Bitmap or Text files for many video frames
+
+    See @ref TLqdInstrument.createBitmapsorText for details
+
+    @param qdDev Interface to quantumdata instrument
+    @param frames List or range of frame numbers to render
+    @param mode Optional TLqdExportMode
+    @param localDirectory Folder with video.img to store generated files
+    @param qdDirectory Optional Instrument directory path to render in
+    @param stream Optional file-like object to stream rows to
+    @return TLqdResultTable"""
+
+    return qdDev.createBitmapsorText(frames, mode, localDirectory,
+                                     qdDirectory, stream=stream)
+
 class TLqdPort(InputType):
     """@brief Port
 
@@ -8670,15 +9322,18 @@ def TLqdGetFormatParameters(qdDev, all=False):
 
     return qdDev.getFormatParameters(all)
 
-def TLqdUpdateFormatParameters(qdDev, params):
+def TLqdUpdateFormatParameters(qdDev, params, diff=False):
 
     """Update video format parameters
 
+    See @ref TLqdInstrument.updateFormatParameters for details
+
     @param qdDev Interface to quantumdata instrument
     @param params TLqdVideoFormatParameters
+    @param diff Set to only send changed parameters
     @return TLqdResult"""
 
-    return qdDev.updateFormatParameters(params)
+    return qdDev.updateFormatParameters(params, diff)
 
 def TLqdUseFormatParameters(qdDev, params):
 
@@ -8980,34 +9635,129 @@ def TLqdGetPixel(qdDev, x, y):
 
     return qdDev.getPixel(x, y)
 
-def TLqdGetAudioInfoframe(qdDev):
+def TLqdGetPixels(qdDev, region):
 
-    """Get an audio infoframe
+    """Get many pixels at once from a video frame
+
+    See @ref TLqdInstrument.getPixels for details
 
     @param qdDev Interface to quantumdata instrument
-    @return tuple of (result, error or decoded infoframe, infoframe octets)"""
+    @param region (x, y, width, height) rectangle, or list of (x, y) points
+    @return NumPy uint16 array of the 8 bit red/Cr, green/Y and blue/Cb
+        values"""
 
-    return qdDev.getAudioInfoframe()
+    return qdDev.getPixels(region)
 
-def TLqdGetAviInfoframe(qdDev):
+def TLqdGrabFrame(qdDev, reuse=False):
 
-    """Get an AVI infoframe
+    """Grab a frame of video into memory
+
+    See @ref TLqdInstrument.grabFrame for details
 
     @param qdDev Interface to quantumdata instrument
-    @return tuple of (result, error or decoded infoframe, infoframe octets)"""
+    @param reuse Set to return a view of the shared buffer
+    @return (height, width, 3) NumPy uint8 array"""
 
-    return qdDev.getAviInfoframe()
+    return qdDev.grabFrame(reuse)
 
-def TLqdGetDrmInfoframe(qdDev):
+def TLqdGrabFrames(qdDev, count=None, reuse=False):
 
-    """Get a dynamic range and mastering infoframe
+    """Grab frames of video continuously
+
+    See @ref TLqdInstrument.grabFrames for details
 
     @param qdDev Interface to quantumdata instrument
-    @return tuple of (result, error or decoded infoframe, infoframe octets)"""
+    @param count Optional number of frames
+    @param reuse Set to yield views of the shared buffer
+    @return generator of (height, width, 3) NumPy uint8 arrays"""
 
-    return qdDev.getDrmInfoframe()
+    return qdDev.grabFrames(count, reuse)
 
-def TLqdGetGcp(qdDev):
+def TLqdSampleCrc(qdDev, port=None, dsc=False, count=None, duration=None,
+                  size=4096, batch=16):
+
+    """Read CRCs back to back for stability analysis
+
+    See @ref TLqdCrcSampler for details
+
+    @param qdDev Interface to quantumdata instrument
+    @param port TLqdPort for getCrc, or None to use getSinkTestCrc
+    @param dsc Set to collect DSC CRCs with getCrc
+    @param count Optional number of samples to take
+    @param duration Optional number of seconds to sample for
+    @param size Number of samples kept
+    @param batch Number of CRC queries sent in one commandBurst
+    @return TLqdCrcSampler"""
+
+    sampler = TLqdCrcSampler(qdDev, port, dsc, size, batch)
+    sampler.sample(count, duration)
+    return sampler
+
+def TLqdRegionStats(pixels):
+
+    """Get the mean, minimum and maximum of each component
+
+    @param pixels NumPy array from getPixels
+    @return dictionary with 'mean', 'min' and 'max', each an array of the
+        red/Cr, green/Y and blue/Cb values"""
+
+    import numpy
+
+    values = numpy.asarray(pixels).reshape(-1, 3)
+    return {'mean': values.mean(axis=0), 'min': values.min(axis=0),
+            'max': values.max(axis=0)}
+
+def TLqdFindColorBars(pixels, threshold=32):
+
+    """Find the boundaries of vertical color bars
+
+    The lines of the region are averaged, so a few lines across the bars
+    are enough
+
+    @param pixels (height, width, 3) NumPy array from getPixels
+    @param threshold Smallest change of any component that counts as a
+        boundary
+    @return list of (start, end) column ranges of each bar, relative to
+        the region"""
+
+    import numpy
+
+    line = numpy.asarray(pixels, numpy.float64).reshape(
+        -1, numpy.shape(pixels)[-2], 3).mean(axis=0)
+    change = numpy.abs(numpy.diff(line, axis=0)).max(axis=1)
+    edges = numpy.flatnonzero(change >= threshold) + 1
+    starts = [0] + [int(edge) for edge in edges]
+    ends = [int(edge) for edge in edges] + [len(line)]
+    return list(zip(starts, ends))
+
+def TLqdGetAudioInfoframe(qdDev):
+
+    """Get an audio infoframe
+
+    @param qdDev Interface to quantumdata instrument
+    @return tuple of (result, error or decoded infoframe, infoframe octets)"""
+
+    return qdDev.getAudioInfoframe()
+
+def TLqdGetAviInfoframe(qdDev):
+
+    """Get an AVI infoframe
+
+    @param qdDev Interface to quantumdata instrument
+    @return tuple of (result, error or decoded infoframe, infoframe octets)"""
+
+    return qdDev.getAviInfoframe()
+
+def TLqdGetDrmInfoframe(qdDev):
+
+    """Get a dynamic range and mastering infoframe
+
+    @param qdDev Interface to quantumdata instrument
+    @return tuple of (result, error or decoded infoframe, infoframe octets)"""
+
+    return qdDev.getDrmInfoframe()
+
+def TLqdGetGcp(qdDev):
 
     """Get a general control packet
 
@@ -9025,6 +9775,19 @@ def TLqdGetVendorSpecificInfoframe(qdDev):
 
     return qdDev.getVendorSpecificInfoframe()
 
+def TLqdGetAllInfoframes(qdDev, infoframes=None):
+
+    """Get several infoframes at once
+
+    See @ref TLqdInstrument.getAllInfoframes for details
+
+    @param qdDev Interface to quantumdata instrument
+    @param infoframes Optional list of infoframe IDs, such as 'AVI' and 'GCP'
+    @return dictionary of infoframe ID to tuple of (result, error or decoded
+        infoframe, infoframe octets)"""
+
+    return qdDev.getAllInfoframes(infoframes)
+
 def TLqdGetReceivedFormat(qdDev):
 
     """Get the video format parameters being received
@@ -9061,6 +9824,49 @@ def TLqdIsEarcSupported(qdDev):
 
     return qdDev.isEarcSupported()
 
+def TLqdGetTestSteps(qdDev, test):
+
+    """Get the valid step numbers of a multi-step test
+
+    See @ref TLqdInstrument.getTestSteps for details
+
+    @param qdDev Interface to quantumdata instrument
+    @param test Test method name, such as 'runHf1_10'
+    @return list of step numbers"""
+
+    return qdDev.getTestSteps(test)
+
+def TLqdRunAllSteps(qdDev, test, steps=None, testParameters=None, **args):
+
+    """Run every step of a multi-step test with shared setup
+
+    See @ref TLqdInstrument.runAllSteps for details
+
+    @param qdDev Interface to quantumdata instrument
+    @param test Test method name, such as 'runHf1_10'
+    @param steps Optional list of step numbers
+    @param testParameters TLqdTestParameters
+    @param args Other arguments of the test
+    @return TLqdResultTable with a row for each step"""
+
+    return qdDev.runAllSteps(test, steps, testParameters, **args)
+
+def TLqdGetCaptureSizePct(qdDev, frames=None, durationMs=None, format=None,
+                          memory=None):
+
+    """Compute the capture size percentage for a number of frames or time
+
+    See @ref TLqdInstrument.getCaptureSizePct for details
+
+    @param qdDev Interface to quantumdata instrument
+    @param frames Number of frames
+    @param durationMs Length of time in milliseconds
+    @param format Optional TLqdVideoFormatParameters
+    @param memory Optional capture memory in bytes
+    @return whole percentage, 1 - 100"""
+
+    return qdDev.getCaptureSizePct(frames, durationMs, format, memory)
+
 def TLqd7_16(qdDev, vic, callbackforSS=False, testParameters=None):
 
     """Run HDMI 1.4 source test 7-16
@@ -11998,6 +12804,37 @@ class TLqdStep(object):
     failOption = False
     replayOption = False
 
+    def __init__(self, description='', options=None, text=''):
+
+        """Create step information
+
+        @param self The new TLqdStep object
+        @param description Step description
+        @param options Optional dictionary of choice ('PASS', 'FAIL', 'OK',
+            'NO' or 'REPLAY') to the extra step string sent for it
+        @param text Step file contents the step was read from"""
+
+        ## @param description Step description
+        self.description = description
+        ## @param options Dictionary of choice to extra step string
+        self.options = dict(options or {})
+        ## @param text Step file contents
+        self.text = text
+        ## @param number Step number within the test, from 1
+        self.number = 0
+        ## @param choice Choice made for the step
+        self.choice = None
+        ## @param responseTime Seconds taken to choose
+        self.responseTime = None
+        ## @param instrumentTime Seconds the instrument took to run the step
+        self.instrumentTime = None
+
+        self.passOption = 'PASS' in self.options
+        self.failOption = 'FAIL' in self.options
+        self.okOption = 'OK' in self.options
+        self.noOption = 'NO' in self.options
+        self.replayOption = 'REPLAY' in self.options
+
 class TLqdResult(object):
     """@brief Test result
 
@@ -12310,7 +13147,7 @@ def TLqdCapture(qdDev, type, sizePct, localDirectory=None, qdDirectory=None,
                 timing=False, interpret=False, interpretScambling=False,
                 triggerData=None, triggerMask=None, triggerLaneMask=None,
                 triggerDpcdAddress=None, captureTimeLimit=None,
-                getDsc=False, getAca=False):
+                getDsc=False, getAca=False, artifactFilter=None):
     """Perform a capture
 
     @param qdDev Interface to quantumdata instrument
@@ -12334,6 +13171,7 @@ def TLqdCapture(qdDev, type, sizePct, localDirectory=None, qdDirectory=None,
     @param captureTimeLimit capture until this time limit in milliseconds
     @param getDsc Extract and uncompress Dsc frames
     @param getAca Collect ACA logs during capture
+    @param artifactFilter Optional TLqdArtifactFilter
     @return TLqdResult"""
 
     return qdDev.capture(type, sizePct, localDirectory, qdDirectory,
@@ -12341,7 +13179,7 @@ def TLqdCapture(qdDev, type, sizePct, localDirectory=None, qdDirectory=None,
                          videoCheck, getVideo, timing, interpret,
                          interpretScambling, triggerData, triggerMask,
                          triggerLaneMask, triggerDpcdAddress, captureTimeLimit,
-                         getDsc, getAca)
+                         getDsc, getAca, artifactFilter)
 
 def TLqdSetAudio(qdDev, audio):
 
@@ -12609,7 +13447,8 @@ class TLqdTestParameters(object):
                  durationMs=None, maxFrl=None, cdf=None,
                  saveCaptures=TLqdCaptureOption.All, captureSizeFrames=None,
                  collectAca=False, collectResult=False, collectEdid=False,
-                 collectSyslog=False, collectAlllogs=False, callbackSrcSet=False):
+                 collectSyslog=False, collectAlllogs=False, callbackSrcSet=False,
+                 artifactFilter=None):
 
         """Create test parameters
 
@@ -12632,7 +13471,9 @@ class TLqdTestParameters(object):
         @param collectEdid to capture Edid log
         @param collectSyslog to capture syslog
         @param collectAlllogs to capture all logs
-        @param callbackSrcSet for source setup"""
+        @param callbackSrcSet for source setup
+        @param artifactFilter TLqdArtifactFilter choosing the files to
+            transfer to localDirectory"""
 
         self.localDirectory = localDirectory
         self.qdDirectory = qdDirectory
@@ -12651,6 +13492,7 @@ class TLqdTestParameters(object):
         self.collectSyslog = collectSyslog
         self.collectAlllogs = collectAlllogs
         self.callbackSrcSet = callbackSrcSet
+        self.artifactFilter = artifactFilter
 
 class TLqdScanType(ScanType):
     """@brief Type of frame transmission
@@ -13183,14 +14025,20 @@ class TLqdVideoFormatParameters(object):
         VideoFormatParameter("LRAT", "LaneRate", False, float),
         ]
 
+    ## @private
+    # shortTag to (longTag, function converting the output value)
+    parsers = dict([(tag.shortTag, (tag.longTag, tag.type)) for tag in tags])
+
+    ## @private
+    defaults = dict([(tag.longTag, None) for tag in tags])
+
     def __init__(self):
         """Create video parameters
 
         @param self the TLqdVideoFormatParameters object"""
 
         # Create the member dictionary
-        for tag in TLqdVideoFormatParameters.tags:
-            self.__dict__[tag.longTag] = None
+        self.__dict__.update(TLqdVideoFormatParameters.defaults)
 
     def __str__(self):
         """Represent video parameters as a string
@@ -13236,3 +14084,4521 @@ class TLqdVideoFormatParameters(object):
         return None
 
     ## @endcond
+
+def TLqdEdidVics(edidData):
+
+    """Get the VICs advertised in EDID data
+
+    The Short Video Descriptors of every CTA-861 extension block are
+    collected, including the YCbCr 4:2:0 Video Data Block.
+
+    @param edidData String of EDID data ("00FFFFFFFFFFFF00...")
+    @return list of VICs in the order found"""
+
+    vics = []
+    blockLen = 256
+    start = blockLen # Skip the base block
+    while len(edidData) >= start + blockLen:
+        block = bytearray.fromhex(edidData[start:start+blockLen])
+        start = start + blockLen
+        if block[0] != 0x02: # Not a CTA-861 extension?
+            continue
+        end = block[2]
+        pos = 4
+        while pos < end and pos < len(block):
+            tag = block[pos] >> 5
+            length = block[pos] & 0x1F
+            data = block[pos+1:pos+1+length]
+            if tag == 2: # Video Data Block
+                svds = data
+            elif tag == 7 and len(data) and data[0] == 0x0E: # 4:2:0 VDB
+                svds = data[1:]
+            else:
+                svds = []
+            for svd in svds:
+                vic = svd
+                if 129 <= svd <= 192: # Native indicator set
+                    vic = svd & 0x7F
+                if vic and vic not in vics:
+                    vics.append(vic)
+            pos = pos + 1 + length
+    return vics
+
+## @cond
+def TLqdDecodeBitmap(data):
+    import numpy
+    import struct
+
+    if bytearray(data[0:2]) != bytearray(b('BM')):
+        raise RuntimeError('Not a bitmap')
+    offset = struct.unpack_from('<I', data, 10)[0]
+    width, height = struct.unpack_from('<ii', data, 18)
+    bits, compression = struct.unpack_from('<HI', data, 28)
+    if bits not in (24, 32) or compression not in (0, 3):
+        raise RuntimeError('Unsupported bitmap: ' + str(bits) +
+                           ' bits, compression ' + str(compression))
+    pixelBytes = bits // 8
+    stride = (width * pixelBytes + 3) & ~3
+    rows = numpy.frombuffer(data, numpy.uint8, stride * abs(height),
+                            offset).reshape(abs(height), stride)
+    pixels = rows[:, :width * pixelBytes].reshape(abs(height), width,
+                                                  pixelBytes)
+    if height > 0:
+        # Bottom line first
+        pixels = pixels[::-1]
+    # Stored as blue, green, red
+    return pixels[:, :, 2::-1]
+## @endcond
+
+## @cond
+def TLqdArgumentString(arguments):
+
+    """Describe the simple arguments of a test
+
+    Values are shown with str(), such as "RGB" for a TLqdColorSpace.
+    Callbacks, test parameters, None and objects without their own string
+    form are left out
+
+    @param arguments Dictionary of arguments, or a string which is returned
+        as is
+    @return string such as "vic=97 bitDepth=10" """
+
+    if arguments is None:
+        return ''
+    if not isinstance(arguments, dict):
+        return str(arguments)
+    ret = []
+    for name in sorted(arguments):
+        value = arguments[name]
+        if isinstance(value, (int, float, str, list, tuple)):
+            ret.append(name + '=' + str(value))
+            continue
+        if value is None or callable(value) or \
+            isinstance(value, TLqdTestParameters) or \
+            type(value).__str__ is object.__str__:
+            continue
+        try:
+            ret.append(name + '=' + str(value))
+        except TypeError: # __str__ returned None
+            pass
+    return ' '.join(ret)
+
+def TLqdArgumentDirectory(arguments):
+
+    """Get the local artifact folder of a test's arguments
+
+    @param arguments Dictionary of arguments
+    @return localDirectory of the testParameters argument, or None"""
+
+    testParameters = arguments.get('testParameters')
+    if testParameters is None:
+        return None
+    return testParameters.localDirectory
+
+def TLqdTakesArgument(function, name):
+
+    """Check whether a function or method has a named argument
+
+    @param function Function or bound method
+    @param name Argument name
+    @return True if the function has the argument"""
+
+    import inspect
+    try:
+        return name in inspect.signature(function).parameters
+    except AttributeError: # Python 2
+        return name in inspect.getargspec(function).args
+## @endcond
+
+class TLqdResultTable(object):
+    """@brief Table of results
+
+    Collects one row per test or command result. Rows can be streamed to a
+    file as they arrive, so long runs don't need print statements to show
+    progress"""
+
+    def __init__(self, columns=None, stream=None, progress=None):
+
+        """Create a result table
+
+        @param self the TLqdResultTable object
+        @param columns Optional list of parameter column names, in order
+        @param stream Optional file-like object; each row is written to it
+            in CSV form as soon as it is added
+        @param progress Optional TLqdProgress told about each row"""
+
+        ## @param columns Parameter column names
+        self.columns = list(columns or [])
+        ## @param stream File-like object receiving each row
+        self.stream = stream
+        ## @param rows List of rows, each a dictionary
+        self.rows = []
+        ## @param progress TLqdProgress told about each row
+        self.progress = progress
+
+        import threading
+        self.lock = threading.Lock()
+        self.writer = None
+
+    ## Columns added after the parameter columns
+    resultColumns = ['status', 'duration', 'instrument', 'info', 'errors']
+
+    def add(self, values, result, duration=None, instrument=None):
+
+        """Add a row
+
+        @param self the TLqdResultTable object
+        @param values Dictionary of parameter values
+        @param result TLqdResult
+        @param duration Optional run time in seconds
+        @param instrument Optional description of where the row was run
+        @return the new row"""
+
+        row = dict(values)
+        row['status'] = str(result.status)
+        row['duration'] = duration
+        row['instrument'] = instrument
+        row['info'] = list(result.info)
+        row['errors'] = list(result.errors)
+        row['result'] = result
+
+        with self.lock:
+            for name in values:
+                if name not in self.columns:
+                    self.columns.append(name)
+            self.rows.append(row)
+            if self.stream is not None:
+                self.writeRow(row)
+            if self.progress is not None:
+                self.progress.update(row, self.columns)
+        return row
+
+    def replace(self, row, result, duration=None, instrument=None):
+
+        """Replace the result of a row
+
+        The row keeps its place in the table. Rows already streamed can't
+        be changed, so the replaced row is streamed again.
+
+        @param self the TLqdResultTable object
+        @param row Row returned by add
+        @param result TLqdResult
+        @param duration Optional run time in seconds
+        @param instrument Optional description of where the row was run
+        @return the row"""
+
+        with self.lock:
+            previous = row['result']
+            row['status'] = str(result.status)
+            row['duration'] = duration
+            row['instrument'] = instrument
+            row['info'] = list(result.info)
+            row['errors'] = list(result.errors)
+            row['result'] = result
+            if self.stream is not None:
+                self.writeRow(row)
+            if self.progress is not None:
+                self.progress.replace(previous, row, self.columns)
+        return row
+
+    ## @cond
+    def writeRow(self, row):
+        import csv
+        if self.writer is None:
+            self.writer = csv.writer(self.stream)
+            self.writer.writerow(self.columns + self.resultColumns)
+        self.writer.writerow(self.rowValues(row))
+        if hasattr(self.stream, 'flush'):
+            self.stream.flush()
+
+    def rowValues(self, row):
+        ret = []
+        for name in self.columns:
+            ret.append(row.get(name, ''))
+        for name in self.resultColumns:
+            value = row[name]
+            if value is None:
+                value = ''
+            elif isinstance(value, list):
+                value = ' | '.join(value)
+            elif isinstance(value, float):
+                value = '%.1f' % value
+            ret.append(value)
+        return ret
+    ## @endcond
+
+    def counts(self):
+
+        """Count rows by status
+
+        @param self the TLqdResultTable object
+        @return dictionary of status string to number of rows"""
+
+        ret = {}
+        for row in self.rows:
+            ret[row['status']] = ret.get(row['status'], 0) + 1
+        return ret
+
+    def failures(self):
+
+        """Get the rows that failed
+
+        @param self the TLqdResultTable object
+        @return list of rows"""
+
+        return [row for row in self.rows if row['result'].status ==
+                TLqdStatus.FAIL]
+
+    def write(self, fileName):
+
+        """Write all rows to a CSV file
+
+        @param self the TLqdResultTable object
+        @param fileName Local file name"""
+
+        import csv
+        lFile = open(fileName, 'w')
+        writer = csv.writer(lFile)
+        writer.writerow(self.columns + self.resultColumns)
+        for row in self.rows:
+            writer.writerow(self.rowValues(row))
+        lFile.close()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __str__(self):
+        """Represent the table as aligned text
+
+        @param self the TLqdResultTable object"""
+
+        names = self.columns + ['status', 'duration']
+        lines = [names]
+        for row in self.rows:
+            lines.append([str(v) for v in self.rowValues(row)[:len(names)]])
+        widths = [max([len(str(line[i])) for line in lines])
+                  for i in range(len(names))]
+        ret = []
+        for line in lines:
+            ret.append('  '.join([str(line[i]).ljust(widths[i])
+                                  for i in range(len(names))]).rstrip())
+        return '\n'.join(ret)
+
+class TLqdSweep(object):
+    """@brief Parameter sweep
+
+    Runs a test over the Cartesian product of a set of named axes.
+
+    The combinations are expanded lazily. Duplicates are dropped, as are
+    combinations rejected by a constraint, matching an exclusion, needing a
+    license the instrument doesn't have or using a VIC the DUT's EDID doesn't
+    advertise. The remaining combinations are shared between all the
+    instruments (or cards) given to @ref run and every result is added to a
+    TLqdResultTable.
+
+    The test is either a function taking the TLqdInstrument as its first
+    argument (such as TLqdHFR2_80) or the name of a TLqdInstrument method
+    (such as 'runHfr2_80'). Axis names are used as keyword arguments."""
+
+    def __init__(self, test, fixed=None, testId=None):
+
+        """Create a sweep
+
+        @param self the TLqdSweep object
+        @param test Function or TLqdInstrument method name to run
+        @param fixed Optional dictionary of keyword arguments passed to every
+            run of the test (callback, cdf, testParameters, ...)
+        @param testId Optional test ID used when storing results, defaults to
+            the function or method name"""
+
+        ## @param test Function or method name to run
+        self.test = test
+        ## @param testId Test ID used when storing results
+        self.testId = testId
+        if testId is None:
+            self.testId = test if isinstance(test, str) else test.__name__
+        ## @param fixed Keyword arguments passed to every run
+        self.fixed = dict(fixed or {})
+        ## @param axes List of (name, values) pairs
+        self.axes = []
+        ## @param constraints Functions given a combination, False rejects it
+        self.constraints = []
+        ## @param exclusions Partial combinations that are never run
+        self.exclusions = []
+        ## @param licenses List of (license, predicate) pairs
+        self.licenses = []
+        ## @param edidVics VICs supported by the DUT, None to allow any
+        self.edidVics = None
+        ## @param vicAxis Name of the axis holding VICs
+        self.vicAxis = 'vic'
+        ## @param removed Number of combinations dropped by the last expansion
+        self.removed = 0
+
+    def addAxis(self, name, values):
+
+        """Add an axis
+
+        @param self the TLqdSweep object
+        @param name Keyword argument name used for the test
+        @param values Collection of values
+        @return the TLqdSweep object"""
+
+        self.axes.append((name, list(values)))
+        return self
+
+    def addConstraint(self, constraint):
+
+        """Add a constraint
+
+        @param self the TLqdSweep object
+        @param constraint Function given a combination dictionary, returns
+            False to drop it
+        @return the TLqdSweep object"""
+
+        self.constraints.append(constraint)
+        return self
+
+    def addExclusion(self, **values):
+
+        """Exclude every combination matching all the given values
+
+        @param self the TLqdSweep object
+        @param values Axis name/value pairs
+        @return the TLqdSweep object"""
+
+        self.exclusions.append(values)
+        return self
+
+    def requireLicense(self, license, predicate=None):
+
+        """Require a license for some or all combinations
+
+        The license is searched for in TLqdInstrument.getLicenses
+
+        @param self the TLqdSweep object
+        @param license Text expected in the license list
+        @param predicate Optional function given a combination, returns True
+            if the license is needed; defaults to every combination
+        @return the TLqdSweep object"""
+
+        self.licenses.append((license, predicate))
+        return self
+
+    def restrictToEdid(self, edidData, vicAxis='vic'):
+
+        """Drop combinations with a VIC the DUT's EDID doesn't advertise
+
+        @param self the TLqdSweep object
+        @param edidData String of EDID data ("00FFFFFFFFFFFF00...")
+        @param vicAxis Name of the axis holding VICs
+        @return the TLqdSweep object"""
+
+        self.edidVics = set(TLqdEdidVics(edidData))
+        self.vicAxis = vicAxis
+        return self
+
+    def combinations(self, licenses=None):
+
+        """Expand the axes lazily
+
+        @param self the TLqdSweep object
+        @param licenses Optional license list to check against
+        @return generator of combination dictionaries"""
+
+        import itertools
+
+        names = [axis[0] for axis in self.axes]
+        seen = set()
+        self.removed = 0
+        for values in itertools.product(*[axis[1] for axis in self.axes]):
+            key = tuple([repr(v) for v in values])
+            if key in seen:
+                continue
+            seen.add(key)
+            point = dict(zip(names, values))
+            if self.isSupported(point, licenses):
+                yield point
+            else:
+                self.removed = self.removed + 1
+
+    def count(self, licenses=None):
+
+        """Count the combinations that will be run
+
+        @param self the TLqdSweep object
+        @param licenses Optional license list to check against
+        @return number of combinations"""
+
+        count = 0
+        for point in self.combinations(licenses):
+            count = count + 1
+        return count
+
+    ## @cond
+    def isSupported(self, point, licenses):
+        for exclusion in self.exclusions:
+            match = True
+            for name in exclusion:
+                if name not in point or point[name] != exclusion[name]:
+                    match = False
+                    break
+            if match:
+                return False
+        if self.edidVics is not None and self.vicAxis in point and \
+            point[self.vicAxis] not in self.edidVics:
+            return False
+        if licenses is not None:
+            for license, predicate in self.licenses:
+                if predicate is not None and not predicate(point):
+                    continue
+                found = False
+                for entry in licenses:
+                    if entry.lower().find(license.lower()) >= 0:
+                        found = True
+                        break
+                if not found:
+                    return False
+        for constraint in self.constraints:
+            if not constraint(point):
+                return False
+        return True
+
+    def runOne(self, qdDev, point):
+        args = dict(self.fixed)
+        args.update(point)
+        if isinstance(self.test, str):
+            return getattr(qdDev, self.test)(**args)
+        return self.test(qdDev, **args)
+    ## @endcond
+
+    def run(self, instruments, table=None, stream=None, store=None,
+            dutId=None):
+
+        """Run the test for every supported combination
+
+        Each instrument entry is either a TLqdInstrument or a
+        (TLqdInstrument, cardNumber) pair. Every entry gets its own thread, so
+        to use two cards in one chassis, connect twice and give one card to
+        each connection. An exception raised by the test is recorded as a
+        failure of that combination, and the entry goes on to the next one.
+
+        @param self the TLqdSweep object
+        @param instruments TLqdInstrument or list of instrument entries
+        @param table Optional TLqdResultTable to add results to
+        @param stream Optional file-like object to stream rows to when no
+            table is given
+        @param store Optional TLqdResultStore to record every result in
+        @param dutId Optional DUT identifier for the store
+        @return TLqdResultTable"""
+
+        import threading
+        from time import time
+
+        if isinstance(instruments, TLqdInstrument):
+            instruments = [instruments]
+        workers = []
+        for entry in instruments:
+            if isinstance(entry, tuple):
+                workers.append(entry)
+            else:
+                workers.append((entry, None))
+
+        if table is None:
+            table = TLqdResultTable([axis[0] for axis in self.axes], stream)
+
+        licenses = None
+        if len(self.licenses):
+            licenses = workers[0][0].getLicenses()
+
+        points = self.combinations(licenses)
+        lock = threading.Lock()
+
+        def worker(qdDev, card):
+            name = str(qdDev.ipAddr)
+            if card is not None:
+                qdDev.setCardUsed(card)
+                name = name + ':' + str(card)
+            while True:
+                with lock:
+                    try:
+                        point = next(points)
+                    except StopIteration:
+                        return
+                start = time()
+                qdDev.timing = {}
+                try:
+                    result = self.runOne(qdDev, point)
+                except Exception as e:
+                    result = TLqdResult(TLqdStatus.FAIL, [], [str(e)])
+                table.add(point, result, time() - start, name)
+                if store is not None:
+                    args = dict(self.fixed)
+                    args.update(point)
+                    store.recordFrom(qdDev, result, self.testId, point, dutId,
+                                     start, time() - start, qdDev.timing,
+                                     TLqdArgumentDirectory(args))
+
+        if len(workers) == 1:
+            worker(workers[0][0], workers[0][1])
+            return table
+
+        threads = []
+        for qdDev, card in workers:
+            thread = threading.Thread(target=worker, args=(qdDev, card))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return table
+
+def TLqdRunSweep(qdDev, sweep, table=None, stream=None, store=None,
+                 dutId=None):
+
+    """Run a parameter sweep
+
+    See @ref TLqdSweep.run for details
+
+    @param qdDev TLqdInstrument or list of instrument entries
+    @param sweep TLqdSweep
+    @param table Optional TLqdResultTable to add results to
+    @param stream Optional file-like object to stream rows to
+    @param store Optional TLqdResultStore to record every result in
+    @param dutId Optional DUT identifier for the store
+    @return TLqdResultTable"""
+
+    return sweep.run(qdDev, table, stream, store, dutId)
+
+class TLqdSuiteTest(object):
+    """@brief Test in a TLqdSuite
+
+    One test ID with the function and arguments used to run it"""
+
+    def __init__(self, testId, test, args=None, dependsOn=None):
+
+        """Create a suite test
+
+        @param self the TLqdSuiteTest object
+        @param testId Test ID, such as 'HF1-12'
+        @param test Function taking the TLqdInstrument as its first argument
+            or the name of a TLqdInstrument method
+        @param args Optional dictionary of keyword arguments
+        @param dependsOn Optional list of prerequisite test IDs"""
+
+        ## @param testId Test ID
+        self.testId = testId
+        ## @param test Function or method name to run
+        self.test = test
+        ## @param args Keyword arguments
+        self.args = dict(args or {})
+        ## @param dependsOn Prerequisite test IDs
+        self.dependsOn = list(dependsOn or [])
+        ## @param result TLqdResult of the last run
+        self.result = None
+
+    def run(self, qdDev):
+
+        """Run the test
+
+        @param self the TLqdSuiteTest object
+        @param qdDev Interface to quantumdata instrument
+        @return TLqdResult"""
+
+        if isinstance(self.test, str):
+            return getattr(qdDev, self.test)(**self.args)
+        return self.test(qdDev, **self.args)
+
+    def describeArgs(self):
+
+        """Describe the simple arguments of the test
+
+        Callbacks and test parameters are left out
+
+        @param self the TLqdSuiteTest object
+        @return string such as "vic=97 bitDepth=10" """
+
+        return TLqdArgumentString(self.args)
+
+class TLqdSuite(object):
+    """@brief Compliance test suite with prerequisites
+
+    Runs a list of tests in order, running prerequisites first. When a
+    prerequisite fails, the tests depending on it are skipped (or moved to
+    the end) instead of each one waiting for its own capture and timeout.
+
+    Prerequisites that aren't part of the suite are ignored."""
+
+    ## Prerequisite tests checking SCDC access
+    Scdc = ['HF1-10', 'HF1-11']
+    ## Prerequisite tests checking FRL link training
+    FrlLinkTraining = ['HFR1-10', 'HFR1-11', 'HFR1-12', 'HFR1-13']
+    ## Prerequisite tests checking deep color packing and signaling
+    DeepColor = ['7-34']
+
+    ## Skip tests whose prerequisites failed
+    Skip = 'skip'
+    ## Run tests whose prerequisites failed after all other tests
+    Deprioritise = 'deprioritise'
+    ## Run every test regardless of prerequisites
+    RunAll = 'run'
+
+    def __init__(self):
+
+        """Create an empty suite
+
+        @param self the TLqdSuite object"""
+
+        ## @param tests List of TLqdSuiteTest objects in run order
+        self.tests = []
+
+    def add(self, testId, test, args=None, dependsOn=None):
+
+        """Add a test
+
+        @param self the TLqdSuite object
+        @param testId Test ID, such as 'HF1-12'
+        @param test Function taking the TLqdInstrument as its first argument
+            or the name of a TLqdInstrument method
+        @param args Optional dictionary of keyword arguments
+        @param dependsOn Optional list of prerequisite test IDs, such as
+            TLqdSuite.Scdc
+        @return TLqdSuiteTest"""
+
+        entry = TLqdSuiteTest(testId, test, args, dependsOn)
+        self.tests.append(entry)
+        return entry
+
+    def addPrerequisites(self, prerequisites, dependents):
+
+        """Make tests depend on prerequisites
+
+        @param self the TLqdSuite object
+        @param prerequisites List of prerequisite test IDs
+        @param dependents List of dependent test IDs"""
+
+        for entry in self.tests:
+            if entry.testId in dependents:
+                for prerequisite in prerequisites:
+                    if prerequisite not in entry.dependsOn and \
+                        prerequisite != entry.testId:
+                        entry.dependsOn.append(prerequisite)
+
+    ## @cond
+    def failedPrerequisite(self, entry, done):
+        # A test ID can be in the suite more than once, with different
+        # arguments; every one of them has to pass
+        for prerequisite in entry.dependsOn:
+            for other in done:
+                if other.testId == prerequisite and \
+                    other.result.status != TLqdStatus.PASS:
+                    return prerequisite
+        return None
+
+    def isReady(self, entry, pending):
+        for other in pending:
+            if other is not entry and other.testId in entry.dependsOn:
+                return False
+        return True
+
+    def runEntry(self, qdDev, entry, table, store, dutId, row=None):
+        from time import time
+        start = time()
+        qdDev.timing = {}
+        try:
+            entry.result = entry.run(qdDev)
+        except Exception as e:
+            entry.result = TLqdResult(TLqdStatus.FAIL, [], [str(e)])
+        if row is None:
+            table.add({'test': entry.testId,
+                       'arguments': entry.describeArgs()},
+                      entry.result, time() - start)
+        else:
+            table.replace(row, entry.result, time() - start)
+        if store is not None:
+            store.recordFrom(qdDev, entry.result, entry.testId,
+                             entry.describeArgs(), dutId, start, time() - start,
+                             qdDev.timing, TLqdArgumentDirectory(entry.args))
+    ## @endcond
+
+    def run(self, qdDev, mode='skip', runSkippedAtEnd=False, table=None,
+            stream=None, store=None, dutId=None):
+
+        """Run the suite
+
+        A test counts as failed for its dependents unless it passed, so a test
+        skipped for a failed prerequisite also skips its own dependents.
+
+        @param self the TLqdSuite object
+        @param qdDev Interface to quantumdata instrument
+        @param mode TLqdSuite.Skip, TLqdSuite.Deprioritise or TLqdSuite.RunAll
+        @param runSkippedAtEnd Run the skipped tests once everything else is
+            done; their results replace the skipped rows in the table (a
+            stream gets the new rows at the end)
+        @param table Optional TLqdResultTable to add results to
+        @param stream Optional file-like object to stream rows to when no
+            table is given
+        @param store Optional TLqdResultStore to record results in; tests
+            skipped for a failed prerequisite aren't recorded
+        @param dutId Optional DUT identifier for the store
+        @return TLqdResultTable"""
+
+        if table is None:
+            table = TLqdResultTable(['test', 'arguments'], stream)
+
+        pending = list(self.tests)
+        deferred = []
+        skipped = []
+        done = []
+        while len(pending):
+            entry = None
+            for candidate in pending:
+                if self.isReady(candidate, pending):
+                    entry = candidate
+                    break
+            if entry is None: # Circular prerequisites
+                entry = pending[0]
+            pending.remove(entry)
+
+            failed = None
+            if mode != TLqdSuite.RunAll:
+                failed = self.failedPrerequisite(entry, done)
+                for prerequisite in entry.dependsOn:
+                    if prerequisite in [other.testId for other in deferred]:
+                        failed = prerequisite
+            if failed is None:
+                self.runEntry(qdDev, entry, table, store, dutId)
+            elif mode == TLqdSuite.Deprioritise:
+                deferred.append(entry)
+                continue
+            else:
+                entry.result = TLqdResult(TLqdStatus.SKIPPED, [],
+                    ['Prerequisite ' + failed + ' did not pass'])
+                row = table.add({'test': entry.testId,
+                                 'arguments': entry.describeArgs()},
+                                entry.result)
+                skipped.append((entry, row))
+            done.append(entry)
+
+        for entry in deferred:
+            self.runEntry(qdDev, entry, table, store, dutId)
+            done.append(entry)
+
+        if runSkippedAtEnd:
+            for entry, row in skipped:
+                self.runEntry(qdDev, entry, table, store, dutId, row)
+
+        return table
+
+def TLqdRunSuite(qdDev, suite, mode='skip', runSkippedAtEnd=False,
+                 table=None, stream=None, store=None, dutId=None):
+
+    """Run a compliance test suite
+
+    See @ref TLqdSuite.run for details
+
+    @param qdDev Interface to quantumdata instrument
+    @param suite TLqdSuite
+    @param mode TLqdSuite.Skip, TLqdSuite.Deprioritise or TLqdSuite.RunAll
+    @param runSkippedAtEnd Run the skipped tests once everything else is done
+    @param table Optional TLqdResultTable to add results to
+    @param stream Optional file-like object to stream rows to
+    @param store Optional TLqdResultStore to record results in
+    @param dutId Optional DUT identifier for the store
+    @return TLqdResultTable"""
+
+    return suite.run(qdDev, mode, runSkippedAtEnd, table, stream, store,
+                     dutId)
+
+class TLqdResultStore(object):
+    """@brief Local store of test results
+
+    Keeps every recorded TLqdResult in an SQLite database file together with
+    the test ID, arguments, DUT ID, instrument, firmware, timing and artifact
+    paths, indexed by test, DUT and date. The query methods answer pass-rate
+    trend, flaky test and firmware regression questions without going back
+    to the logs.
+
+    Times are seconds since the epoch, as returned by time.time()"""
+
+    def __init__(self, fileName):
+
+        """Open (or create) a result store
+
+        @param self the TLqdResultStore object
+        @param fileName Local database file, ':memory:' for a temporary one"""
+
+        import sqlite3
+        import threading
+
+        ## @param fileName Local database file
+        self.fileName = fileName
+        ## @param firmware Cached getVersion output for each instrument
+        self.firmware = {}
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(fileName, check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS results ('
+                        'id INTEGER PRIMARY KEY, testId TEXT, arguments TEXT, '
+                        'dutId TEXT, instrument TEXT, firmware TEXT, '
+                        'started REAL, duration REAL, status TEXT, info TEXT, '
+                        'errors TEXT, timing TEXT, artifacts TEXT)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS resultsTest ON '
+                        'results (testId, started)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS resultsDut ON '
+                        'results (dutId, started)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS resultsStarted ON '
+                        'results (started)')
+        self.db.commit()
+
+    def close(self):
+
+        """Close the store
+
+        @param self the TLqdResultStore object"""
+
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def record(self, result, testId, arguments=None, dutId=None,
+               instrument=None, firmware=None, started=None, duration=None,
+               timing=None, artifacts=None):
+
+        """Record a result
+
+        @param self the TLqdResultStore object
+        @param result TLqdResult
+        @param testId Test ID, such as 'HF1-12'
+        @param arguments Optional string or dictionary describing the
+            arguments; only numbers, strings and booleans are kept from a
+            dictionary
+        @param dutId Optional DUT identifier
+        @param instrument Optional instrument identifier
+        @param firmware Optional instrument firmware version
+        @param started Optional start time, defaults to now
+        @param duration Optional run time in seconds
+        @param timing Optional dictionary of phase name to seconds
+        @param artifacts Optional list of artifact paths
+        @return ID of the new record"""
+
+        import json
+        from time import time
+
+        arguments = TLqdArgumentString(arguments)
+        if started is None:
+            started = time()
+        if timing is not None:
+            timing = json.dumps(timing)
+
+        with self.lock:
+            cursor = self.db.execute('INSERT INTO results (testId, '
+                'arguments, dutId, instrument, firmware, started, duration, '
+                'status, info, errors, timing, artifacts) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (testId, arguments, dutId, instrument, firmware,
+                 started, duration, str(result.status).upper(),
+                 json.dumps(list(result.info)),
+                 json.dumps(list(result.errors)), timing,
+                 json.dumps(list(artifacts or []))))
+            self.db.commit()
+            return cursor.lastrowid
+
+    def recordFrom(self, qdDev, result, testId, arguments=None, dutId=None,
+                   started=None, duration=None, timing=None,
+                   localDirectory=None):
+
+        """Record a result from an instrument
+
+        The instrument firmware is queried with getVersion once per instrument
+        and remembered
+
+        @param self the TLqdResultStore object
+        @param qdDev Interface to quantumdata instrument
+        @param result TLqdResult
+        @param testId Test ID, such as 'HF1-12'
+        @param arguments Optional string or dictionary of arguments
+        @param dutId Optional DUT identifier
+        @param started Optional start time, defaults to now
+        @param duration Optional run time in seconds
+        @param timing Optional dictionary of phase name to seconds
+        @param localDirectory Optional folder holding the test artifacts
+        @return ID of the new record"""
+
+        import os
+
+        instrument = str(qdDev.ipAddr)
+        if qdDev.cardUsed is not None:
+            instrument = instrument + ':' + str(qdDev.cardUsed)
+        if qdDev.ipAddr not in self.firmware:
+            self.firmware[qdDev.ipAddr] = qdDev.getVersion()
+
+        artifacts = []
+        if localDirectory is not None and os.path.isdir(localDirectory):
+            for root, dirs, files in os.walk(localDirectory):
+                for name in files:
+                    artifacts.append(os.path.join(root, name))
+
+        return self.record(result, testId, arguments, dutId, instrument,
+                           self.firmware[qdDev.ipAddr], started, duration,
+                           timing, artifacts)
+
+    ## @cond
+    def where(self, testId=None, dutId=None, since=None, until=None,
+              firmware=None):
+        clauses = []
+        values = []
+        for column, value in [('testId', testId), ('dutId', dutId),
+                              ('firmware', firmware)]:
+            if value is not None:
+                clauses.append(column + ' = ?')
+                values.append(value)
+        if since is not None:
+            clauses.append('started >= ?')
+            values.append(since)
+        if until is not None:
+            clauses.append('started < ?')
+            values.append(until)
+        if len(clauses) == 0:
+            return '', values
+        return ' WHERE ' + ' AND '.join(clauses), values
+
+    def query(self, sql, values):
+        with self.lock:
+            return self.db.execute(sql, values).fetchall()
+    ## @endcond
+
+    def results(self, testId=None, dutId=None, since=None, until=None,
+                firmware=None):
+
+        """Get recorded results, oldest first
+
+        @param self the TLqdResultStore object
+        @param testId Optional test ID
+        @param dutId Optional DUT identifier
+        @param since Optional earliest start time
+        @param until Optional latest start time (exclusive)
+        @param firmware Optional firmware version
+        @return list of dictionaries, one per result"""
+
+        import json
+
+        columns = ['id', 'testId', 'arguments', 'dutId', 'instrument',
+                   'firmware', 'started', 'duration', 'status', 'info',
+                   'errors', 'timing', 'artifacts']
+        where, values = self.where(testId, dutId, since, until, firmware)
+        ret = []
+        for row in self.query('SELECT ' + ', '.join(columns) +
+                              ' FROM results' + where +
+                              ' ORDER BY started, id', values):
+            entry = dict(zip(columns, row))
+            for name in ['info', 'errors', 'timing', 'artifacts']:
+                if entry[name] is not None:
+                    entry[name] = json.loads(entry[name])
+            ret.append(entry)
+        return ret
+
+    def passRate(self, testId=None, dutId=None, since=None, until=None,
+                 period=86400):
+
+        """Get the pass rate trend
+
+        @param self the TLqdResultStore object
+        @param testId Optional test ID
+        @param dutId Optional DUT identifier
+        @param since Optional earliest start time
+        @param until Optional latest start time (exclusive)
+        @param period Length of each trend bucket in seconds, default a day
+        @return list of (bucket start time, runs, passes, pass rate)"""
+
+        where, values = self.where(testId, dutId, since, until)
+        ret = []
+        for bucket, runs, passes in self.query(
+                'SELECT CAST(started / ? AS INTEGER) AS bucket, COUNT(*), '
+                "SUM(CASE WHEN status = 'PASS' THEN 1 ELSE 0 END) "
+                'FROM results' + where + ' GROUP BY bucket ORDER BY bucket',
+                [period] + values):
+            ret.append((bucket * period, runs, passes,
+                        float(passes) / runs))
+        return ret
+
+    def flakyTests(self, dutId=None, since=None, until=None, minRuns=2):
+
+        """Find tests that both passed and failed with the same arguments
+
+        Skipped runs are ignored
+
+        @param self the TLqdResultStore object
+        @param dutId Optional DUT identifier
+        @param since Optional earliest start time
+        @param until Optional latest start time (exclusive)
+        @param minRuns Minimum number of pass/fail runs to consider
+        @return list of (test ID, arguments, runs, passes, flips) sorted by
+            the number of pass/fail flips, most first"""
+
+        where, values = self.where(None, dutId, since, until)
+        history = {}
+        for testId, arguments, status in self.query(
+                'SELECT testId, arguments, status FROM results' + where +
+                ' ORDER BY started, id', values):
+            if status in ('PASS', 'FAIL'):
+                history.setdefault((testId, arguments), []).append(status)
+
+        ret = []
+        for key in history:
+            statuses = history[key]
+            passes = statuses.count('PASS')
+            if len(statuses) < minRuns or passes == 0 or \
+                passes == len(statuses):
+                continue
+            flips = 0
+            for i in range(1, len(statuses)):
+                if statuses[i] != statuses[i-1]:
+                    flips = flips + 1
+            ret.append((key[0], key[1], len(statuses), passes, flips))
+        ret.sort(key=lambda entry: -entry[4])
+        return ret
+
+    def regressions(self, testId=None, dutId=None, since=None, until=None):
+
+        """Find tests whose pass rate dropped with a newer firmware
+
+        Firmware versions are ordered by when they were first recorded
+
+        @param self the TLqdResultStore object
+        @param testId Optional test ID
+        @param dutId Optional DUT identifier
+        @param since Optional earliest start time
+        @param until Optional latest start time (exclusive)
+        @return list of (test ID, arguments, previous firmware, previous pass
+            rate, firmware, pass rate)"""
+
+        where, values = self.where(testId, dutId, since, until)
+        firstSeen = {}
+        rates = {}
+        for testId, arguments, firmware, status, started in self.query(
+                'SELECT testId, arguments, firmware, status, started '
+                'FROM results' + where + ' ORDER BY started, id', values):
+            if status not in ('PASS', 'FAIL'):
+                continue
+            if firmware not in firstSeen:
+                firstSeen[firmware] = started
+            counts = rates.setdefault((testId, arguments), {}).setdefault(
+                firmware, [0, 0])
+            counts[0] = counts[0] + 1
+            if status == 'PASS':
+                counts[1] = counts[1] + 1
+
+        ret = []
+        for key in sorted(rates):
+            versions = sorted(rates[key], key=lambda f: firstSeen[f])
+            for i in range(1, len(versions)):
+                old = rates[key][versions[i-1]]
+                new = rates[key][versions[i]]
+                oldRate = float(old[1]) / old[0]
+                newRate = float(new[1]) / new[0]
+                if newRate < oldRate:
+                    ret.append((key[0], key[1], versions[i-1], oldRate,
+                                versions[i], newRate))
+        return ret
+
+class TLqdDurationModel(object):
+    """@brief Learned test durations
+
+    Estimates how long a test takes from the wall-clock times recorded for
+    the same test ID and arguments. Tests run with other arguments are used
+    when there's no exact match, then the mean of everything seen, then
+    defaultDuration."""
+
+    def __init__(self, defaultDuration=60.0, history=20):
+
+        """Create an empty model
+
+        @param self the TLqdDurationModel object
+        @param defaultDuration Seconds assumed for a test never seen before
+        @param history Number of recent runs kept for each test and arguments"""
+
+        ## @param defaultDuration Seconds assumed for a test never seen before
+        self.defaultDuration = defaultDuration
+        ## @param history Number of recent runs kept for each key
+        self.history = history
+        ## @param durations Recent durations for each (test ID, arguments)
+        self.durations = {}
+        ## @param phases Recent phase timings for each (test ID, arguments)
+        self.phases = {}
+
+    def add(self, testId, arguments, duration, timing=None):
+
+        """Add a run
+
+        @param self the TLqdDurationModel object
+        @param testId Test ID, such as 'HF1-12'
+        @param arguments String or dictionary of arguments
+        @param duration Run time in seconds
+        @param timing Optional dictionary of phase name to seconds"""
+
+        key = (testId, TLqdArgumentString(arguments))
+        runs = self.durations.setdefault(key, [])
+        runs.append(duration)
+        del runs[:-self.history]
+        if timing:
+            runs = self.phases.setdefault(key, [])
+            runs.append(timing)
+            del runs[:-self.history]
+
+    def learn(self, store, testId=None, dutId=None, since=None):
+
+        """Add the runs recorded in a result store
+
+        @param self the TLqdDurationModel object
+        @param store TLqdResultStore
+        @param testId Optional test ID
+        @param dutId Optional DUT identifier
+        @param since Optional earliest start time
+        @return number of runs added"""
+
+        count = 0
+        for row in store.results(testId, dutId, since):
+            if row['duration'] is not None:
+                self.add(row['testId'], row['arguments'], row['duration'],
+                         row['timing'])
+                count = count + 1
+        return count
+
+    def estimate(self, testId, arguments=None):
+
+        """Estimate the duration of a test
+
+        @param self the TLqdDurationModel object
+        @param testId Test ID, such as 'HF1-12'
+        @param arguments Optional string or dictionary of arguments
+        @return seconds"""
+
+        key = (testId, TLqdArgumentString(arguments))
+        if key in self.durations:
+            runs = self.durations[key]
+        else:
+            runs = []
+            for other in self.durations:
+                if other[0] == testId:
+                    runs.extend(self.durations[other])
+        if len(runs) == 0:
+            for other in self.durations:
+                runs.extend(self.durations[other])
+        if len(runs) == 0:
+            return self.defaultDuration
+        return float(sum(runs)) / len(runs)
+
+    def estimatePhases(self, testId, arguments=None):
+
+        """Estimate the time spent in each phase of a test
+
+        See @ref TLqdInstrument.addTiming for the phase names
+
+        @param self the TLqdDurationModel object
+        @param testId Test ID, such as 'HF1-12'
+        @param arguments Optional string or dictionary of arguments
+        @return dictionary of phase name to mean seconds, empty if no phase
+            timing was recorded"""
+
+        runs = self.phases.get((testId, TLqdArgumentString(arguments)), [])
+        ret = {}
+        for timing in runs:
+            for phase in timing:
+                ret[phase] = ret.get(phase, 0) + timing[phase]
+        for phase in ret:
+            ret[phase] = float(ret[phase]) / len(runs)
+        return ret
+
+    ## @cond
+    def planItems(self, plan, licenses=None):
+        if isinstance(plan, TLqdSuite):
+            return [(entry.testId, entry.describeArgs())
+                    for entry in plan.tests]
+        if isinstance(plan, TLqdSweep):
+            return [(plan.testId, TLqdArgumentString(point))
+                    for point in plan.combinations(licenses)]
+        return [(entry[0], TLqdArgumentString(entry[1])) for entry in plan]
+    ## @endcond
+
+    def estimateSuite(self, plan, licenses=None, workers=1):
+
+        """Estimate how long a plan takes to run
+
+        @param self the TLqdDurationModel object
+        @param plan TLqdSuite, TLqdSweep or list of (test ID, arguments)
+        @param licenses Optional license list used to expand a TLqdSweep
+        @param workers Number of instruments or cards sharing the work
+        @return seconds"""
+
+        total = 0.0
+        for testId, arguments in self.planItems(plan, licenses):
+            total = total + self.estimate(testId, arguments)
+        return total / max(workers, 1)
+
+class TLqdProgress(object):
+    """@brief Progress and ETA of a running plan
+
+    Give one to a TLqdResultTable. Each new row is written as a line
+    such as "12/40 done, 0:14:02 elapsed, about 0:41:10 left". The estimate
+    for the remaining tests is scaled by how the finished tests compared to
+    their estimates, so a slow station corrects itself as it goes."""
+
+    def __init__(self, model, plan, stream=None, licenses=None):
+
+        """Start tracking a plan
+
+        @param self the TLqdProgress object
+        @param model TLqdDurationModel
+        @param plan TLqdSuite, TLqdSweep or list of (test ID, arguments)
+        @param stream Optional file-like object for progress lines, defaults
+            to sys.stdout
+        @param licenses Optional license list used to expand a TLqdSweep"""
+
+        import sys
+        from time import time
+
+        ## @param model TLqdDurationModel
+        self.model = model
+        ## @param stream File-like object for progress lines
+        self.stream = stream or sys.stdout
+        ## @param testId Test ID of a sweep plan
+        self.testId = None
+        if isinstance(plan, TLqdSweep):
+            self.testId = plan.testId
+        ## @param total Number of tests in the plan
+        self.total = 0
+        ## @param estimated Estimated seconds for the whole plan
+        self.estimated = 0.0
+        for testId, arguments in model.planItems(plan, licenses):
+            self.total = self.total + 1
+            self.estimated = self.estimated + model.estimate(testId, arguments)
+        ## @param done Number of tests finished
+        self.done = 0
+        ## @param estimatedDone Estimated seconds of the finished tests
+        self.estimatedDone = 0.0
+        ## @param started Time tracking started
+        self.started = time()
+
+    def remaining(self):
+
+        """Estimate the time left
+
+        @param self the TLqdProgress object
+        @return seconds"""
+
+        from time import time
+
+        left = max(self.estimated - self.estimatedDone, 0.0)
+        if self.estimatedDone > 0:
+            left = left * (time() - self.started) / self.estimatedDone
+        return left
+
+    ## @cond
+    def estimate(self, row, columns):
+        if 'test' in row:
+            testId, arguments = row['test'], row.get('arguments')
+        else:
+            testId = self.testId
+            arguments = dict([(name, row[name]) for name in columns
+                              if name in row])
+        return self.model.estimate(testId, arguments)
+
+    def account(self, status, estimate, sign):
+        if status == TLqdStatus.SKIPPED:
+            # Skipped without running, so it says nothing about the pace
+            self.estimated = self.estimated - sign * estimate
+        else:
+            self.estimatedDone = self.estimatedDone + sign * estimate
+    ## @endcond
+
+    def update(self, row, columns):
+
+        """Note a finished test
+
+        @param self the TLqdProgress object
+        @param row Row added to the TLqdResultTable
+        @param columns Parameter column names of the table"""
+
+        self.done = self.done + 1
+        self.account(row['result'].status, self.estimate(row, columns), 1)
+        self.write()
+
+    def replace(self, previous, row, columns):
+
+        """Note a test that was run again
+
+        The test still counts once, and the estimate taken off for a
+        skipped test is added back before the new result is counted
+
+        @param self the TLqdProgress object
+        @param previous TLqdResult the row had before
+        @param row Row replaced in the TLqdResultTable
+        @param columns Parameter column names of the table"""
+
+        estimate = self.estimate(row, columns)
+        self.account(previous.status, estimate, -1)
+        self.account(row['result'].status, estimate, 1)
+        self.write()
+
+    ## @cond
+    def write(self):
+        from datetime import timedelta
+        from time import time
+
+        self.stream.write('%d/%d done, %s elapsed, about %s left\n' %
+                          (self.done, self.total,
+                           timedelta(seconds=int(time() - self.started)),
+                           timedelta(seconds=int(self.remaining()))))
+        if hasattr(self.stream, 'flush'):
+            self.stream.flush()
+    ## @endcond
+
+class TLqdStepResponder(object):
+    """@brief Rule based answers for DP compliance test steps
+
+    Can be given anywhere a DP compliance step callback is expected. The
+    first rule whose pattern is found in the step description, and whose
+    choice the step offers, gives the answer. Otherwise the fallback
+    callback is asked, then the default choice is used."""
+
+    def __init__(self, default=None, fallback=None):
+
+        """Create a responder without rules
+
+        @param self the TLqdStepResponder object
+        @param default Optional choice when no rule matches, such as
+            TLqdStepStatus.PASS
+        @param fallback Optional callback taking a TLqdStep, asked when no
+            rule matches"""
+
+        ## @param default Choice when no rule matches
+        self.default = default
+        ## @param fallback Callback asked when no rule matches
+        self.fallback = fallback
+        ## @param rules List of (compiled pattern, choice)
+        self.rules = []
+
+    def addRule(self, pattern, choice):
+
+        """Add a rule
+
+        @param self the TLqdStepResponder object
+        @param pattern Regular expression searched for in the description
+        @param choice TLqdStepStatus or string to answer with"""
+
+        import re
+        self.rules.append((re.compile(pattern, re.IGNORECASE), choice))
+
+    def __call__(self, step):
+
+        """Choose the answer for a step
+
+        @param self the TLqdStepResponder object
+        @param step TLqdStep
+        @return the choice, or None if there isn't one"""
+
+        description = step.description
+        if isinstance(description, list):
+            description = ' '.join(description)
+        for pattern, choice in self.rules:
+            if pattern.search(description) and \
+                str(choice).upper() in step.options:
+                return choice
+        if self.fallback is not None:
+            return self.fallback(step)
+        return self.default
+
+class TLqdDpStepEngine(object):
+    """@brief Runs the interactive steps of a DP compliance test
+
+    After each instrument command the steps file is read into memory over
+    one FTP connection, parsed in a single pass into a TLqdStep, answered by
+    the responder and removed before the command is repeated with the
+    chosen extra step. The time taken by the responder and the instrument
+    is kept with each step."""
+
+    ## @cond
+    stepPattern = None
+    ## @endcond
+
+    def __init__(self, qdDev, responder):
+
+        """Create a step engine
+
+        @param self the TLqdDpStepEngine object
+        @param qdDev TLqdInstrument
+        @param responder Callback or TLqdStepResponder taking a TLqdStep and
+            returning 'PASS', 'FAIL', 'OK', 'NO' or 'REPLAY'"""
+
+        import re
+
+        ## @param qdDev TLqdInstrument
+        self.qdDev = qdDev
+        ## @param responder Callback or TLqdStepResponder
+        self.responder = responder
+        ## @param steps TLqdStep list, in the order they ran
+        self.steps = []
+        self.ftp = None
+
+        if TLqdDpStepEngine.stepPattern is None:
+            # An option runs to the next option on its line, as a line can
+            # offer several. The description is matched in a lookahead so
+            # options inside it are still found.
+            choice = r'\b(PASS|FAIL|OK|NO|REPLAY),'
+            TLqdDpStepEngine.stepPattern = re.compile(
+                choice + r'([^\n]*?\d+\s+\d+[^\n]*?)(?=\s*' + choice +
+                r'|$)|text:(?=((?:[^.]*.){5}))', re.MULTILINE)
+
+    def parse(self, stepFileInfo):
+
+        """Parse the steps file contents
+
+        @param self the TLqdDpStepEngine object
+        @param stepFileInfo Steps file contents
+        @return TLqdStep"""
+
+        options = {}
+        description = []
+        for found in self.stepPattern.finditer(stepFileInfo):
+            choice, extraStep, text = found.group(1, 2, 4)
+            if text is not None:
+                description.append(text)
+            elif choice not in options:
+                extraStep = self.qdDev.dpGetExtraStep([extraStep])
+                if extraStep:
+                    options[choice] = extraStep
+        return TLqdStep(description, options, stepFileInfo)
+
+    def respond(self, step):
+
+        """Ask the responder about a step
+
+        @param self the TLqdDpStepEngine object
+        @param step TLqdStep
+        @return extra step string for the choice"""
+
+        from time import time
+
+        start = time()
+        choice = self.responder(step)
+        step.responseTime = time() - start
+        if choice is None:
+            raise RuntimeError('No answer for DP compliance step ' +
+                               str(step.number) + ', offering ' +
+                               ', '.join(sorted(step.options)))
+        step.choice = str(choice).upper()
+        if step.choice not in step.options:
+            raise RuntimeError('DP compliance step ' + str(step.number) +
+                               ' has no ' + step.choice + ' option, only ' +
+                               ', '.join(sorted(step.options)))
+        return step.options[step.choice]
+
+    ## @cond
+    def ftpCall(self, operation):
+        from ftplib import FTP, all_errors
+        for attempt in range(2):
+            if self.ftp is None:
+                self.ftp = FTP(self.qdDev.ipAddr, self.qdDev.user,
+                               self.qdDev.passwd)
+                self.ftp.login(self.qdDev.user, self.qdDev.passwd)
+            try:
+                return operation(self.ftp)
+            except all_errors:
+                # The connection may have timed out while waiting for an
+                # answer, so try once more on a new one
+                self.close()
+                if attempt:
+                    raise
+
+    def readSteps(self):
+        from ftplib import error_perm
+        data = []
+        def read(ftp):
+            del data[:]
+            try:
+                ftp.retrbinary('RETR ' + DpStepsFile, data.append)
+            except error_perm:
+                # No steps file, so there are no more steps
+                pass
+        self.ftpCall(read)
+        text = b('').join(data)
+        if not isinstance(text, str):
+            text = text.decode('latin-1')
+        return text
+
+    def deleteSteps(self):
+        from ftplib import error_perm
+        def delete(ftp):
+            try:
+                ftp.delete(DpStepsFile)
+            except error_perm:
+                pass
+        self.ftpCall(delete)
+
+    def close(self):
+        if self.ftp is not None:
+            try:
+                self.ftp.quit()
+            except:
+                pass
+            self.ftp = None
+    ## @endcond
+
+    def run(self, cmd):
+
+        """Run the compliance test command and all of its steps
+
+        @param self the TLqdDpStepEngine object
+        @param cmd Compliance test command
+        @return TLqdResult of the last command"""
+
+        from time import time
+
+        qdDev = self.qdDev
+        results = qdDev.compileCommandResult(qdDev.command(cmd))
+        try:
+            while results.status == "PASS" and self.responder:
+                stepFileInfo = self.readSteps()
+
+                # Test finished in case no more steps exist
+                if len(stepFileInfo) == 0:
+                    break
+
+                step = self.parse(stepFileInfo)
+                step.number = len(self.steps) + 1
+                self.steps.append(step)
+                extraStep = self.respond(step)
+                self.deleteSteps()
+
+                if len(extraStep) == 0:
+                    raise RuntimeError('Step file {stepsFile} is empty'.format(stepsFile=DpStepsFile))
+
+                start = time()
+                results = qdDev.compileCommandResult(
+                    qdDev.command(cmd + ' -s ' + extraStep))
+                step.instrumentTime = time() - start
+        finally:
+            self.close()
+        return results
+
+class TLqdDpBatch(object):
+    """@brief Runs a list of DP compliance tests as one session
+
+    The logs are removed and the instrument version read once for the
+    whole batch. After each test the results, debug, ACA and system logs
+    are moved into a per-test directory on the instrument instead of being
+    fetched. Only the logs of failed tests and the items asked for in
+    TLqdTestParameters (collectResult, collectAca, collectEdid,
+    collectSyslog or collectAlllogs) come back at once; anything else can
+    be fetched later with fetch() until the batch is closed.
+
+    Unlike a single test, results are reported even when the test
+    parameters have no localDirectory."""
+
+    def __init__(self, qdDev, remoteDirectory=None):
+
+        """Start a batch
+
+        @param self the TLqdDpBatch object
+        @param qdDev TLqdInstrument
+        @param remoteDirectory Optional instrument directory for the rotated
+            logs, defaults to a new one in /tmp"""
+
+        from time import strftime
+
+        ## @param qdDev TLqdInstrument
+        self.qdDev = qdDev
+        ## @param remoteDirectory Instrument directory for the rotated logs
+        self.remoteDirectory = remoteDirectory
+        if remoteDirectory is None:
+            self.remoteDirectory = '/tmp/dpbatch_' + strftime('%Y_%m_%d_%H_%M_%S')
+        ## @param tests Dictionary of test name to its rotated log directory
+        self.tests = {}
+
+        qdDev.dpInitialize()
+        ## @param version Instrument version, read once
+        self.version = qdDev.command('ver')
+        qdDev.command('exec mkdir -p ' + self.remoteDirectory)
+        qdDev.dpBatch = self
+
+    def run(self, test, testName, callback=None, testParameters=None):
+
+        """Run a DP compliance test in the batch
+
+        @param self the TLqdDpBatch object
+        @param test TLqdInstrument method name, such as 'runDp14SourceTest'
+        @param testName Testname to execute
+        @param callback Callback function to verify step file information
+        @param testParameters TLqdTestParameters
+        @return TLqdResult"""
+
+        if testParameters is None:
+            testParameters = TLqdTestParameters() # Dummy values
+        return getattr(self.qdDev, test)(testName, callback, testParameters)
+
+    def runAll(self, tests, testParameters=None, table=None, stream=None):
+
+        """Run a list of DP compliance tests in the batch
+
+        @param self the TLqdDpBatch object
+        @param tests List of (method name, test name, callback)
+        @param testParameters TLqdTestParameters used by every test
+        @param table Optional TLqdResultTable to add results to
+        @param stream Optional file-like object to stream rows to when no
+            table is given
+        @return TLqdResultTable"""
+
+        from time import time
+
+        if table is None:
+            table = TLqdResultTable(['test'], stream)
+        for test, testName, callback in tests:
+            start = time()
+            try:
+                result = self.run(test, testName, callback, testParameters)
+            except Exception as e:
+                result = TLqdResult(TLqdStatus.FAIL, [], [str(e)])
+            table.add({'test': testName}, result, time() - start)
+        return table
+
+    ## @cond
+    def finish(self, testName, tp, results):
+        qdDev = self.qdDev
+        if testName is None:
+            testName = 'test' + str(len(self.tests) + 1)
+
+        if results.status == "PASS":
+            results = qdDev.dpCompileComplianceResult(
+                qdDev.readFile(DpResultsFile))
+        self.rotate(testName)
+
+        if tp.localDirectory is not None:
+            import os.path
+            directory = os.path.join(tp.localDirectory, testName)
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            lFile = open(os.path.join(directory, "ver.txt"), 'w')
+            lFile.write(self.version)
+            lFile.close()
+
+            failed = results.status == "FAIL"
+            items = []
+            if failed or tp.collectResult or tp.collectAlllogs:
+                items.append(DpResultsFile)
+            if failed or tp.collectAca or tp.collectAlllogs:
+                items.append(DpAcaFile)
+            if failed or tp.collectSyslog or tp.collectAlllogs:
+                items.append(self.systemFile())
+            if tp.collectAlllogs:
+                items.append(DpDebugFile)
+            if tp.collectEdid or tp.collectAlllogs:
+                items.append(DpEdidFile)
+            self.fetch(testName, directory, items)
+        return results
+
+    def systemFile(self):
+        if self.qdDev.cardUsed is None:
+            return None
+        return DpSystemFile + str(self.qdDev.cardUsed) + '.log'
+
+    def rotate(self, testName):
+        qdDev = self.qdDev
+        remote = qdDev.appendFile(self.remoteDirectory, testName)
+        self.tests[testName] = remote
+        qdDev.command('exec mkdir -p ' + remote)
+        qdDev.command('exec mv -f ' + ' '.join([DpResultsFile, DpStepsFile,
+            DpDebugFile, DpAcaFile, DpEdidFile]) + ' ' + remote)
+        if self.systemFile() is not None:
+            qdDev.command('exec cp ' + self.systemFile() + ' ' + remote)
+        qdDev.command('log truncate')
+    ## @endcond
+
+    def fetch(self, testName, localDirectory, items=None):
+
+        """Fetch the rotated logs of a test
+
+        @param self the TLqdDpBatch object
+        @param testName Test name
+        @param localDirectory Local folder for the logs
+        @param items Optional list of the log names to fetch, such as
+            DpResultsFile or DpAcaFile; defaults to all of them"""
+
+        import os
+        import os.path
+        from ftplib import all_errors
+
+        if items is None:
+            items = [DpResultsFile, DpDebugFile, DpAcaFile, self.systemFile(),
+                     DpEdidFile]
+        if not os.path.exists(localDirectory):
+            os.makedirs(localDirectory)
+        remote = self.tests[testName]
+        for item in items:
+            if item is None:
+                continue
+            name = os.path.basename(item)
+            try:
+                if item == DpEdidFile:
+                    self.qdDev.transferResults(localDirectory,
+                        self.qdDev.appendFile(remote, name))
+                else:
+                    self.qdDev.getFile(self.qdDev.appendFile(remote, name),
+                        self.qdDev.appendFile(localDirectory, name))
+            except all_errors + (IndexError,):
+                # Not every test leaves every log behind
+                pass
+
+    def close(self, removeRemote=True):
+
+        """End the batch
+
+        @param self the TLqdDpBatch object
+        @param removeRemote Set to remove the rotated logs from the
+            instrument"""
+
+        if self.qdDev.dpBatch is self:
+            self.qdDev.dpBatch = None
+        if removeRemote:
+            self.qdDev.command('exec rm -fr ' + self.remoteDirectory)
+
+def TLqdRunDpBatch(qdDev, tests, testParameters=None, table=None,
+                   stream=None):
+
+    """Run a list of DP compliance tests as one session
+
+    See @ref TLqdDpBatch for details
+
+    @param qdDev Interface to quantumdata instrument
+    @param tests List of (method name, test name, callback)
+    @param testParameters TLqdTestParameters used by every test
+    @param table Optional TLqdResultTable to add results to
+    @param stream Optional file-like object to stream rows to
+    @return TLqdResultTable"""
+
+    batch = TLqdDpBatch(qdDev)
+    try:
+        return batch.runAll(tests, testParameters, table, stream)
+    finally:
+        batch.close()
+
+class TLqdLogAnalyzer(object):
+    """@brief Index of a DP compliance, debug or system log file
+
+    The file is memory-mapped and scanned once with a single compiled
+    pattern that finds every kind of entry of interest. Only the position
+    of each entry is kept; lines are read from the mapping when asked for,
+    so logs of hundreds of MB never have to be loaded.
+
+    The default kinds are the result entries ('note', 'warn', 'skipped',
+    'fail'), 'aux' transactions and the link training events 'ltStart',
+    'ltPass' and 'ltFail'. More can be given as regular expressions, for
+    example to find all AUX transactions between the start of link
+    training and a failure:
+
+        log.between('aux', 'ltStart', 'fail')"""
+
+    ## Default kinds of entry, as regular expressions
+    defaultKinds = [
+        ('note', r'Note_\d:'),
+        ('warn', r'Warn_\d:'),
+        ('skipped', r'Skipped_\d:'),
+        ('fail', r'Fail_\d:'),
+        ('ltStart', r'link\s*training\s*(?:start|begin)|\bLT\s*start'),
+        ('ltPass', r'link\s*training\s*(?:pass|success|complete)|\bLT\s*(?:pass|done)'),
+        ('ltFail', r'link\s*training\s*fail|\bLT\s*fail'),
+        ('aux', r'\bAUX\b|\bDPCD\b')]
+
+    ## Timestamp at the start of a line, such as "12:34:56.789" or "[123.456]"
+    timestampPattern = r'^\s*\[?\s*(?:(\d+):(\d+):(\d+(?:\.\d+)?)|(\d+\.\d+))'
+
+    def __init__(self, fileName, kinds=None):
+
+        """Map and index a log file
+
+        @param self the TLqdLogAnalyzer object
+        @param fileName Local log file
+        @param kinds Optional list of (name, regular expression) searched
+            for in addition to the default kinds; case is ignored"""
+
+        import mmap
+        import re
+
+        ## @param fileName Local log file
+        self.fileName = fileName
+        ## @param kinds List of (name, regular expression)
+        self.kinds = list(self.defaultKinds) + list(kinds or [])
+        ## @param entries List of (line start, line end, kind) in file order
+        self.entries = []
+        # Entries and their line starts by kind, for find
+        self.kindEntries = {}
+        self.kindStarts = {}
+
+        self.file = open(fileName, 'rb')
+        self.data = b('')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            pass
+
+        parts = []
+        for index in range(len(self.kinds)):
+            parts.append('(?P<k' + str(index) + '>' + self.kinds[index][1] +
+                         ')')
+        scanner = re.compile(b('|'.join(parts)), re.IGNORECASE)
+        self.timestamp = re.compile(b(self.timestampPattern))
+
+        data = self.data
+        for found in scanner.finditer(data):
+            start = data.rfind(b('\n'), 0, found.start()) + 1
+            end = data.find(b('\n'), found.end())
+            if end < 0:
+                end = len(data)
+            kind = self.kinds[int(found.lastgroup[1:])][0]
+            entry = (start, end, kind)
+            if len(self.entries) == 0 or self.entries[-1] != entry:
+                self.entries.append(entry)
+            kindEntries = self.kindEntries.setdefault(kind, [])
+            if len(kindEntries) == 0 or kindEntries[-1] != entry:
+                kindEntries.append(entry)
+                self.kindStarts.setdefault(kind, []).append(start)
+
+    ## @cond
+    def decode(self, data):
+        if isinstance(data, str):
+            return data
+        return data.decode('latin-1')
+    ## @endcond
+
+    def close(self):
+
+        """Unmap and close the file
+
+        @param self the TLqdLogAnalyzer object"""
+
+        if not isinstance(self.data, type(b(''))):
+            self.data.close()
+        self.data = b('')
+        self.file.close()
+
+    def line(self, entry):
+
+        """Get the line of an entry
+
+        @param self the TLqdLogAnalyzer object
+        @param entry Entry from entries or find
+        @return line text"""
+
+        return self.decode(self.data[entry[0]:entry[1]]).rstrip('\r')
+
+    def time(self, entry):
+
+        """Get the timestamp of an entry
+
+        @param self the TLqdLogAnalyzer object
+        @param entry Entry from entries or find
+        @return seconds, or None if the line has no timestamp"""
+
+        found = self.timestamp.match(self.data[entry[0]:entry[1]])
+        if found is None:
+            return None
+        if found.group(4) is not None:
+            return float(found.group(4))
+        return int(found.group(1)) * 3600 + int(found.group(2)) * 60 + \
+            float(found.group(3))
+
+    def find(self, kind, start=0, end=None):
+
+        """Find entries of a kind
+
+        @param self the TLqdLogAnalyzer object
+        @param kind Kind name, such as 'fail' or 'aux'
+        @param start Optional file offset or entry to start from
+        @param end Optional file offset or entry to end before
+        @return list of entries"""
+
+        from bisect import bisect_left
+
+        if isinstance(start, tuple):
+            start = start[0]
+        if isinstance(end, tuple):
+            end = end[0]
+        starts = self.kindStarts.get(kind, [])
+        first = bisect_left(starts, start)
+        last = len(starts)
+        if end is not None:
+            last = bisect_left(starts, end, first)
+        return self.kindEntries[kind][first:last] if last > first else []
+
+    def lines(self, kind, start=0, end=None):
+
+        """Get the lines of entries of a kind
+
+        @param self the TLqdLogAnalyzer object
+        @param kind Kind name, such as 'fail' or 'aux'
+        @param start Optional file offset or entry to start from
+        @param end Optional file offset or entry to end before
+        @return list of lines"""
+
+        return [self.line(entry) for entry in self.find(kind, start, end)]
+
+    def between(self, kind, startKind, endKind):
+
+        """Get the lines of a kind from the first startKind entry to the
+        first endKind entry after it
+
+        @param self the TLqdLogAnalyzer object
+        @param kind Kind name, such as 'aux'
+        @param startKind Kind name of the starting entry, such as 'ltStart'
+        @param endKind Kind name of the ending entry, such as 'fail'
+        @return list of lines, empty if there's no startKind entry"""
+
+        starts = self.find(startKind)
+        if len(starts) == 0:
+            return []
+        ends = self.find(endKind, starts[0][1])
+        end = None
+        if len(ends):
+            end = ends[0]
+        return self.lines(kind, starts[0], end)
+
+    def counts(self):
+
+        """Count entries by kind
+
+        @param self the TLqdLogAnalyzer object
+        @return dictionary of kind name to number of entries"""
+
+        ret = {}
+        for entry in self.entries:
+            ret[entry[2]] = ret.get(entry[2], 0) + 1
+        return ret
+
+    def result(self):
+
+        """Compile the result entries like dpGetComplianceResult
+
+        @param self the TLqdLogAnalyzer object
+        @return TLqdResult"""
+
+        info = []
+        errors = []
+        result = 'PASS'
+        for entry in self.entries:
+            if entry[2] in ('note', 'warn', 'skipped'):
+                info.append(self.line(entry))
+                if entry[2] == 'skipped':
+                    result = 'SKIPPED'
+            elif entry[2] == 'fail':
+                errors.append(self.line(entry))
+        if errors:
+            result = 'FAIL'
+        return TLqdResult(TLqdStatus(result), info, errors)
+
+class TLqdCaptureReader(object):
+    """@brief Memory-maps fixed-size record files as NumPy arrays
+
+    A generic reader for binary files in a capture directory, such as the
+    one capture() transfers to localDirectory. No capture formats are
+    included, and packets, data islands and control periods aren't
+    decoded: each kind of file is described with addLayout as a NumPy
+    dtype of one record, an optional header size and an optional field
+    that changes at each frame, for example for a format of your own:
+
+        reader.addLayout('words', 'lane*.bin', [('flags', 'u1'),
+                                                ('word', '<u2')])
+
+    The files are then mapped read-only as structured arrays, split into
+    lanes or sliced by frame. Nothing is read from disk until the array
+    elements are used. Files that aren't a sequence of fixed-size records,
+    such as text reports, can't be read this way.
+
+    NumPy is only needed when a reader is used."""
+
+    def __init__(self, localDirectory):
+
+        """Create a reader for a capture directory
+
+        @param self the TLqdCaptureReader object
+        @param localDirectory Folder with the capture artifacts"""
+
+        ## @param localDirectory Folder with the capture artifacts
+        self.localDirectory = localDirectory
+        ## @param layouts Dictionary of name to (pattern, dtype, header,
+        # frameField)
+        self.layouts = {}
+        self.cache = {}
+
+    def addLayout(self, name, pattern, dtype, header=0, frameField=None):
+
+        """Describe a kind of capture file
+
+        @param self the TLqdCaptureReader object
+        @param name Name used to read the records, such as 'packets'
+        @param pattern File name pattern relative to the capture directory,
+            such as '*_lane*.bin'
+        @param dtype NumPy dtype or dtype description of one record
+        @param header Optional number of bytes to skip at the start of
+            each file
+        @param frameField Optional record field holding the frame number or
+            any other value that changes at the start of each frame"""
+
+        self.layouts[name] = (pattern, dtype, header, frameField)
+        for key in list(self.cache):
+            if key[0] == name:
+                del self.cache[key]
+
+    def files(self, name):
+
+        """Get the files of a layout
+
+        @param self the TLqdCaptureReader object
+        @param name Layout name
+        @return sorted list of file paths"""
+
+        import glob
+        import os.path
+
+        pattern = self.layouts[name][0]
+        return sorted(glob.glob(os.path.join(self.localDirectory, pattern)))
+
+    def records(self, name, index=0):
+
+        """Map the records of a file
+
+        @param self the TLqdCaptureReader object
+        @param name Layout name
+        @param index Index of the file among the layout files, such as the
+            lane number when each lane has its own file
+        @return read-only NumPy structured array"""
+
+        import numpy
+        import os.path
+
+        key = (name, index)
+        if key not in self.cache:
+            pattern, dtype, header, frameField = self.layouts[name]
+            files = self.files(name)
+            if index >= len(files):
+                raise RuntimeError('No capture file ' + str(index) +
+                                   ' for ' + name + ' in ' +
+                                   self.localDirectory)
+            dtype = numpy.dtype(dtype)
+            count = (os.path.getsize(files[index]) - header) // dtype.itemsize
+            if count <= 0:
+                self.cache[key] = numpy.zeros(0, dtype)
+            else:
+                self.cache[key] = numpy.memmap(files[index], dtype, 'r',
+                                               header, (count,))
+        return self.cache[key]
+
+    def lanes(self, name, laneCount=None, field=None):
+
+        """Get the records of each lane
+
+        Lanes are either in separate files, or records of the lanes
+        alternate in one file
+
+        @param self the TLqdCaptureReader object
+        @param name Layout name
+        @param laneCount Number of lanes interleaved in one file, or None
+            when each lane has its own file
+        @param field Optional record field to return instead of whole
+            records
+        @return list of arrays, one per lane"""
+
+        if laneCount is None:
+            ret = [self.records(name, index)
+                   for index in range(len(self.files(name)))]
+        else:
+            data = self.records(name)
+            ret = [data[lane::laneCount] for lane in range(laneCount)]
+        if field is not None:
+            ret = [lane[field] for lane in ret]
+        return ret
+
+    def frameStarts(self, name, index=0):
+
+        """Find the start of each frame
+
+        @param self the TLqdCaptureReader object
+        @param name Layout name with a frameField
+        @param index Index of the file among the layout files
+        @return NumPy array of record indexes"""
+
+        import numpy
+
+        frameField = self.layouts[name][3]
+        if frameField is None:
+            raise RuntimeError(name + ' has no frame field')
+        key = (name, index, 'frames')
+        if key not in self.cache:
+            values = self.records(name, index)[frameField]
+            starts = numpy.flatnonzero(values[1:] != values[:-1]) + 1
+            self.cache[key] = numpy.concatenate([[0], starts])
+        return self.cache[key]
+
+    def frameCount(self, name, index=0):
+
+        """Count the frames in a file
+
+        @param self the TLqdCaptureReader object
+        @param name Layout name with a frameField
+        @param index Index of the file among the layout files
+        @return number of frames"""
+
+        if len(self.records(name, index)) == 0:
+            return 0
+        return len(self.frameStarts(name, index))
+
+    def frame(self, name, frame, index=0):
+
+        """Get the records of one frame
+
+        @param self the TLqdCaptureReader object
+        @param name Layout name with a frameField
+        @param frame Frame number, from 0
+        @param index Index of the file among the layout files
+        @return NumPy array view of the frame records"""
+
+        starts = self.frameStarts(name, index)
+        end = None
+        if frame + 1 < len(starts):
+            end = starts[frame + 1]
+        return self.records(name, index)[starts[frame]:end]
+
+    def close(self):
+
+        """Release the mapped files
+
+        @param self the TLqdCaptureReader object"""
+
+        self.cache = {}
+
+class TLqdCaptureMonitor(object):
+    """@brief Continuous triggered capture
+
+    Captures over and over, re-arming the trigger after each capture, to
+    catch intermittent events such as TLqdTriggerMode.DpSymbolError or
+    TLqdTriggerMode.DpDisparityError. Only the last few captures are kept,
+    plus every capture where the trigger fired or the video check or
+    interpretation reported errors. Remote capture directories are removed
+    as soon as they're transferred, and the oldest local captures are
+    removed when the disk budget is exceeded."""
+
+    ## Default pattern for capture output saying the trigger fired
+    triggerPattern = r'trigger(?:ed)?\s*(?:event\s*)?(?:found|fired|occurred|detected|hit)'
+
+    def __init__(self, qdDev, type, sizePct, localDirectory, keep=5,
+                 diskBudget=None, triggerPattern=None, **captureArgs):
+
+        """Create a capture monitor
+
+        @param self the TLqdCaptureMonitor object
+        @param qdDev TLqdInstrument
+        @param type TLqdCaptureType Type of capture
+        @param sizePct Amount of memory in percent to use
+        @param localDirectory Folder for the kept captures, one
+            sub-directory for each
+        @param keep Number of most recent uneventful captures to keep
+        @param diskBudget Optional maximum bytes for the kept captures
+        @param triggerPattern Optional regular expression for capture
+            output saying the trigger fired
+        @param captureArgs Other capture arguments, such as triggerMode,
+            triggerType, videoCheck or interpret"""
+
+        import re
+
+        ## @param qdDev TLqdInstrument
+        self.qdDev = qdDev
+        ## @param type TLqdCaptureType Type of capture
+        self.type = type
+        ## @param sizePct Amount of memory in percent to use
+        self.sizePct = sizePct
+        ## @param localDirectory Folder for the kept captures
+        self.localDirectory = localDirectory
+        ## @param keep Number of recent uneventful captures to keep
+        self.keep = keep
+        ## @param diskBudget Maximum bytes for the kept captures
+        self.diskBudget = diskBudget
+        ## @param captureArgs Other capture arguments
+        self.captureArgs = captureArgs
+        ## @param recent Directories of the kept uneventful captures
+        self.recent = []
+        ## @param events Directories of the kept eventful captures
+        self.events = []
+        ## @param count Number of captures made
+        self.count = 0
+        self.stopped = False
+        self.trigger = re.compile(triggerPattern or self.triggerPattern,
+                                  re.IGNORECASE)
+
+    def stop(self):
+
+        """Stop the monitor after the capture in progress
+
+        May be called from another thread or a callback
+
+        @param self the TLqdCaptureMonitor object"""
+
+        self.stopped = True
+
+    def isEvent(self, result):
+
+        """Check if a capture is worth keeping
+
+        @param self the TLqdCaptureMonitor object
+        @param result TLqdResult of the capture
+        @return True if the trigger fired or errors were reported"""
+
+        if result.status == TLqdStatus.FAIL or len(result.errors):
+            return True
+        for line in result.info:
+            if self.trigger.search(line):
+                return True
+        return False
+
+    ## @cond
+    def remove(self, directory):
+        import shutil
+        shutil.rmtree(directory, True)
+
+    def size(self, directory):
+        import os
+        total = 0
+        for root, dirs, files in os.walk(directory):
+            for name in files:
+                try:
+                    total = total + os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def enforceBudget(self, sizes):
+        # Drop the oldest uneventful captures first, then the oldest events
+        while self.diskBudget is not None and \
+            sum(sizes.values()) > self.diskBudget:
+            if len(self.recent):
+                directory = self.recent.pop(0)
+            elif len(self.events) > 1:
+                directory = self.events.pop(0)
+            else:
+                return
+            self.remove(directory)
+            del sizes[directory]
+    ## @endcond
+
+    def run(self, count=None, duration=None, stopOnEvent=False, table=None,
+            stream=None):
+
+        """Capture until stopped
+
+        @param self the TLqdCaptureMonitor object
+        @param count Optional number of captures to make
+        @param duration Optional number of seconds to keep capturing
+        @param stopOnEvent Set to stop after the first eventful capture
+        @param table Optional TLqdResultTable to add a row per capture to
+        @param stream Optional file-like object to stream rows to when no
+            table is given
+        @return TLqdResultTable"""
+
+        import os
+        from time import strftime, time
+
+        if table is None:
+            table = TLqdResultTable(['capture', 'event', 'directory'], stream)
+        if not os.path.exists(self.localDirectory):
+            os.makedirs(self.localDirectory)
+
+        sizes = {}
+        for directory in self.recent + self.events:
+            sizes[directory] = self.size(directory)
+
+        self.stopped = False
+        end = None
+        if duration is not None:
+            end = time() + duration
+        made = 0
+        while not self.stopped and (count is None or made < count) and \
+            (end is None or time() < end):
+            self.count = self.count + 1
+            made = made + 1
+            name = 'capture_' + strftime('%Y_%m_%d_%H_%M_%S') + '_' + \
+                str(self.count)
+            directory = os.path.join(self.localDirectory, name)
+            qdDirectory = '/tmp/' + name
+
+            start = time()
+            try:
+                result = self.qdDev.capture(self.type, self.sizePct,
+                                            directory, qdDirectory,
+                                            **self.captureArgs)
+            finally:
+                self.qdDev.command('exec rm -fr ' + qdDirectory)
+
+            event = self.isEvent(result)
+            if event:
+                self.events.append(directory)
+            else:
+                self.recent.append(directory)
+                while len(self.recent) > self.keep:
+                    old = self.recent.pop(0)
+                    self.remove(old)
+                    sizes.pop(old, None)
+            if os.path.exists(directory):
+                sizes[directory] = self.size(directory)
+            self.enforceBudget(sizes)
+
+            if directory not in self.recent and directory not in self.events:
+                directory = ''
+            table.add({'capture': self.count, 'event': event,
+                       'directory': directory}, result, time() - start)
+
+            if event and stopOnEvent:
+                break
+        return table
+
+def TLqdMonitorCapture(qdDev, type, sizePct, localDirectory, count=None,
+                       duration=None, keep=5, diskBudget=None,
+                       stopOnEvent=False, stream=None, **captureArgs):
+
+    """Capture repeatedly, keeping recent and eventful captures
+
+    See @ref TLqdCaptureMonitor for details
+
+    @param qdDev Interface to quantumdata instrument
+    @param type TLqdCaptureType Type of capture
+    @param sizePct Amount of memory in percent to use
+    @param localDirectory Folder for the kept captures
+    @param count Optional number of captures to make
+    @param duration Optional number of seconds to keep capturing
+    @param keep Number of most recent uneventful captures to keep
+    @param diskBudget Optional maximum bytes for the kept captures
+    @param stopOnEvent Set to stop after the first eventful capture
+    @param stream Optional file-like object to stream rows to
+    @param captureArgs Other capture arguments, such as triggerMode
+    @return TLqdResultTable"""
+
+    monitor = TLqdCaptureMonitor(qdDev, type, sizePct, localDirectory, keep,
+                                 diskBudget, **captureArgs)
+    return monitor.run(count, duration, stopOnEvent, None, stream)
+
+class TLqdCaptureJob(object):
+    """@brief Capture request for a TLqdCaptureQueue"""
+
+    def __init__(self, type, sizePct, localDirectory=None, **captureArgs):
+
+        """Create a capture request
+
+        @param self the TLqdCaptureJob object
+        @param type TLqdCaptureType Type of capture
+        @param sizePct Amount of memory in percent to use
+        @param localDirectory Optional folder for the capture artifacts
+        @param captureArgs Other capture arguments, such as triggerMode,
+            interpret, timing or videoCheck"""
+
+        ## @param type TLqdCaptureType Type of capture
+        self.type = type
+        ## @param sizePct Amount of memory in percent to use
+        self.sizePct = sizePct
+        ## @param localDirectory Folder for the capture artifacts
+        self.localDirectory = localDirectory
+        ## @param captureArgs Other capture arguments
+        self.captureArgs = captureArgs
+        ## @param result TLqdResult once the capture is done
+        self.result = None
+        ## @param instrument Where the capture ran
+        self.instrument = None
+        ## @param number Position of the job in its queue run, from 1
+        self.number = None
+
+class TLqdCaptureQueue(object):
+    """@brief Runs capture requests on whichever card is free
+
+    Each instrument entry is either a TLqdInstrument or a
+    (TLqdInstrument, cardNumber) pair with its own thread, so to use two
+    cards in one chassis, connect twice and give one card to each
+    connection. While a card acquires (and analyses, when interpret,
+    timing or videoCheck are asked for) the next capture, the artifacts of
+    its previous capture are transferred and the remote directory removed
+    over FTP in the background."""
+
+    def __init__(self):
+
+        """Create an empty queue
+
+        @param self the TLqdCaptureQueue object"""
+
+        ## @param jobs TLqdCaptureJob list waiting to run
+        self.jobs = []
+
+    def add(self, type, sizePct, localDirectory=None, **captureArgs):
+
+        """Queue a capture
+
+        @param self the TLqdCaptureQueue object
+        @param type TLqdCaptureType Type of capture
+        @param sizePct Amount of memory in percent to use
+        @param localDirectory Optional folder for the capture artifacts
+        @param captureArgs Other capture arguments
+        @return TLqdCaptureJob"""
+
+        job = TLqdCaptureJob(type, sizePct, localDirectory, **captureArgs)
+        self.jobs.append(job)
+        return job
+
+    ## @cond
+    def finish(self, qdDev, job, qdDirectory, start, table):
+        from time import time
+        try:
+            if job.localDirectory is not None:
+                qdDev.prepareDirectories(job.localDirectory, qdDirectory)
+                qdDev.transferResults(job.localDirectory, qdDirectory,
+                    job.captureArgs.get('artifactFilter'),
+                    job.result.status == TLqdStatus.FAIL)
+        except Exception as e:
+            job.result.errors.append('Transfer failed: ' + str(e))
+        qdDev.deleteDirectory(qdDirectory, True)
+        table.add({'job': job.number, 'type': str(job.type)},
+                  job.result, time() - start, job.instrument)
+    ## @endcond
+
+    def run(self, instruments, table=None, stream=None):
+
+        """Run all queued captures
+
+        @param self the TLqdCaptureQueue object
+        @param instruments TLqdInstrument or list of instrument entries
+        @param table Optional TLqdResultTable to add results to
+        @param stream Optional file-like object to stream rows to when no
+            table is given
+        @return TLqdResultTable with a row per capture, in the order they
+            finished"""
+
+        import threading
+        from time import strftime, time
+
+        if isinstance(instruments, TLqdInstrument):
+            instruments = [instruments]
+        workers = []
+        for entry in instruments:
+            if isinstance(entry, tuple):
+                workers.append(entry)
+            else:
+                workers.append((entry, None))
+
+        if table is None:
+            table = TLqdResultTable(['job', 'type'], stream)
+
+        jobs = list(self.jobs)
+        self.jobs = []
+        for index in range(len(jobs)):
+            jobs[index].number = index + 1
+        lock = threading.Lock()
+        stamp = strftime('%Y_%m_%d_%H_%M_%S')
+
+        def worker(qdDev, card):
+            name = str(qdDev.ipAddr)
+            if card is not None:
+                qdDev.setCardUsed(card)
+                name = name + ':' + str(card)
+            transfer = None
+            while True:
+                with lock:
+                    if len(jobs) == 0:
+                        break
+                    job = jobs.pop(0)
+                job.instrument = name
+                qdDirectory = '/tmp/capture_' + stamp + '_' + str(job.number)
+                start = time()
+                try:
+                    job.result = qdDev.capture(job.type, job.sizePct, None,
+                                               qdDirectory, **job.captureArgs)
+                except Exception as e:
+                    job.result = TLqdResult(TLqdStatus.FAIL, [], [str(e)])
+
+                # Only one transfer at a time for each card
+                if transfer is not None:
+                    transfer.join()
+                transfer = threading.Thread(target=self.finish,
+                    args=(qdDev, job, qdDirectory, start, table))
+                transfer.daemon = True
+                transfer.start()
+            if transfer is not None:
+                transfer.join()
+
+        threads = []
+        for qdDev, card in workers:
+            thread = threading.Thread(target=worker, args=(qdDev, card))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return table
+
+def TLqdRunCaptureQueue(qdDev, queue, table=None, stream=None):
+
+    """Run queued captures on whichever card is free
+
+    See @ref TLqdCaptureQueue.run for details
+
+    @param qdDev TLqdInstrument or list of instrument entries
+    @param queue TLqdCaptureQueue
+    @param table Optional TLqdResultTable to add results to
+    @param stream Optional file-like object to stream rows to
+    @return TLqdResultTable"""
+
+    return queue.run(qdDev, table, stream)
+
+class TLqdArtifactFilter(object):
+    """@brief Chooses which test or capture artifacts to transfer
+
+    Checked against the remote directory listing, so files that aren't
+    wanted are never downloaded. Patterns are shell-style and match either
+    the file name or its path within the results, such as 'video/*.bmp'.
+
+    For example, to transfer only CSV summaries:
+
+        TLqdArtifactFilter(include=['*.csv'])
+
+    or to skip raw data over 50 MB unless the test failed and keep at most
+    10 extracted video frames:
+
+        artifactFilter = TLqdArtifactFilter(maxFrames=10)
+        artifactFilter.addSizeLimit('*.bin', 50 * 1024 * 1024)"""
+
+    def __init__(self, include=None, exclude=None, maxFrames=None,
+                 framePatterns=None, includeOnFail=False):
+
+        """Create a filter
+
+        @param self the TLqdArtifactFilter object
+        @param include Optional list of patterns; only matching files are
+            transferred
+        @param exclude Optional list of patterns never transferred
+        @param maxFrames Optional maximum number of video frames transferred
+            from each directory, the first ones by name with numbers in
+            the names compared by value, so frame9 comes before frame10
+        @param framePatterns Patterns of video frame files, defaults to
+            bitmap and raw frame files
+        @param includeOnFail Set to transfer everything when the test or
+            capture failed"""
+
+        ## @param include Patterns of files to transfer, or None for all
+        self.include = include
+        ## @param exclude Patterns of files never transferred
+        self.exclude = list(exclude or [])
+        ## @param maxFrames Maximum number of video frames per directory
+        self.maxFrames = maxFrames
+        ## @param framePatterns Patterns of video frame files
+        self.framePatterns = framePatterns or ['*.bmp', '*.ppm', '*.yuv']
+        ## @param includeOnFail Transfer everything on failure
+        self.includeOnFail = includeOnFail
+        ## @param sizeLimits List of (pattern, maximum bytes, unlessFail)
+        self.sizeLimits = []
+
+    def addSizeLimit(self, pattern, maxBytes, unlessFail=True):
+
+        """Skip large files
+
+        @param self the TLqdArtifactFilter object
+        @param pattern Pattern of the files limited
+        @param maxBytes Largest file size transferred
+        @param unlessFail Set to transfer larger files anyway when the test or
+            capture failed"""
+
+        self.sizeLimits.append((pattern, maxBytes, unlessFail))
+
+    ## @cond
+    def matches(self, path, patterns):
+        from fnmatch import fnmatch
+        import posixpath
+        name = posixpath.basename(path)
+        for pattern in patterns:
+            if fnmatch(name, pattern) or fnmatch(path, pattern):
+                return True
+        return False
+
+    def frameKey(self, name):
+        import re
+        parts = re.split(r'(\d+)', name)
+        for index in range(1, len(parts), 2):
+            parts[index] = int(parts[index])
+        return parts
+    ## @endcond
+
+    def accept(self, path, size, failed=False):
+
+        """Check a single file, ignoring the frame limit
+
+        @param self the TLqdArtifactFilter object
+        @param path File path within the results
+        @param size File size in bytes, or None if unknown
+        @param failed Set if the test or capture failed
+        @return True if the file should be transferred"""
+
+        if failed and self.includeOnFail:
+            return True
+        if self.include is not None and not self.matches(path, self.include):
+            return False
+        if self.matches(path, self.exclude):
+            return False
+        for pattern, maxBytes, unlessFail in self.sizeLimits:
+            if size is not None and size > maxBytes and \
+                not (failed and unlessFail) and self.matches(path, [pattern]):
+                return False
+        return True
+
+    def select(self, listing, failed=False, relative=''):
+
+        """Choose files from a remote directory listing
+
+        @param self the TLqdArtifactFilter object
+        @param listing Lines of an FTP LIST of one directory
+        @param failed Set if the test or capture failed
+        @param relative Path of the directory within the results, ending
+            with '/' unless empty
+        @return set of the file names to transfer"""
+
+        selected = set()
+        frames = []
+        for line in listing:
+            pos = line.find(':') # Find the colon in the timestamp
+            if pos <= 0 or line[0] == 'd':
+                continue
+            name = line[pos+4:]
+            size = None
+            fields = line.split()
+            if len(fields) > 4 and fields[4].isdigit():
+                size = int(fields[4])
+            if not self.accept(relative + name, size, failed):
+                continue
+            if self.maxFrames is not None and \
+                self.matches(relative + name, self.framePatterns) and \
+                not (failed and self.includeOnFail):
+                frames.append(name)
+            else:
+                selected.add(name)
+        frames.sort(key=self.frameKey)
+        selected.update(frames[:self.maxFrames])
+        return selected
+
+class TLqdCrcSampler(object):
+    """@brief Samples video CRCs as fast as the instrument answers
+
+    Keeps timestamped CRCs in a fixed size ring buffer of arrays, and
+    reports where they changed, how often each CRC was seen and how long
+    each run of one CRC lasted. A run of a frame or two between two runs
+    of the same CRC is a glitch, such as a DSC decode error.
+
+    Components are stored in the order crcRCr, crcGY, crcBCb, crc0, crc1,
+    crc2; values that aren't reported or aren't hex are stored as -1."""
+
+    ## Components in the order they are stored
+    components = ['crcRCr', 'crcGY', 'crcBCb', 'crc0', 'crc1', 'crc2']
+
+    def __init__(self, qdDev, port=None, dsc=False, size=4096, batch=16):
+
+        """Create a sampler
+
+        @param self the TLqdCrcSampler object
+        @param qdDev TLqdInstrument
+        @param port TLqdPort for getCrc, or None to use getSinkTestCrc
+        @param dsc Set to collect DSC CRCs with getCrc
+        @param size Number of samples kept
+        @param batch Number of CRC queries sent in one commandBurst"""
+
+        from array import array
+
+        try:
+            typecode = 'q'
+            array(typecode)
+        except ValueError:
+            # Python 2 has no 64 bit integer arrays; doubles hold 32 bit
+            # CRCs and -1 exactly
+            typecode = 'd'
+
+        ## @param qdDev TLqdInstrument
+        self.qdDev = qdDev
+        ## @param port TLqdPort, or None for the sink test CRC
+        self.port = port
+        ## @param dsc Collect DSC CRCs
+        self.dsc = dsc
+        ## @param size Number of samples kept
+        self.size = size
+        ## @param batch Number of CRC queries sent in one commandBurst
+        self.batch = batch
+        ## @param times Sample times in seconds since the epoch
+        self.times = array('d', [0.0] * size)
+        ## @param values One array per component
+        self.values = [array(typecode, [0] * size) for c in self.components]
+        ## @param count Number of samples taken, including overwritten ones
+        self.count = 0
+
+    ## @cond
+    def toInt(self, value):
+        try:
+            return int(str(value), 16)
+        except ValueError:
+            return -1
+
+    def crcCommand(self):
+        if self.port is None:
+            prefix = ''
+            if self.qdDev.cardUsed is not None:
+                prefix = 'OUT' + str(self.qdDev.cardUsed) + '0:'
+            return prefix + 'cts print crc'
+        cmd = TLqdApiTag + 'get_crc -p ' + str(self.port)
+        if self.dsc:
+            cmd = cmd + ' -d'
+        return cmd
+
+    def parse(self, output):
+        if self.port is None:
+            return self.qdDev.parseSinkTestCrc(output)
+        return self.qdDev.parseCrc(output)
+
+    def read(self, count=1):
+        from time import time
+
+        start = time()
+        outputs = self.qdDev.commandBurst([self.crcCommand()] * count)
+        step = (time() - start) / count
+        # Only the burst is timed, so spread the samples evenly across it
+        return [(start + (n + 1) * step, self.parse(outputs[n]))
+                for n in range(count)]
+    ## @endcond
+
+    def add(self, crc, when=None):
+
+        """Add a sample
+
+        @param self the TLqdCrcSampler object
+        @param crc TLqdCrcParameters
+        @param when Optional sample time, defaults to now"""
+
+        from time import time
+
+        index = self.count % self.size
+        self.times[index] = time() if when is None else when
+        for component in range(len(self.components)):
+            value = getattr(crc, self.components[component])
+            self.values[component][index] = -1 if value is None else \
+                self.toInt(value)
+        self.count = self.count + 1
+
+    def sample(self, count=None, duration=None):
+
+        """Read CRCs back to back
+
+        Queries are pipelined with commandBurst, batch at a time, so each
+        sample time is interpolated within its batch.
+
+        @param self the TLqdCrcSampler object
+        @param count Optional number of samples to take
+        @param duration Optional number of seconds to sample for; with
+            neither count nor duration, fills the buffer once
+        @return number of samples taken"""
+
+        from time import time
+
+        if count is None and duration is None:
+            count = self.size
+        end = None
+        if duration is not None:
+            end = time() + duration
+        taken = 0
+        while (count is None or taken < count) and \
+            (end is None or time() < end):
+            batch = self.batch
+            if count is not None:
+                batch = min(batch, count - taken)
+            for when, crc in self.read(batch):
+                self.add(crc, when)
+            taken = taken + batch
+        return taken
+
+    def samples(self):
+
+        """Get the kept samples, oldest first
+
+        @param self the TLqdCrcSampler object
+        @return list of (time, CRC tuple)"""
+
+        kept = min(self.count, self.size)
+        ret = []
+        for n in range(self.count - kept, self.count):
+            index = n % self.size
+            ret.append((self.times[index],
+                        tuple([values[index] for values in self.values])))
+        return ret
+
+    def changes(self):
+
+        """Find where the CRC changed
+
+        @param self the TLqdCrcSampler object
+        @return list of (time, previous CRC tuple, new CRC tuple)"""
+
+        ret = []
+        previous = None
+        for when, crc in self.samples():
+            if previous is not None and crc != previous:
+                ret.append((when, previous, crc))
+            previous = crc
+        return ret
+
+    def histogram(self):
+
+        """Count each unique CRC
+
+        @param self the TLqdCrcSampler object
+        @return dictionary of CRC tuple to number of samples"""
+
+        ret = {}
+        for when, crc in self.samples():
+            ret[crc] = ret.get(crc, 0) + 1
+        return ret
+
+    def runLengths(self):
+
+        """Get the runs of one CRC
+
+        @param self the TLqdCrcSampler object
+        @return list of (start time, CRC tuple, number of samples)"""
+
+        ret = []
+        for when, crc in self.samples():
+            if len(ret) and ret[-1][1] == crc:
+                ret[-1][2] = ret[-1][2] + 1
+            else:
+                ret.append([when, crc, 1])
+        return [tuple(run) for run in ret]
+
+    def glitches(self, maxLength=1):
+
+        """Find short runs between two runs of the same CRC
+
+        @param self the TLqdCrcSampler object
+        @param maxLength Longest run, in samples, counted as a glitch
+        @return list of (start time, CRC tuple, number of samples)"""
+
+        runs = self.runLengths()
+        ret = []
+        for index in range(1, len(runs) - 1):
+            if runs[index][2] <= maxLength and \
+                runs[index-1][1] == runs[index+1][1]:
+                ret.append(runs[index])
+        return ret
+
+## @cond
+def TLqdLoadFrame(frame):
+    import numpy
+    if isinstance(frame, str):
+        lFile = open(frame, 'rb')
+        data = bytearray(lFile.read())
+        lFile.close()
+        return TLqdDecodeBitmap(data)
+    return numpy.asarray(frame)
+
+def TLqdDiffFrames(settings, frames):
+    # Compare each frame after the first with the one before it; run in
+    # pool workers, so only takes and returns plain values
+    import numpy
+
+    reference = settings['reference']
+    if reference is not None:
+        reference = TLqdLoadFrame(reference).astype(numpy.int16)
+    colorRange = settings['colorRange']
+    ret = []
+    previous = None
+    for frame in frames:
+        current = TLqdLoadFrame(frame).astype(numpy.int16)
+        stats = {}
+        if previous is not None:
+            stats['difference'] = float(numpy.abs(current -
+                                                  previous).mean())
+        against = previous if reference is None else reference
+        if against is not None:
+            delta = numpy.abs(current - against)
+            mse = float((delta.astype(numpy.float64) ** 2).mean())
+            stats['psnr'] = float('inf') if mse == 0 else \
+                10 * numpy.log10(255.0 ** 2 / mse)
+            changed = delta.max(axis=2) > settings['changeThreshold']
+            rows = numpy.flatnonzero(changed.any(axis=1))
+            columns = numpy.flatnonzero(changed.any(axis=0))
+            if len(rows):
+                stats['box'] = (int(columns[0]), int(rows[0]),
+                                int(columns[-1] - columns[0] + 1),
+                                int(rows[-1] - rows[0] + 1))
+        stats['violations'] = 0
+        if colorRange is not None:
+            outside = ((current < colorRange[0]) |
+                       (current > colorRange[1])).any(axis=2)
+            stats['violations'] = int(outside.sum())
+        ret.append(stats)
+        previous = current
+    return ret
+## @endcond
+
+class TLqdFrameDiff(object):
+    """@brief Compares a sequence of video frames
+
+    Each frame is compared with the one before it, or with a reference
+    frame, giving its PSNR, the box around the pixels that changed and
+    the number of pixels outside the allowed color range. Frames that
+    barely differ from the one before are repeated; frames that differ
+    from the one before much more than is usual for the sequence follow
+    dropped frames, as when a moving pattern jumps.
+
+    Frames are NumPy arrays, as from grabFrame, or bitmap file names, as
+    from getVideoFrame. Long sequences are split over a pool of processes;
+    file names are cheaper to hand to them than arrays.
+
+    Needs NumPy."""
+
+    def __init__(self, reference=None, changeThreshold=8,
+                 repeatThreshold=0.5, dropFactor=1.8, colorRange=None):
+
+        """Create a frame comparison
+
+        @param self the TLqdFrameDiff object
+        @param reference Optional frame to compare every frame with,
+            instead of the one before it
+        @param changeThreshold Largest component difference of a pixel that
+            doesn't count as changed
+        @param repeatThreshold Largest mean difference from the frame
+            before for a repeated frame
+        @param dropFactor How many times the median difference between
+            frames marks dropped frames before a frame
+        @param colorRange Optional (low, high) allowed component values,
+            such as (16, 235) for limited range"""
+
+        ## @param reference Frame every frame is compared with, or None
+        self.reference = reference
+        ## @param changeThreshold Largest difference not counted as a change
+        self.changeThreshold = changeThreshold
+        ## @param repeatThreshold Largest mean difference of a repeat
+        self.repeatThreshold = repeatThreshold
+        ## @param dropFactor Multiple of the median difference for a drop
+        self.dropFactor = dropFactor
+        ## @param colorRange Allowed (low, high) component values, or None
+        self.colorRange = colorRange
+
+    def compare(self, frames, processes=None, chunk=32):
+
+        """Compare a sequence of frames
+
+        @param self the TLqdFrameDiff object
+        @param frames List of NumPy arrays or bitmap file names
+        @param processes Optional number of worker processes, one per CPU
+            by default; 1 compares in this process
+        @param chunk Number of frames given to a worker at a time
+        @return list of dictionaries, one per frame, with 'frame',
+            'difference' from the frame before, 'psnr', 'box' as
+            (x, y, width, height) or None, 'violations', 'repeated' and
+            'dropped'"""
+
+        frames = list(frames)
+        settings = {'reference': self.reference,
+                    'changeThreshold': self.changeThreshold,
+                    'colorRange': self.colorRange}
+
+        # Each chunk starts with the last frame of the one before it
+        starts = list(range(0, len(frames), chunk))
+        pieces = [frames[max(start - 1, 0):start + chunk]
+                  for start in starts]
+        if processes == 1 or len(pieces) < 2:
+            done = [TLqdDiffFrames(settings, piece) for piece in pieces]
+        else:
+            from multiprocessing import Pool
+            pool = Pool(processes)
+            try:
+                waiting = [pool.apply_async(TLqdDiffFrames, (settings, piece))
+                           for piece in pieces]
+                done = [result.get() for result in waiting]
+            finally:
+                pool.close()
+                pool.join()
+
+        stats = []
+        for index in range(len(done)):
+            # The chunk before already has the overlapping frame
+            stats.extend(done[index][1:] if index else done[index])
+        return self.classify(stats)
+
+    ## @cond
+    def classify(self, stats):
+        differences = sorted([item['difference'] for item in stats
+                              if 'difference' in item and
+                              item['difference'] > self.repeatThreshold])
+        median = differences[len(differences) // 2] if differences else 0
+        for index in range(len(stats)):
+            item = stats[index]
+            item['frame'] = index
+            item.setdefault('difference', None)
+            item.setdefault('psnr', None)
+            item.setdefault('box', None)
+            difference = item['difference']
+            item['repeated'] = difference is not None and \
+                difference <= self.repeatThreshold
+            item['dropped'] = difference is not None and median > 0 and \
+                difference > median * self.dropFactor
+        return stats
+    ## @endcond
+
+    def run(self, frames, processes=None, chunk=32, table=None, stream=None):
+
+        """Compare a sequence of frames into a result table
+
+        A frame fails when it is repeated, follows dropped frames or has
+        pixels outside the color range.
+
+        @param self the TLqdFrameDiff object
+        @param frames List of NumPy arrays or bitmap file names
+        @param processes Optional number of worker processes
+        @param chunk Number of frames given to a worker at a time
+        @param table Optional TLqdResultTable to add a row per frame to
+        @param stream Optional file-like object to stream rows to when no
+            table is given
+        @return TLqdResultTable"""
+
+        if table is None:
+            table = TLqdResultTable(['frame', 'psnr', 'box', 'repeated',
+                                     'dropped', 'violations'], stream)
+        for item in self.compare(frames, processes, chunk):
+            errors = []
+            if item['repeated']:
+                errors.append('Frame ' + str(item['frame']) + ' repeated')
+            if item['dropped']:
+                errors.append('Frames dropped before frame ' +
+                              str(item['frame']))
+            if item['violations']:
+                errors.append(str(item['violations']) +
+                              ' pixels outside the color range')
+            status = TLqdStatus('FAIL' if errors else 'PASS')
+            table.add({'frame': item['frame'], 'psnr': item['psnr'],
+                       'box': item['box'], 'repeated': item['repeated'],
+                       'dropped': item['dropped'],
+                       'violations': item['violations']},
+                      TLqdResult(status, [], errors))
+        return table
+
+def TLqdCompareFrames(frames, reference=None, colorRange=None,
+                      processes=None, table=None, stream=None):
+
+    """Compare a sequence of video frames
+
+    See @ref TLqdFrameDiff for details
+
+    @param frames List of NumPy arrays or bitmap file names
+    @param reference Optional frame to compare every frame with
+    @param colorRange Optional (low, high) allowed component values
+    @param processes Optional number of worker processes
+    @param table Optional TLqdResultTable to add a row per frame to
+    @param stream Optional file-like object to stream rows to
+    @return TLqdResultTable"""
+
+    frameDiff = TLqdFrameDiff(reference, colorRange=colorRange)
+    return frameDiff.run(frames, processes, table=table, stream=stream)
+
+class TLqdFormatCatalog(object):
+    """@brief Local catalogue of video format parameters
+
+    Holds the parameters of every format in listFormats as a NumPy
+    structured array with a 'name' column and a float column for each
+    TLqdVideoFormatParameters parameter, NaN when a format doesn't have it.
+    Enumerated parameters hold their codes. Catalogues are saved in a
+    directory, one file per instrument firmware version, so they are only
+    built once per firmware.
+
+    Queries use a sorted index of each column they look at, built the
+    first time the column is queried:
+
+        catalog.names(SamplingMode=TLqdSubsampling.SS420,
+                      PixelRate=(594, None), FrameRate=(100, None))
+
+    Needs NumPy."""
+
+    def __init__(self, directory):
+
+        """Create a format catalogue
+
+        @param self the TLqdFormatCatalog object
+        @param directory Local folder the catalogue files are kept in"""
+
+        ## @param directory Local folder the catalogue files are kept in
+        self.directory = directory
+        ## @param version Firmware version the formats were read from
+        self.version = None
+        ## @param formats NumPy structured array, one record per format
+        self.formats = None
+        self.indexes = {}
+
+    ## @cond
+    def fileName(self, version):
+        import hashlib
+        import os
+        digest = hashlib.md5(version.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, 'formats_' + digest + '.npz')
+
+    def dtype(self, nameLength):
+        return [('name', 'U' + str(nameLength))] + \
+            [(tag.longTag, 'f8') for tag in TLqdVideoFormatParameters.tags]
+    ## @endcond
+
+    def open(self, qdDev, rebuild=False):
+
+        """Load the catalogue for an instrument's firmware, building and
+        saving it first if there isn't one
+
+        @param self the TLqdFormatCatalog object
+        @param qdDev Interface to quantumdata instrument
+        @param rebuild Set to build the catalogue even if there is one
+        @return self"""
+
+        import os
+
+        version = qdDev.getVersion()
+        fileName = self.fileName(version)
+        if not rebuild and os.path.exists(fileName):
+            self.load(fileName)
+        else:
+            self.build(qdDev)
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            self.save(fileName)
+        return self
+
+    def build(self, qdDev, formats=None):
+
+        """Read the parameters of formats from an instrument
+
+        Each format is set on the instrument, then all its parameters are
+        queried at once, so the instrument is left outputting the last
+        format.
+
+        @param self the TLqdFormatCatalog object
+        @param qdDev Interface to quantumdata instrument
+        @param formats Optional list of format names, defaults to
+            listFormats
+        @return self"""
+
+        import numpy
+
+        if formats is None:
+            formats = qdDev.listFormats()
+        tags = [tag for tag in TLqdVideoFormatParameters.tags
+                if tag.shortTag not in ('LANES', 'LRAT')]
+        badQuery = 'Command Invalid:[2] Invalid query'
+
+        records = []
+        for name in formats:
+            if qdDev.setFormat(name).status != TLqdStatus.PASS:
+                continue
+            params = TLqdVideoFormatParameters()
+            outputs = qdDev.outCommandBurst([tag.shortTag + '?'
+                                             for tag in tags])
+            for tag, value in zip(tags, outputs):
+                if value.find(badQuery) < 0: # Valid query?
+                    try:
+                        params.__dict__[tag.longTag] = tag.type(value)
+                    except ValueError:
+                        pass
+            codes = qdDev.getFormatCodes(params)
+            records.append((name, codes))
+
+        nameLength = max([len(name) for name, codes in records] + [1])
+        self.formats = numpy.zeros(len(records), self.dtype(nameLength))
+        for index in range(len(records)):
+            name, codes = records[index]
+            record = self.formats[index]
+            record['name'] = name
+            for tag in TLqdVideoFormatParameters.tags:
+                record[tag.longTag] = float(codes.get(tag.shortTag, 'nan'))
+        self.version = qdDev.getVersion()
+        self.indexes = {}
+        return self
+
+    def save(self, fileName):
+
+        """Save the catalogue
+
+        @param self the TLqdFormatCatalog object
+        @param fileName Local .npz file"""
+
+        import numpy
+
+        numpy.savez_compressed(fileName, formats=self.formats,
+                               version=numpy.array(self.version or ''))
+
+    def load(self, fileName):
+
+        """Load a saved catalogue
+
+        @param self the TLqdFormatCatalog object
+        @param fileName Local .npz file
+        @return self"""
+
+        import numpy
+
+        data = numpy.load(fileName)
+        self.formats = data['formats']
+        self.version = str(data['version'])
+        data.close()
+        self.indexes = {}
+        return self
+
+    ## @cond
+    def index(self, column):
+        if column not in self.indexes:
+            import numpy
+            values = self.formats[column]
+            # NaN sorts last, so cut it off
+            order = numpy.argsort(values, kind='mergesort')
+            order = order[:numpy.count_nonzero(~numpy.isnan(values))]
+            self.indexes[column] = (order, values[order])
+        return self.indexes[column]
+
+    def code(self, column, value):
+        for tag in TLqdVideoFormatParameters.tags:
+            if tag.longTag == column:
+                code = TLqdVideoFormatParameters().getCode(tag.type, value)
+                if code is None:
+                    raise RuntimeError('Invalid ' + column + ': ' +
+                                       str(value))
+                return float(code)
+        raise RuntimeError('Unknown format parameter: ' + column)
+    ## @endcond
+
+    def select(self, **conditions):
+
+        """Find the formats matching all conditions
+
+        @param self the TLqdFormatCatalog object
+        @param conditions Parameter name equal to a value, or to a
+            (low, high) tuple for an inclusive range where either end can
+            be None
+        @return NumPy structured array of matching formats"""
+
+        import numpy
+
+        matches = None
+        for column in conditions:
+            order, values = self.index(column)
+            condition = conditions[column]
+            if isinstance(condition, tuple):
+                low, high = condition
+            else:
+                low = high = condition
+            first = 0
+            if low is not None:
+                first = numpy.searchsorted(values, self.code(column, low),
+                                           'left')
+            last = len(values)
+            if high is not None:
+                last = numpy.searchsorted(values, self.code(column, high),
+                                          'right')
+            found = order[first:last]
+            if matches is None:
+                matches = numpy.sort(found)
+            else:
+                matches = numpy.intersect1d(matches, found)
+        if matches is None:
+            return self.formats
+        return self.formats[matches]
+
+    def names(self, **conditions):
+
+        """Find the names of the formats matching all conditions
+
+        See select for the conditions
+
+        @param self the TLqdFormatCatalog object
+        @param conditions Parameter name equal to a value, or a (low, high)
+            range
+        @return list of format names"""
+
+        return [str(name) for name in self.select(**conditions)['name']]
+
+    def parameters(self, name):
+
+        """Get the parameters of one format
+
+        @param self the TLqdFormatCatalog object
+        @param name Format name
+        @return dictionary of parameter name to value, without the ones
+            the format doesn't have"""
+
+        import math
+
+        found = self.formats[self.formats['name'] == name]
+        if len(found) == 0:
+            raise RuntimeError('Unknown format: ' + str(name))
+        ret = {}
+        for tag in TLqdVideoFormatParameters.tags:
+            value = float(found[0][tag.longTag])
+            if not math.isnan(value):
+                ret[tag.longTag] = value
+        return ret
+
+def TLqdOpenFormatCatalog(qdDev, directory, rebuild=False):
+
+    """Load or build the format catalogue for an instrument's firmware
+
+    See @ref TLqdFormatCatalog for details
+
+    @param qdDev Interface to quantumdata instrument
+    @param directory Local folder the catalogue files are kept in
+    @param rebuild Set to build the catalogue even if there is one
+    @return TLqdFormatCatalog"""
+
+    return TLqdFormatCatalog(directory).open(qdDev, rebuild)
+
+class TLqdTimingCalculator(object):
+    """@brief Video timing and link bandwidth calculator
+
+    Works out, without an instrument, the pixel clock, blanking, TMDS
+    character rate, the lowest FRL rate that carries a format and the DSC
+    bits per pixel that fit, for many formats at once. Formats are CTA-861
+    VICs from the vicTimings table, TLqdVideoFormatParameters, or the
+    structured array from TLqdFormatCatalog.select.
+
+    FRL capacity is the lane rate times the number of lanes, less 16b18b
+    coding and a fixed fraction for FEC, map and super block overhead.
+    Over FRL, blanking is counted at a third of the bits of active video.
+    This is an estimate, not the line-by-line calculation of the HDMI 2.1
+    specification, so formats close to a limit should still be checked on
+    the instrument.
+
+    Needs NumPy."""
+
+    ## CTA-861 VIC to (horizontal active, vertical active, horizontal total,
+    # vertical total, frame rate, interlaced, pixel clock in MHz)
+    vicTimings = {
+        1: (640, 480, 800, 525, 60, False, 25.175),
+        2: (720, 480, 858, 525, 60, False, 27.0),
+        3: (720, 480, 858, 525, 60, False, 27.0),
+        4: (1280, 720, 1650, 750, 60, False, 74.25),
+        5: (1920, 1080, 2200, 1125, 30, True, 74.25),
+        6: (1440, 480, 1716, 525, 30, True, 27.0),
+        7: (1440, 480, 1716, 525, 30, True, 27.0),
+        16: (1920, 1080, 2200, 1125, 60, False, 148.5),
+        17: (720, 576, 864, 625, 50, False, 27.0),
+        18: (720, 576, 864, 625, 50, False, 27.0),
+        19: (1280, 720, 1980, 750, 50, False, 74.25),
+        20: (1920, 1080, 2640, 1125, 25, True, 74.25),
+        21: (1440, 576, 1728, 625, 25, True, 27.0),
+        22: (1440, 576, 1728, 625, 25, True, 27.0),
+        31: (1920, 1080, 2640, 1125, 50, False, 148.5),
+        32: (1920, 1080, 2750, 1125, 24, False, 74.25),
+        33: (1920, 1080, 2640, 1125, 25, False, 74.25),
+        34: (1920, 1080, 2200, 1125, 30, False, 74.25),
+        63: (1920, 1080, 2200, 1125, 120, False, 297.0),
+        64: (1920, 1080, 2640, 1125, 100, False, 297.0),
+        93: (3840, 2160, 5500, 2250, 24, False, 297.0),
+        94: (3840, 2160, 5280, 2250, 25, False, 297.0),
+        95: (3840, 2160, 4400, 2250, 30, False, 297.0),
+        96: (3840, 2160, 5280, 2250, 50, False, 594.0),
+        97: (3840, 2160, 4400, 2250, 60, False, 594.0),
+        98: (4096, 2160, 5500, 2250, 24, False, 297.0),
+        99: (4096, 2160, 5280, 2250, 25, False, 297.0),
+        100: (4096, 2160, 4400, 2250, 30, False, 297.0),
+        101: (4096, 2160, 5280, 2250, 50, False, 594.0),
+        102: (4096, 2160, 4400, 2250, 60, False, 594.0),
+        103: (3840, 2160, 5500, 2250, 24, False, 297.0),
+        104: (3840, 2160, 5280, 2250, 25, False, 297.0),
+        105: (3840, 2160, 4400, 2250, 30, False, 297.0),
+        106: (3840, 2160, 5280, 2250, 50, False, 594.0),
+        107: (3840, 2160, 4400, 2250, 60, False, 594.0),
+        117: (3840, 2160, 5280, 2250, 100, False, 1188.0),
+        118: (3840, 2160, 4400, 2250, 120, False, 1188.0),
+        119: (3840, 2160, 5280, 2250, 100, False, 1188.0),
+        120: (3840, 2160, 4400, 2250, 120, False, 1188.0),
+        194: (7680, 4320, 11000, 4500, 24, False, 1188.0),
+        195: (7680, 4320, 10800, 4400, 25, False, 1188.0),
+        196: (7680, 4320, 9000, 4400, 30, False, 1188.0),
+        197: (7680, 4320, 11000, 4500, 48, False, 2376.0),
+        198: (7680, 4320, 10800, 4400, 50, False, 2376.0),
+        199: (7680, 4320, 9000, 4400, 60, False, 2376.0),
+        200: (7680, 4320, 10560, 4500, 100, False, 4752.0),
+        201: (7680, 4320, 8800, 4500, 120, False, 4752.0),
+        }
+
+    ## FRL rate to (lanes, Gbps per lane)
+    frlRates = {1: (3, 3), 2: (3, 6), 3: (4, 6), 4: (4, 8), 5: (4, 10),
+                6: (4, 12)}
+
+    ## Highest TMDS character rate in Hz
+    maxCharacterRate = 600e6
+
+    ## TMDS character rate in Hz above which scrambling is needed
+    scramblingRate = 340e6
+
+    def __init__(self, frlOverhead=0.03):
+
+        """Create a timing calculator
+
+        @param self the TLqdTimingCalculator object
+        @param frlOverhead Fraction of the FRL payload lost to FEC, map and
+            super block overhead"""
+
+        ## @param frlOverhead Fraction of the FRL payload lost to overhead
+        self.frlOverhead = frlOverhead
+
+    ## @cond
+    def formatColumns(self, formats):
+        # Gather per format values into lists, in the order of columns
+        columns = ['vic', 'hActive', 'vActive', 'hTotal', 'vTotal',
+                   'frameRate', 'interlaced', 'pixelClock', 'bitDepth',
+                   'sampling']
+        if hasattr(formats, 'dtype') and formats.dtype.names:
+            return columns, self.catalogColumns(formats)
+
+        rows = []
+        for format in formats:
+            if isinstance(format, TLqdVideoFormatParameters):
+                rows.append(self.parameterRow(format))
+            else:
+                vic = int(format)
+                if vic not in self.vicTimings:
+                    raise RuntimeError('Unknown VIC: ' + str(vic))
+                hActive, vActive, hTotal, vTotal, frameRate, interlaced, \
+                    pixelClock = self.vicTimings[vic]
+                rows.append([vic, hActive, vActive, hTotal, vTotal,
+                             frameRate, interlaced, pixelClock * 1e6,
+                             float('nan'), float('nan')])
+        return columns, [list(values) for values in zip(*rows)] or \
+            [[] for column in columns]
+
+    def parameterRow(self, format):
+        def number(value):
+            if value is None:
+                return float('nan')
+            return float(value)
+        pixelClock = format.PixelRate
+        if pixelClock and pixelClock < 100000:
+            # Reported in MHz
+            pixelClock = pixelClock * 1e6
+        if not pixelClock and format.HorizontalTotal and \
+            format.VerticalTotal and format.FrameRate:
+            pixelClock = format.HorizontalTotal * format.VerticalTotal * \
+                format.FrameRate
+        sampling = format.SamplingMode
+        if sampling is not None:
+            sampling = sampling.key
+        return [number(format.VideoIdentificationCode),
+                number(format.HorizontalResolution),
+                number(format.VerticalResolution),
+                number(format.HorizontalTotal),
+                number(format.VerticalTotal), number(format.FrameRate),
+                format.ScanType is not None and
+                format.ScanType == TLqdScanType.Interlaced,
+                number(pixelClock), number(format.NumberBitsPerColor),
+                number(sampling)]
+
+    def catalogColumns(self, formats):
+        import numpy
+        pixelClock = formats['PixelRate'].copy()
+        pixelClock[pixelClock < 100000] *= 1e6
+        missing = numpy.isnan(pixelClock)
+        pixelClock[missing] = (formats['HorizontalTotal'] *
+                               formats['VerticalTotal'] *
+                               formats['FrameRate'])[missing]
+        return [formats['VideoIdentificationCode'],
+                formats['HorizontalResolution'],
+                formats['VerticalResolution'], formats['HorizontalTotal'],
+                formats['VerticalTotal'], formats['FrameRate'],
+                formats['ScanType'] == TLqdScanType.Interlaced.value,
+                pixelClock, formats['NumberBitsPerColor'],
+                formats['SamplingMode']]
+
+    def capacity(self, frlRate):
+        lanes, gbps = self.frlRates[frlRate]
+        return lanes * gbps * 1e9 * 16 / 18 * (1 - self.frlOverhead)
+    ## @endcond
+
+    def calculate(self, formats, bitDepth=None, sampling=None,
+                  maxFrlRate=6, dscBpp=None):
+
+        """Calculate timing and bandwidth for formats
+
+        @param self the TLqdTimingCalculator object
+        @param formats List of VICs and TLqdVideoFormatParameters, or a
+            structured array from TLqdFormatCatalog
+        @param bitDepth Optional bits per component, a number or one per
+            format; defaults to the format's own, or 8
+        @param sampling Optional TLqdSubsampling for all formats; defaults
+            to the format's own, or RGB 4:4:4
+        @param maxFrlRate Highest FRL rate (1-6) to consider
+        @param dscBpp Optional compressed bits per pixel to find the FRL
+            rate for
+        @return NumPy structured array, one record per format, with 'vic',
+            'hActive', 'vActive', 'hTotal', 'vTotal', 'hBlank', 'vBlank',
+            'frameRate', 'interlaced', 'pixelClock' in Hz, 'bitDepth',
+            'sampling' key, 'bitsPerPixel', 'characterRate' in Hz,
+            'scrambling' and 'tmds' flags, 'frlRate' (lowest FRL rate
+            carrying the format uncompressed, -1 if none up to maxFrlRate)
+            and 'frlLanes', 'dscMinBpp', 'dscMaxBpp' at maxFrlRate,
+            'dscFeasible', and 'dscFrlRate' for dscBpp (-1 if none)"""
+
+        import numpy
+
+        names, values = self.formatColumns(formats)
+        columns = dict(zip(names, [numpy.asarray(value, numpy.float64)
+                                   for value in values]))
+        count = len(columns['pixelClock'])
+
+        depth = columns['bitDepth']
+        if bitDepth is not None:
+            depth = numpy.broadcast_to(numpy.asarray(bitDepth, numpy.float64),
+                                       (count,)).copy()
+        depth = numpy.where(numpy.isnan(depth) | (depth < 8), 8, depth)
+
+        key = columns['sampling']
+        if sampling is not None:
+            key = numpy.full(count, float(sampling.key))
+        key = numpy.where(numpy.isnan(key), TLqdSubsampling.RGB444.key, key)
+        is422 = key == TLqdSubsampling.SS422.key
+        is420 = key == TLqdSubsampling.SS420.key
+
+        pixelClock = columns['pixelClock']
+        # 4:2:2 always uses a 12 bit container
+        bitsPerPixel = numpy.where(is422, 24,
+                                   numpy.where(is420, depth * 1.5, depth * 3))
+        characterRate = numpy.where(is422, pixelClock,
+                                    pixelClock * depth / 8.0)
+        characterRate = numpy.where(is420, characterRate / 2, characterRate)
+        # Active pixels at full rate and blanking at a third, when the
+        # line layout is known
+        hActive = columns['hActive']
+        hTotal = columns['hTotal']
+        known = ~(numpy.isnan(hActive) | numpy.isnan(hTotal))
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            active = numpy.where(known, hActive / hTotal, 1)
+        blankBits = pixelClock * (1 - active) * bitsPerPixel / 3
+        bitRate = pixelClock * active * bitsPerPixel + blankBits
+
+        frlRate = numpy.full(count, -1)
+        for rate in sorted(self.frlRates, reverse=True):
+            if rate <= maxFrlRate:
+                frlRate = numpy.where(bitRate <= self.capacity(rate), rate,
+                                      frlRate)
+        lanes = numpy.array([0] + [self.frlRates[rate][0]
+                                   for rate in sorted(self.frlRates)])
+        frlLanes = lanes[numpy.maximum(frlRate, 0)]
+
+        # DSC 1.2 bits per pixel limits for each sampling
+        dscMinBpp = numpy.where(is422, 7, numpy.where(is420, 6, 8))
+        dscLimit = numpy.where(is422, depth * 2,
+                               numpy.where(is420, depth * 1.5, depth * 3))
+        dscMaxBpp = numpy.zeros(count)
+        if maxFrlRate in self.frlRates:
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                fits = (self.capacity(maxFrlRate) - blankBits) / \
+                    (pixelClock * active)
+            # DSC bits per pixel are in sixteenths
+            dscMaxBpp = numpy.minimum(numpy.floor(fits * 16) / 16, dscLimit)
+
+        dscFrlRate = numpy.full(count, -1)
+        if dscBpp is not None:
+            for rate in sorted(self.frlRates, reverse=True):
+                if rate <= maxFrlRate:
+                    dscFrlRate = numpy.where(
+                        pixelClock * active * dscBpp + blankBits <=
+                        self.capacity(rate), rate, dscFrlRate)
+            dscFrlRate = numpy.where((dscBpp < dscMinBpp) |
+                                     (dscBpp > dscLimit), -1, dscFrlRate)
+
+        ret = numpy.zeros(count, [('vic', 'f8'), ('hActive', 'f8'),
+            ('vActive', 'f8'), ('hTotal', 'f8'), ('vTotal', 'f8'),
+            ('hBlank', 'f8'), ('vBlank', 'f8'), ('frameRate', 'f8'),
+            ('interlaced', '?'), ('pixelClock', 'f8'), ('bitDepth', 'f8'),
+            ('sampling', 'i4'), ('bitsPerPixel', 'f8'),
+            ('characterRate', 'f8'), ('scrambling', '?'), ('tmds', '?'),
+            ('frlRate', 'i4'), ('frlLanes', 'i4'), ('dscMinBpp', 'f8'),
+            ('dscMaxBpp', 'f8'), ('dscFeasible', '?'),
+            ('dscFrlRate', 'i4')])
+        for name in ['vic', 'hActive', 'vActive', 'hTotal', 'vTotal',
+                     'frameRate', 'pixelClock']:
+            ret[name] = columns[name]
+        ret['interlaced'] = columns['interlaced'] > 0
+        ret['hBlank'] = columns['hTotal'] - columns['hActive']
+        ret['vBlank'] = columns['vTotal'] - columns['vActive']
+        ret['bitDepth'] = depth
+        ret['sampling'] = key
+        ret['bitsPerPixel'] = bitsPerPixel
+        ret['characterRate'] = characterRate
+        ret['scrambling'] = characterRate > self.scramblingRate
+        ret['tmds'] = characterRate <= self.maxCharacterRate
+        ret['frlRate'] = frlRate
+        ret['frlLanes'] = frlLanes
+        ret['dscMinBpp'] = dscMinBpp
+        ret['dscMaxBpp'] = dscMaxBpp
+        ret['dscFeasible'] = dscMaxBpp >= dscMinBpp
+        ret['dscFrlRate'] = dscFrlRate
+        return ret
+
+def TLqdCalculateTiming(formats, bitDepth=None, sampling=None, maxFrlRate=6,
+                        dscBpp=None):
+
+    """Calculate video timing and link bandwidth without an instrument
+
+    See @ref TLqdTimingCalculator for details
+
+    @param formats List of VICs and TLqdVideoFormatParameters, or a
+        structured array from TLqdFormatCatalog
+    @param bitDepth Optional bits per component
+    @param sampling Optional TLqdSubsampling
+    @param maxFrlRate Highest FRL rate (1-6) to consider
+    @param dscBpp Optional compressed bits per pixel to find the FRL rate for
+    @return NumPy structured array, one record per format"""
+
+    return TLqdTimingCalculator().calculate(formats, bitDepth, sampling,
+                                            maxFrlRate, dscBpp)
+
+class TLqdFormatEvent(object):
+    """@brief Change of the received format seen by TLqdFormatWatcher"""
+
+    def __init__(self, kind, time, previous, current, settleTime):
+
+        """Create a format change event
+
+        @param self the TLqdFormatEvent object
+        @param kind What changed, one of TLqdFormatWatcher.kinds
+        @param time Time the change was first seen, in seconds since the
+            epoch
+        @param previous Settled value before the change
+        @param current Settled value after the change
+        @param settleTime Seconds from the first change seen until the new
+            value was first seen"""
+
+        ## @param kind What changed, one of TLqdFormatWatcher.kinds
+        self.kind = kind
+        ## @param time Time the change was first seen
+        self.time = time
+        ## @param previous Settled value before the change
+        self.previous = previous
+        ## @param current Settled value after the change
+        self.current = current
+        ## @param settleTime Seconds until the new value was first seen
+        self.settleTime = settleTime
+
+    def __str__(self):
+        """Represent the event as a string
+
+        @param self the TLqdFormatEvent object"""
+
+        return '%s: %s -> %s (settled in %.3f s)' % (
+            self.kind, self.previous, self.current, self.settleTime)
+
+class TLqdFormatWatcher(object):
+    """@brief Watches the received format for changes
+
+    Polls the received format, the scrambling state and optionally the AVI
+    infoframe and GCP, sending the queries together each time. When the
+    readings change and then stay the same for settlePolls polls, an event
+    is made for each kind of value that differs from before the change. A
+    change that goes back to the old values before settling makes no
+    events.
+
+    Polling uses the instrument connection it is given, so give it a
+    connection of its own, such as another TLqdConnectSsh, when tests or
+    other commands run at the same time."""
+
+    ## Kinds of change: resolution is (horizontal, vertical, scan type
+    # code), colorSpace is (signal type code, sampling code), avi and gcp
+    # are octets
+    kinds = ['resolution', 'colorSpace', 'bitDepth', 'vic', 'scrambling',
+             'avi', 'gcp']
+
+    def __init__(self, qdDev, interval=0.1, settlePolls=3, infoframes=True):
+
+        """Create a format watcher
+
+        @param self the TLqdFormatWatcher object
+        @param qdDev Interface to quantumdata instrument used for polling
+        @param interval Seconds between the start of each poll
+        @param settlePolls Number of polls a new reading must last to count
+            as settled
+        @param infoframes Set to also watch the AVI infoframe and GCP"""
+
+        import threading
+
+        ## @param qdDev Interface to quantumdata instrument used for polling
+        self.qdDev = qdDev
+        ## @param interval Seconds between the start of each poll
+        self.interval = interval
+        ## @param settlePolls Polls a new reading must last
+        self.settlePolls = settlePolls
+        ## @param infoframes Watch the AVI infoframe and GCP
+        self.infoframes = infoframes
+        ## @param events TLqdFormatEvent list, oldest first
+        self.events = []
+        ## @param current Settled readings, by kind, or None before the
+        # first poll
+        self.current = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.running = False
+        self.thread = None
+        self.changeStart = None
+        self.candidate = None
+        self.candidateStart = None
+        self.candidateCount = 0
+
+    ## @cond
+    def read(self):
+        cmds = [TLqdApiTag + 'get_received_format',
+                TLqdApiTag + 'get_scrambling']
+        if self.infoframes:
+            cmds = cmds + [TLqdApiTag + 'infoframe AVI',
+                           TLqdApiTag + 'infoframe GCP']
+        outputs = self.qdDev.commandBurst(cmds)
+
+        format = self.qdDev.parseFormat(outputs[0])
+        def code(type, value):
+            if value is None:
+                return None
+            return format.getCode(type, value)
+        ret = {'resolution': (format.HorizontalResolution,
+                              format.VerticalResolution,
+                              code(TLqdScanType, format.ScanType)),
+               'colorSpace': (code(InputColorSpace, format.SignalType),
+                              code(InputSubsampling, format.SamplingMode)),
+               'bitDepth': format.NumberBitsPerColor,
+               'vic': format.VideoIdentificationCode,
+               'scrambling': outputs[1] == '1',
+               'avi': None, 'gcp': None}
+        if self.infoframes:
+            for kind, output in [('avi', outputs[2]), ('gcp', outputs[3])]:
+                result, decoded, octets = \
+                    self.qdDev.compileInfoframeResult(output)
+                if result:
+                    ret[kind] = tuple(octets)
+        return ret
+    ## @endcond
+
+    def poll(self):
+
+        """Take one reading
+
+        @param self the TLqdFormatWatcher object
+        @return list of TLqdFormatEvent for a change that just settled"""
+
+        from time import time
+
+        now = time()
+        reading = self.read()
+        if self.current is None:
+            self.current = reading
+            return []
+        if self.changeStart is None:
+            if reading == self.current:
+                return []
+            self.changeStart = now
+        if reading == self.candidate:
+            self.candidateCount = self.candidateCount + 1
+        else:
+            self.candidate = reading
+            self.candidateStart = now
+            self.candidateCount = 1
+        if self.candidateCount < self.settlePolls:
+            return []
+
+        events = []
+        for kind in self.kinds:
+            if self.candidate[kind] != self.current[kind]:
+                events.append(TLqdFormatEvent(
+                    kind, self.changeStart, self.current[kind],
+                    self.candidate[kind],
+                    self.candidateStart - self.changeStart))
+        self.current = self.candidate
+        self.changeStart = None
+        self.candidate = None
+        with self.lock:
+            self.events.extend(events)
+        return events
+
+    ## @cond
+    def begin(self):
+        with self.lock:
+            if self.running:
+                raise RuntimeError('Format watcher is already polling')
+            self.running = True
+
+    def loop(self, count=None, duration=None, kinds=None, callback=None):
+        from time import sleep, time
+
+        end = None
+        if duration is not None:
+            end = time() + duration
+        ret = []
+        polls = 0
+        try:
+            while not self.stopped.is_set() and \
+                (count is None or polls < count) and \
+                (end is None or time() < end):
+                start = time()
+                events = self.poll()
+                polls = polls + 1
+                ret.extend(events)
+                for event in events:
+                    if callback is not None:
+                        callback(event)
+                if kinds is not None and \
+                    len([event for event in events if event.kind in kinds]):
+                    break
+                wait = self.interval - (time() - start)
+                if wait > 0:
+                    sleep(wait)
+        finally:
+            with self.lock:
+                self.running = False
+                self.stopped.clear()
+        return ret
+    ## @endcond
+
+    def run(self, count=None, duration=None, kinds=None, callback=None):
+
+        """Poll until stopped, or until a change settles
+
+        @param self the TLqdFormatWatcher object
+        @param count Optional number of polls
+        @param duration Optional number of seconds to poll for
+        @param kinds Optional list of kinds; polling stops once a change
+            of one of them settles
+        @param callback Optional function called with each TLqdFormatEvent
+        @return list of TLqdFormatEvent made while running"""
+
+        self.begin()
+        return self.loop(count, duration, kinds, callback)
+
+    def waitForChange(self, kinds=None, timeout=None):
+
+        """Wait for the received format to change and settle
+
+        Use after asking the source to change mode, instead of sleeping
+        for a fixed time
+
+        @param self the TLqdFormatWatcher object
+        @param kinds Optional list of kinds to wait for, defaults to any
+        @param timeout Optional number of seconds to wait
+        @return list of TLqdFormatEvent, empty on timeout"""
+
+        if self.current is None:
+            self.poll()
+        return self.run(duration=timeout, kinds=kinds or self.kinds)
+
+    def start(self, callback=None):
+
+        """Poll in a background thread until stop is called
+
+        Raises RuntimeError if run or a background thread is already
+        polling
+
+        @param self the TLqdFormatWatcher object
+        @param callback Optional function called with each TLqdFormatEvent,
+            from the background thread"""
+
+        import threading
+
+        self.begin()
+        self.thread = threading.Thread(target=self.loop,
+                                       kwargs={'callback': callback})
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+
+        """Stop polling
+
+        Stops the background thread, or a run in another thread. Does
+        nothing when nothing is polling.
+
+        @param self the TLqdFormatWatcher object"""
+
+        with self.lock:
+            if self.running:
+                self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+def TLqdWatchFormat(qdDev, duration, interval=0.1, settlePolls=3,
+                    infoframes=True):
+
+    """Watch the received format for changes for a time
+
+    See @ref TLqdFormatWatcher for details
+
+    @param qdDev Interface to quantumdata instrument used for polling
+    @param duration Number of seconds to watch
+    @param interval Seconds between polls
+    @param settlePolls Number of polls a new reading must last
+    @param infoframes Set to also watch the AVI infoframe and GCP
+    @return list of TLqdFormatEvent"""
+
+    watcher = TLqdFormatWatcher(qdDev, interval, settlePolls, infoframes)
+    return watcher.run(duration=duration)
+
+class TLqdInfoframeData(object):
+    """@brief Infoframe or packet fields decoded from octets
+
+    Made by TLqdDecodeInfoframe. Fields the octets are too short for are
+    zero."""
+
+    __slots__ = ['octets']
+
+    ## Packet type in the first header octet
+    packetType = None
+
+    ## @cond
+    @classmethod
+    def headerLength(cls, values):
+        # Header and checksum octets before PB1, or 0 if the values don't
+        # start with a full header: the type, a length the values hold
+        # and a checksum that sums the infoframe to zero
+        if len(values) < 4 or values[0] != cls.packetType:
+            return 0
+        end = 4 + (values[2] & 31)
+        if len(values) < end or sum(values[:end]) % 256:
+            return 0
+        return 4
+
+    def decode(self, payload):
+        pass
+
+    def fields(self):
+        names = []
+        for cls in reversed(type(self).__mro__):
+            for name in getattr(cls, '__slots__', []):
+                if name != 'octets':
+                    names.append(name)
+        return names
+    ## @endcond
+
+    def __str__(self):
+        """Represent the fields as a string
+
+        @param self the TLqdInfoframeData object"""
+
+        return ', '.join([name + ': ' + str(getattr(self, name))
+                          for name in self.fields()])
+
+class TLqdAviData(TLqdInfoframeData):
+    """@brief AVI infoframe fields
+
+    @param colorSpace Y: 0 RGB, 1 YCbCr 4:2:2, 2 YCbCr 4:4:4, 3 YCbCr 4:2:0
+    @param activeFormatPresent A0
+    @param barInfo B
+    @param scanInfo S
+    @param colorimetry C
+    @param pictureAspect M
+    @param activeFormatAspect R
+    @param itContent ITC
+    @param extendedColorimetry EC
+    @param quantization Q: 0 default, 1 limited, 2 full
+    @param nonUniformScaling SC
+    @param vic Video identification code
+    @param ycQuantization YQ: 0 limited, 1 full
+    @param contentType CN
+    @param pixelRepetition PR"""
+
+    __slots__ = ['colorSpace', 'activeFormatPresent', 'barInfo', 'scanInfo',
+                 'colorimetry', 'pictureAspect', 'activeFormatAspect',
+                 'itContent', 'extendedColorimetry', 'quantization',
+                 'nonUniformScaling', 'vic', 'ycQuantization', 'contentType',
+                 'pixelRepetition']
+
+    packetType = 0x82
+
+    ## @cond
+    def decode(self, p):
+        self.colorSpace = (p[0] >> 5) & 7
+        self.activeFormatPresent = (p[0] >> 4) & 1
+        self.barInfo = (p[0] >> 2) & 3
+        self.scanInfo = p[0] & 3
+        self.colorimetry = (p[1] >> 6) & 3
+        self.pictureAspect = (p[1] >> 4) & 3
+        self.activeFormatAspect = p[1] & 15
+        self.itContent = (p[2] >> 7) & 1
+        self.extendedColorimetry = (p[2] >> 4) & 7
+        self.quantization = (p[2] >> 2) & 3
+        self.nonUniformScaling = p[2] & 3
+        self.vic = p[3]
+        self.ycQuantization = (p[4] >> 6) & 3
+        self.contentType = (p[4] >> 4) & 3
+        self.pixelRepetition = p[4] & 15
+    ## @endcond
+
+class TLqdAudioData(TLqdInfoframeData):
+    """@brief Audio infoframe fields
+
+    @param codingType CT
+    @param channelCount Number of channels
+    @param sampleFrequency SF
+    @param sampleSize SS
+    @param channelAllocation CA
+    @param levelShift LSV in dB
+    @param downmixInhibit DM_INH"""
+
+    __slots__ = ['codingType', 'channelCount', 'sampleFrequency',
+                 'sampleSize', 'channelAllocation', 'levelShift',
+                 'downmixInhibit']
+
+    packetType = 0x84
+
+    ## @cond
+    def decode(self, p):
+        self.codingType = (p[0] >> 4) & 15
+        self.channelCount = (p[0] & 7) + 1
+        self.sampleFrequency = (p[1] >> 2) & 7
+        self.sampleSize = p[1] & 3
+        self.channelAllocation = p[3]
+        self.levelShift = (p[4] >> 3) & 15
+        self.downmixInhibit = (p[4] >> 7) & 1
+    ## @endcond
+
+class TLqdDrmData(TLqdInfoframeData):
+    """@brief Dynamic range and mastering infoframe fields
+
+    @param eotf EOTF: 0 SDR, 1 HDR, 2 SMPTE ST 2084, 3 HLG
+    @param descriptorId Static metadata descriptor ID
+    @param primaries Display primaries as three (x, y) pairs, in units of
+        0.00002
+    @param whitePoint White point (x, y), in units of 0.00002
+    @param maxLuminance Maximum display mastering luminance in cd/m2
+    @param minLuminance Minimum display mastering luminance in units of
+        0.0001 cd/m2
+    @param maxCll Maximum content light level in cd/m2
+    @param maxFall Maximum frame average light level in cd/m2"""
+
+    __slots__ = ['eotf', 'descriptorId', 'primaries', 'whitePoint',
+                 'maxLuminance', 'minLuminance', 'maxCll', 'maxFall']
+
+    packetType = 0x87
+
+    ## @cond
+    def decode(self, p):
+        def word(index):
+            return p[index] | (p[index + 1] << 8)
+        self.eotf = p[0] & 7
+        self.descriptorId = p[1] & 7
+        self.primaries = tuple([(word(index), word(index + 2))
+                                for index in (2, 6, 10)])
+        self.whitePoint = (word(14), word(16))
+        self.maxLuminance = word(18)
+        self.minLuminance = word(20)
+        self.maxCll = word(22)
+        self.maxFall = word(24)
+    ## @endcond
+
+class TLqdVendorData(TLqdInfoframeData):
+    """@brief Vendor specific infoframe fields
+
+    Which fields apply depends on the OUI: HDMI 1.4 (0x000C03) has the
+    video format, HDMI VIC and 3D structure; HDMI Forum (0xC45DD8) has the
+    version, 3D valid, ALLM and CCBPC; AMD FreeSync (0x00001A) has the VRR
+    state and refresh range. HDMI 2.1 VRR itself is signalled in the VTEM
+    packet, see updateVtem, not in an infoframe.
+
+    @param oui IEEE OUI
+    @param videoFormat HDMI_Video_Format
+    @param hdmiVic HDMI VIC
+    @param structure3d 3D_Structure
+    @param version HF-VSIF version
+    @param valid3d 3D_Valid
+    @param allm ALLM_Mode
+    @param ccbpc CCBPC
+    @param vrrSupported FreeSync supported
+    @param vrrEnabled FreeSync enabled
+    @param vrrActive FreeSync active
+    @param minRefreshRate FreeSync minimum refresh rate in Hz
+    @param maxRefreshRate FreeSync maximum refresh rate in Hz"""
+
+    __slots__ = ['oui', 'videoFormat', 'hdmiVic', 'structure3d', 'version',
+                 'valid3d', 'allm', 'ccbpc', 'vrrSupported', 'vrrEnabled',
+                 'vrrActive', 'minRefreshRate', 'maxRefreshRate']
+
+    packetType = 0x81
+
+    ## HDMI 1.4 OUI
+    hdmiOui = 0x000C03
+    ## HDMI Forum OUI
+    hdmiForumOui = 0xC45DD8
+    ## AMD OUI
+    amdOui = 0x00001A
+
+    ## @cond
+    def decode(self, p):
+        self.oui = p[0] | (p[1] << 8) | (p[2] << 16)
+        for name in self.__slots__[1:]:
+            setattr(self, name, 0)
+        if self.oui == self.hdmiOui:
+            self.videoFormat = (p[3] >> 5) & 7
+            if self.videoFormat == 1:
+                self.hdmiVic = p[4]
+            elif self.videoFormat == 2:
+                self.structure3d = (p[4] >> 4) & 15
+        elif self.oui == self.hdmiForumOui:
+            self.version = p[3]
+            self.valid3d = p[4] & 1
+            self.allm = (p[4] >> 1) & 1
+            self.ccbpc = (p[4] >> 4) & 15
+        elif self.oui == self.amdOui:
+            self.vrrSupported = p[5] & 1
+            self.vrrEnabled = (p[5] >> 1) & 1
+            self.vrrActive = (p[5] >> 2) & 1
+            self.minRefreshRate = p[6]
+            self.maxRefreshRate = p[7]
+    ## @endcond
+
+class TLqdGcpData(TLqdInfoframeData):
+    """@brief General control packet fields
+
+    @param setAvMute Set_AVMUTE
+    @param clearAvMute Clear_AVMUTE
+    @param colorDepth Bits per component from CD, 0 if not indicated
+    @param packingPhase PP
+    @param defaultPhase Default_Phase"""
+
+    __slots__ = ['setAvMute', 'clearAvMute', 'colorDepth', 'packingPhase',
+                 'defaultPhase']
+
+    packetType = 0x03
+
+    ## CD code to bits per component
+    colorDepths = {4: 8, 5: 10, 6: 12, 7: 16}
+
+    ## @cond
+    @classmethod
+    def headerLength(cls, values):
+        # A GCP has no checksum and HB1 and HB2 are zero
+        if len(values) < 3 or values[0] != cls.packetType or any(values[1:3]):
+            return 0
+        return 3
+
+    def decode(self, p):
+        self.setAvMute = p[0] & 1
+        self.clearAvMute = (p[0] >> 4) & 1
+        self.colorDepth = self.colorDepths.get(p[1] & 15, 0)
+        self.packingPhase = (p[1] >> 4) & 15
+        self.defaultPhase = p[2] & 1
+    ## @endcond
+
+## @cond
+TLqdInfoframeDataTypes = {'AVI': TLqdAviData, 'Audio': TLqdAudioData,
+                          'DRM': TLqdDrmData, 'VS': TLqdVendorData,
+                          'GCP': TLqdGcpData}
+## @endcond
+
+def TLqdDecodeInfoframe(octets, infoframe=None, base=16):
+
+    """Decode infoframe or packet octets
+
+    The octets are either the whole packet, starting with the header, or
+    the payload starting with PB1 (SB0 for a GCP). They're taken as a whole
+    packet only if the header is complete: for an infoframe the length
+    octet fits the octets and the checksum is right, for a GCP HB1 and HB2
+    are zero. So a payload whose first octet happens to be a packet type
+    is still decoded as a payload.
+
+    @param octets List of octets, as strings from getInfoframe or numbers
+    @param infoframe Optional infoframe ID ('AVI', 'Audio', 'DRM', 'VS' or
+        'GCP'), found from the header by default
+    @param base Base of octet strings
+    @return TLqdInfoframeData subclass, or None if the type isn't known"""
+
+    values = []
+    for octet in octets:
+        if isinstance(octet, int):
+            values.append(octet)
+        else:
+            values.append(int(str(octet).strip(), base))
+
+    cls = TLqdInfoframeDataTypes.get(infoframe)
+    if cls is None:
+        for candidate in TLqdInfoframeDataTypes.values():
+            if candidate.headerLength(values):
+                cls = candidate
+        if cls is None:
+            return None
+
+    payload = values[cls.headerLength(values):] + [0] * 28
+
+    ret = cls()
+    ret.octets = values
+    ret.decode(payload)
+    return ret
+
+class TLqdInfoframeTimeline(object):
+    """@brief Timeline of infoframe and packet changes
+
+    Polls infoframes with getAllInfoframes and keeps an entry only when an
+    infoframe's octets change, including when it appears or goes away.
+    Each entry is (time, infoframe ID, octets as bytes or None, decoded
+    TLqdInfoframeData or None), oldest first. Octets of a type
+    TLqdDecodeInfoframe doesn't know, such as 'SPD', are kept with None
+    as decoded. Fields are looked up by the names of the TLqdInfoframeData
+    subclass, such as 'maxLuminance' of 'DRM' or 'vic' of 'AVI'.
+
+    Octets that can't be parsed, and failed polls in run, are kept in
+    errors instead of stopping the polling.
+
+    As with TLqdFormatWatcher, give it a connection of its own when other
+    commands run at the same time."""
+
+    def __init__(self, qdDev, infoframes=None, interval=0.1):
+
+        """Create an infoframe timeline
+
+        @param self the TLqdInfoframeTimeline object
+        @param qdDev Interface to quantumdata instrument used for polling
+        @param infoframes Optional list of infoframe IDs, defaults to
+            TLqdInstrument.allInfoframes
+        @param interval Seconds between the start of each poll"""
+
+        import threading
+
+        ## @param qdDev Interface to quantumdata instrument used for polling
+        self.qdDev = qdDev
+        ## @param infoframes Infoframe IDs polled
+        self.infoframes = list(infoframes or TLqdInstrument.allInfoframes)
+        ## @param interval Seconds between the start of each poll
+        self.interval = interval
+        ## @param entries List of (time, infoframe ID, octets, decoded)
+        self.entries = []
+        ## @param first Time of the first poll, or None
+        self.first = None
+        ## @param last Time of the latest poll, or None
+        self.last = None
+        ## @param errors List of (time, error message)
+        self.errors = []
+        self.latest = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.running = False
+        self.thread = None
+
+    def poll(self):
+
+        """Read the infoframes once and keep the ones that changed
+
+        @param self the TLqdInfoframeTimeline object
+        @return list of new entries"""
+
+        from time import time
+
+        now = time()
+        readings = self.qdDev.getAllInfoframes(self.infoframes)
+        added = []
+        errors = []
+        for name in self.infoframes:
+            result, decoded, octets = readings[name]
+            key = None
+            data = None
+            if result and len(octets):
+                try:
+                    values = [int(str(octet).strip(), 16)
+                              for octet in octets]
+                    key = bytes(bytearray(values))
+                    data = TLqdDecodeInfoframe(values, name)
+                except ValueError as e:
+                    errors.append((now, name + ': ' + str(e)))
+                    continue
+            if name in self.latest and self.latest[name] == key:
+                continue
+            self.latest[name] = key
+            added.append((now, name, key, data))
+
+        with self.lock:
+            if self.first is None:
+                self.first = now
+            self.last = now
+            self.entries.extend(added)
+            self.errors.extend(errors)
+        return added
+
+    ## @cond
+    def begin(self):
+        with self.lock:
+            if self.running:
+                raise RuntimeError('Infoframe timeline is already polling')
+            self.running = True
+
+    def loop(self, count=None, duration=None):
+        from time import sleep, time
+
+        end = None
+        if duration is not None:
+            end = time() + duration
+        polls = 0
+        try:
+            while not self.stopped.is_set() and \
+                (count is None or polls < count) and \
+                (end is None or time() < end):
+                start = time()
+                try:
+                    self.poll()
+                except Exception as e:
+                    with self.lock:
+                        self.errors.append((start, str(e)))
+                polls = polls + 1
+                wait = self.interval - (time() - start)
+                if wait > 0:
+                    sleep(wait)
+        finally:
+            with self.lock:
+                self.running = False
+                self.stopped.clear()
+        return polls
+    ## @endcond
+
+    def run(self, count=None, duration=None):
+
+        """Poll until stopped
+
+        @param self the TLqdInfoframeTimeline object
+        @param count Optional number of polls
+        @param duration Optional number of seconds to poll for
+        @return number of polls"""
+
+        self.begin()
+        return self.loop(count, duration)
+
+    def start(self):
+
+        """Poll in a background thread until stop is called
+
+        Raises RuntimeError if run or a background thread is already
+        polling
+
+        @param self the TLqdInfoframeTimeline object"""
+
+        import threading
+
+        self.begin()
+        self.thread = threading.Thread(target=self.loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+
+        """Stop polling
+
+        Stops the background thread, or a run in another thread. Does
+        nothing when nothing is polling.
+
+        @param self the TLqdInfoframeTimeline object"""
+
+        with self.lock:
+            if self.running:
+                self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    ## @cond
+    def value(self, entry, field):
+        if field is None:
+            return entry[2]
+        if entry[3] is None:
+            return None
+        return getattr(entry[3], field, None)
+    ## @endcond
+
+    def history(self, infoframe, field=None):
+
+        """Get the values an infoframe or one of its fields took
+
+        @param self the TLqdInfoframeTimeline object
+        @param infoframe Infoframe ID, such as 'DRM'
+        @param field Optional field name, such as 'maxLuminance'; the
+            octets by default
+        @return list of (time, value), with a new value each time, None
+            while the infoframe wasn't received"""
+
+        with self.lock:
+            entries = [entry for entry in self.entries
+                       if entry[1] == infoframe]
+        ret = []
+        for entry in entries:
+            value = self.value(entry, field)
+            if len(ret) == 0 or ret[-1][1] != value:
+                ret.append((entry[0], value))
+        return ret
+
+    def changes(self, infoframe, field=None, since=None, until=None):
+
+        """Find when an infoframe or one of its fields changed
+
+        @param self the TLqdInfoframeTimeline object
+        @param infoframe Infoframe ID, such as 'DRM'
+        @param field Optional field name, such as 'maxLuminance'
+        @param since Optional earliest time, in seconds since the epoch
+        @param until Optional latest time
+        @return list of (time, previous value, new value)"""
+
+        ret = []
+        history = self.history(infoframe, field)
+        for index in range(1, len(history)):
+            when = history[index][0]
+            if (since is None or when >= since) and \
+                (until is None or when <= until):
+                ret.append((when, history[index-1][1], history[index][1]))
+        return ret
+
+    def valueAt(self, infoframe, when, field=None):
+
+        """Get an infoframe or field value at a time
+
+        @param self the TLqdInfoframeTimeline object
+        @param infoframe Infoframe ID
+        @param when Time in seconds since the epoch
+        @param field Optional field name
+        @return value, None if not received or before the first poll"""
+
+        ret = None
+        for start, value in self.history(infoframe, field):
+            if start > when:
+                break
+            ret = value
+        return ret
+
+    def stable(self, infoframe, field=None, seconds=10):
+
+        """Check that an infoframe or field didn't change recently
+
+        @param self the TLqdInfoframeTimeline object
+        @param infoframe Infoframe ID, such as 'AVI'
+        @param field Optional field name, such as 'vic'
+        @param seconds How far back from the latest poll to look
+        @return True if polling covered the whole time, the value was
+            received and it didn't change"""
+
+        if self.first is None or self.last - self.first < seconds:
+            return False
+        since = self.last - seconds
+        return len(self.changes(infoframe, field, since)) == 0 and \
+            self.valueAt(infoframe, self.last, field) is not None
+
+def TLqdRecordInfoframes(qdDev, duration, infoframes=None, interval=0.1):
+
+    """Record infoframe changes for a time
+
+    See @ref TLqdInfoframeTimeline for details
+
+    @param qdDev Interface to quantumdata instrument used for polling
+    @param duration Number of seconds to record
+    @param infoframes Optional list of infoframe IDs
+    @param interval Seconds between polls
+    @return TLqdInfoframeTimeline"""
+
+    timeline = TLqdInfoframeTimeline(qdDev, infoframes, interval)
+    timeline.run(duration=duration)
+    return timeline
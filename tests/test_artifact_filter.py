@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+
+"""Tests for choosing which artifacts to transfer"""
+
+import ftplib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'lib'))
+
+from tlqd import *
+
+def entry(name, size=3000, folder=False):
+    if folder:
+        return 'drwxr-xr-x 2 qd qd       4096 Jan  1 12:00 ' + name
+    return '-rw-r--r-- 1 qd qd %10d Jan  1 12:00 %s' % (size, name)
+
+LISTING = [entry('summary.csv', 100), entry('raw.bin', 99000000),
+           entry('small.bin', 1000), entry('video', folder=True),
+           entry('report 1.txt')] + \
+    [entry('frame%d.bmp' % index, 6220800) for index in [10, 9, 1, 2, 11]]
+
+class FakeFtp(object):
+    """FTP connection serving a dictionary of directory listings"""
+
+    tree = {}
+    retrieved = []
+
+    def __init__(self, host=None, user=None, passwd=None):
+        pass
+
+    def login(self, user=None, passwd=None):
+        pass
+
+    def retrlines(self, cmd, callback):
+        for line in self.tree[cmd[len('LIST '):]]:
+            callback(line)
+
+    def retrbinary(self, cmd, callback):
+        FakeFtp.retrieved.append(cmd[len('RETR '):])
+        callback(b('data'))
+
+    def quit(self):
+        pass
+
+class StubInstrument(TLqdInstrument):
+    """Instrument with only the FTP settings"""
+
+    def __init__(self):
+        self.ipAddr = '127.0.0.1'
+        self.user = 'qd'
+        self.passwd = 'qd'
+
+class SelectTest(unittest.TestCase):
+
+    def testAll(self):
+        selected = TLqdArtifactFilter().select(LISTING)
+        self.assertEqual(len(selected), 9)
+        self.assertTrue('report 1.txt' in selected)
+        self.assertFalse('video' in selected)
+
+    def testInclude(self):
+        artifactFilter = TLqdArtifactFilter(include=['*.csv', 'logs/*'])
+        self.assertEqual(artifactFilter.select(LISTING), set(['summary.csv']))
+        self.assertEqual(artifactFilter.select([entry('x.log')],
+                                               relative='logs/'),
+                         set(['x.log']))
+
+    def testExclude(self):
+        artifactFilter = TLqdArtifactFilter(exclude=['*.bmp', 'raw.*'])
+        self.assertEqual(artifactFilter.select(LISTING),
+                         set(['summary.csv', 'small.bin', 'report 1.txt']))
+
+    def testSizeLimit(self):
+        artifactFilter = TLqdArtifactFilter(include=['*.bin'])
+        artifactFilter.addSizeLimit('*.bin', 50 * 1024 * 1024)
+        self.assertEqual(artifactFilter.select(LISTING), set(['small.bin']))
+        self.assertEqual(artifactFilter.select(LISTING, True),
+                         set(['small.bin', 'raw.bin']))
+
+        artifactFilter = TLqdArtifactFilter(include=['*.bin'])
+        artifactFilter.addSizeLimit('*.bin', 50 * 1024 * 1024, False)
+        self.assertEqual(artifactFilter.select(LISTING, True),
+                         set(['small.bin']))
+
+    def testMaxFrames(self):
+        # Numbers in names are compared by value
+        artifactFilter = TLqdArtifactFilter(include=['*.bmp'], maxFrames=3)
+        self.assertEqual(artifactFilter.select(LISTING),
+                         set(['frame1.bmp', 'frame2.bmp', 'frame9.bmp']))
+        self.assertEqual(artifactFilter.select(LISTING, True),
+                         set(['frame1.bmp', 'frame2.bmp', 'frame9.bmp']))
+
+    def testIncludeOnFail(self):
+        artifactFilter = TLqdArtifactFilter(include=['*.csv'], maxFrames=1,
+                                            includeOnFail=True)
+        self.assertEqual(artifactFilter.select(LISTING),
+                         set(['summary.csv']))
+        self.assertEqual(len(artifactFilter.select(LISTING, True)), 9)
+
+    def testFrameKey(self):
+        artifactFilter = TLqdArtifactFilter()
+        names = ['f10_2.bmp', 'f9_10.bmp', 'f9_9.bmp', 'f1.bmp']
+        self.assertEqual(sorted(names, key=artifactFilter.frameKey),
+                         ['f1.bmp', 'f9_9.bmp', 'f9_10.bmp', 'f10_2.bmp'])
+
+class TransferTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.ftp = ftplib.FTP
+        ftplib.FTP = FakeFtp
+        FakeFtp.retrieved = []
+        FakeFtp.tree = {
+            '/r': [entry('video', folder=True), entry('logs', folder=True),
+                   entry('summary.csv')],
+            '/r/video': [entry('frame%d.bmp' % index)
+                         for index in [10, 9, 1, 2, 11]],
+            '/r/logs': [entry('x.log')]}
+
+    def tearDown(self):
+        ftplib.FTP = self.ftp
+        shutil.rmtree(self.folder)
+
+    def files(self):
+        ret = []
+        for root, dirs, files in os.walk(self.folder):
+            for name in files:
+                ret.append(os.path.relpath(os.path.join(root, name),
+                                           self.folder).replace(os.sep, '/'))
+        return sorted(ret)
+
+    def testEmptyFolderSkipped(self):
+        artifactFilter = TLqdArtifactFilter(include=['*.csv', '*.bmp'],
+                                            maxFrames=2)
+        StubInstrument().transferResults(self.folder, '/r', artifactFilter)
+        self.assertEqual(self.files(), ['summary.csv', 'video/frame1.bmp',
+                                         'video/frame2.bmp'])
+        self.assertFalse(os.path.exists(os.path.join(self.folder, 'logs')))
+        self.assertEqual(sorted(FakeFtp.retrieved),
+                         ['/r/summary.csv', '/r/video/frame1.bmp',
+                          '/r/video/frame2.bmp'])
+
+    def testRelativePatterns(self):
+        artifactFilter = TLqdArtifactFilter(include=['logs/*'])
+        StubInstrument().transferResults(self.folder, '/r', artifactFilter)
+        self.assertEqual(self.files(), ['logs/x.log'])
+        self.assertFalse(os.path.exists(os.path.join(self.folder, 'video')))
+
+    def testNoFilter(self):
+        StubInstrument().transferResults(self.folder, '/r')
+        self.assertEqual(len(self.files()), 7)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+"""Tests for pipelined command bursts"""
+
+import os
+import socket
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'lib'))
+
+from tlqd import *
+
+class StubChannel(object):
+    """Channel returning canned output in the chunks given
+
+    Each group of chunks is read by one call of receive, which stops at
+    the timeout that follows the group"""
+
+    def __init__(self, groups):
+        self.groups = [list(group) for group in groups]
+        self.sent = b('')
+        self.closed = False
+
+    def send(self, data):
+        self.sent = self.sent + data
+
+    def recv(self, size):
+        if len(self.groups) == 0:
+            raise socket.timeout()
+        if len(self.groups[0]) == 0:
+            del self.groups[0]
+            raise socket.timeout()
+        return self.groups[0].pop(0).encode('utf-8')
+
+    def close(self):
+        self.closed = True
+
+class StubInstrument(TLqdInstrument):
+    """Instrument connected to a StubChannel"""
+
+    def __init__(self, groups):
+        self.ipAddr = 'stub'
+        self.prompt = 'qd> '
+        self.channel = StubChannel(groups)
+        self.client = None
+
+class CommandBurstTest(unittest.TestCase):
+
+    def testOutputSplitOnPrompts(self):
+        qdDev = StubInstrument([
+            ['HRES?\r\n19', '20\r\nqd', '> VRE'],
+            [],
+            ['S?\r\n1080\r\nqd> ', 'ver\r\n'],
+            ['a\r\nb\r\nqd> ']])
+        outputs = qdDev.commandBurst(['HRES?', 'VRES?', 'ver'])
+        self.assertEqual(outputs, ['1920', '1080', 'a\nb'])
+        self.assertEqual(qdDev.channel.sent, b('HRES?\nVRES?\nver\n'))
+
+    def testTimeoutOnMissingPrompt(self):
+        qdDev = StubInstrument([['HRES?\r\n1920\r\nqd> VRES?\r\n']])
+        qdDev.burstTimeout = 0.05
+        with self.assertRaises(RuntimeError) as raised:
+            qdDev.commandBurst(['HRES?', 'VRES?'])
+        self.assertIn('Output for 1 of 2 commands', str(raised.exception))
+
+    def testLowStorage(self):
+        qdDev = StubInstrument([['HRES?\r\nERROR: Very Low '],
+                                ['Storage Space\r\nqd> ']])
+        with self.assertRaises(RuntimeError) as raised:
+            qdDev.commandBurst(['HRES?', 'VRES?'])
+        self.assertIn('Very Low Storage Space', str(raised.exception))
+        self.assertIsNone(qdDev.channel)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+"""Tests for CRC parsing and the CRC sampler"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'lib'))
+
+from tlqd import *
+
+def videoCrc(red, green=0x10, blue=0x20):
+    return 'Rx Video:\ncrc_R_Cr %x\ncrc_G_Y %x\ncrc_B_Cb %x' % \
+        (red, green, blue)
+
+class StubInstrument(TLqdInstrument):
+    """Instrument answering CRC queries from a list of outputs"""
+
+    def __init__(self, outputs=None):
+        self.cardUsed = None
+        self.outputs = list(outputs or [])
+        self.bursts = []
+
+    def commandBurst(self, cmds):
+        self.bursts.append(cmds)
+        ret = self.outputs[:len(cmds)]
+        del self.outputs[:len(cmds)]
+        return ret
+
+class ParseCrcTest(unittest.TestCase):
+
+    def setUp(self):
+        self.qdDev = StubInstrument()
+
+    def testRxVideo(self):
+        crc = self.qdDev.parseCrc('Rx Video:\ncrc_R_Cr 1a2b\ncrc_G_Y 3c4d\n'
+                                  'crc_B_Cb 5e6f\n')
+        self.assertEqual(crc.option, 'Rx Video')
+        self.assertEqual((crc.crcRCr, crc.crcGY, crc.crcBCb),
+                         ('1a2b', '3c4d', '5e6f'))
+        self.assertEqual((crc.crc0, crc.crc1, crc.crc2), (0, 0, 0))
+
+    def testDscAndOneDecoder(self):
+        crc = self.qdDev.parseCrc('Rx DSC CRC:\ncrc_0 11\ncrc_1 22\n'
+                                  'crc_2 33\nRx HW DSC Video:\n'
+                                  'crc_R_Cr aa\ncrc_G_Y bb\ncrc_B_Cb cc\n')
+        self.assertEqual(crc.option, 'Rx DSC CRC')
+        self.assertEqual((crc.crc0, crc.crc1, crc.crc2), ('11', '22', '33'))
+        self.assertEqual((crc.crcRCr, crc.crcGY, crc.crcBCb),
+                         ('aa', 'bb', 'cc'))
+
+    def testBothDecodersIgnored(self):
+        crc = self.qdDev.parseCrc('Rx SW DSC Video:\ncrc_R_Cr aa\n'
+                                  'Rx HW DSC Video:\ncrc_R_Cr bb\n')
+        self.assertEqual(crc.crcRCr, 'aa')
+
+    def testDscNotEnabled(self):
+        crc = self.qdDev.parseCrc('Rx DSC CRC:\nDSC is not enabled\n\n')
+        self.assertEqual(crc.dscStatus, 'DSC is not enabled')
+
+class CrcSamplerTest(unittest.TestCase):
+
+    def sampler(self, reds, size=8):
+        qdDev = StubInstrument()
+        sampler = TLqdCrcSampler(qdDev, 0, size=size)
+        for index, red in enumerate(reds):
+            sampler.add(qdDev.parseCrc(videoCrc(red)), float(index))
+        return sampler
+
+    def testWrapAround(self):
+        sampler = self.sampler([1, 2, 3, 4, 5, 6], size=4)
+        self.assertEqual(sampler.count, 6)
+        samples = sampler.samples()
+        self.assertEqual([when for when, crc in samples],
+                         [2.0, 3.0, 4.0, 5.0])
+        self.assertEqual([crc[0] for when, crc in samples], [3, 4, 5, 6])
+        self.assertEqual(samples[0][1], (3, 0x10, 0x20, 0, 0, 0))
+
+    def testMissingComponents(self):
+        sampler = self.sampler([])
+        sampler.add(TLqdCrcParameters('', None, 'zz', 0, '1f', None, None,
+                                      ''), 0.0)
+        self.assertEqual(sampler.samples()[0][1], (31, -1, -1, -1, -1, 0))
+
+    def testStatistics(self):
+        sampler = self.sampler([1, 1, 1, 2, 1, 1, 3, 3, 3, 3], size=10)
+        histogram = sampler.histogram()
+        self.assertEqual(histogram[(1, 0x10, 0x20, 0, 0, 0)], 5)
+        self.assertEqual(histogram[(3, 0x10, 0x20, 0, 0, 0)], 4)
+        self.assertEqual([(when, crc[0], length) for when, crc, length
+                          in sampler.runLengths()],
+                         [(0.0, 1, 3), (3.0, 2, 1), (4.0, 1, 2),
+                          (6.0, 3, 4)])
+        self.assertEqual([(when, crc[0]) for when, crc, length
+                          in sampler.glitches()], [(3.0, 2)])
+        self.assertEqual([(when, old[0], new[0]) for when, old, new
+                          in sampler.changes()],
+                         [(3.0, 1, 2), (4.0, 2, 1), (6.0, 1, 3)])
+
+    def testStatisticsAfterWrap(self):
+        # The glitch at sample 1 has been overwritten
+        sampler = self.sampler([1, 2, 1, 1, 3, 1, 1], size=5)
+        self.assertEqual([(when, crc[0]) for when, crc, length
+                          in sampler.glitches()], [(4.0, 3)])
+        self.assertEqual(len(sampler.histogram()), 2)
+
+    def testSampleInBatches(self):
+        qdDev = StubInstrument([videoCrc(red) for red in range(10)])
+        sampler = TLqdCrcSampler(qdDev, 0, size=16, batch=4)
+        self.assertEqual(sampler.sample(10), 10)
+        self.assertEqual([len(cmds) for cmds in qdDev.bursts], [4, 4, 2])
+        self.assertEqual(qdDev.bursts[0][0], TLqdApiTag + 'get_crc -p 0')
+        samples = sampler.samples()
+        self.assertEqual([crc[0] for when, crc in samples], list(range(10)))
+        times = [when for when, crc in samples]
+        self.assertEqual(times, sorted(times))
+
+if __name__ == '__main__':
+    unittest.main()
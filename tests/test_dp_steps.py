@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+"""Tests for parsing DP compliance steps files"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'lib'))
+
+from tlqd import *
+
+class StubInstrument(TLqdInstrument):
+    """Instrument that is never connected"""
+
+    def __init__(self):
+        pass
+
+class StepParseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = TLqdDpStepEngine(StubInstrument(), None)
+
+    def testOptionsOnSeparateLines(self):
+        step = self.engine.parse('text: Is the picture. Good. ok. yes. now.\n'
+                                 'button PASS,x y 1 2\n'
+                                 'button FAIL,x y 3 4\n')
+        self.assertEqual(step.options, {'PASS': '1*2', 'FAIL': '3*4'})
+        self.assertEqual(step.description,
+                         [' Is the picture. Good. ok. yes. now.'])
+
+    def testSeveralOptionsOnOneLine(self):
+        step = self.engine.parse('buttons OK,a b 5 6 NO,a b 7 8 '
+                                 'REPLAY,a b 9 10\n')
+        self.assertEqual(step.options,
+                         {'OK': '5*6', 'NO': '7*8', 'REPLAY': '9*10'})
+
+    def testFirstOfEachChoiceWins(self):
+        step = self.engine.parse('PASS,x y 1 2\nPASS,x y 3 4\n')
+        self.assertEqual(step.options, {'PASS': '1*2'})
+
+    def testChoiceInsideWordIgnored(self):
+        step = self.engine.parse('INFO,x y 1 2\n')
+        self.assertEqual(step.options, {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+"""Tests for diff updates of video format parameters"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'lib'))
+
+from tlqd import *
+
+class StubInstrument(TLqdInstrument):
+    """Instrument that keeps format parameters in a dictionary"""
+
+    def __init__(self):
+        self.cardUsed = None
+        self.prompt = ''
+        self.formatSnapshot = None
+        self.values = {'HTOT': '2200'}
+        self.sent = []
+
+    def command(self, cmd):
+        self.sent.append(cmd)
+        parts = cmd.split(' ')
+        if cmd.endswith('?'):
+            if cmd[:-1] in self.values:
+                return self.values[cmd[:-1]]
+            return 'Command Invalid:[2] Invalid query'
+        if len(parts) == 2:
+            self.values[parts[0]] = parts[1]
+        return ''
+
+def horizontalTotal(value):
+    params = TLqdVideoFormatParameters()
+    params.HorizontalTotal = value
+    return params
+
+class FormatSnapshotTest(unittest.TestCase):
+
+    def testDiffSendsOnlyChanges(self):
+        qdDev = StubInstrument()
+        qdDev.updateFormatParameters(horizontalTotal(2300), True)
+        del qdDev.sent[:]
+        qdDev.updateFormatParameters(horizontalTotal(2300), True)
+        self.assertEqual(qdDev.sent, [])
+
+    def testMixedDiffAndPlainUpdates(self):
+        qdDev = StubInstrument()
+        qdDev.updateFormatParameters(horizontalTotal(2300), True)
+        qdDev.updateFormatParameters(horizontalTotal(2200))
+        self.assertIsNone(qdDev.formatSnapshot)
+        qdDev.updateFormatParameters(horizontalTotal(2300), True)
+        self.assertEqual(qdDev.values['HTOT'], '2300')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+"""Tests for decoding infoframes and packets"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'lib'))
+
+from tlqd import *
+
+def infoframe(packetType, version, payload):
+    header = [packetType, version, len(payload)]
+    checksum = (256 - sum(header + payload) % 256) % 256
+    return header + [checksum] + payload
+
+class InfoframeDecodeTest(unittest.TestCase):
+
+    def testAvi(self):
+        # YCbCr 4:4:4, active format, BT.709, 16:9, full range, VIC 16
+        payload = [0x50, 0xA8, 0x08, 0x10, 0x00]
+        data = TLqdDecodeInfoframe(infoframe(0x82, 2, payload + [0] * 8))
+        self.assertTrue(isinstance(data, TLqdAviData))
+        self.assertEqual(data.colorSpace, 2)
+        self.assertEqual(data.activeFormatPresent, 1)
+        self.assertEqual(data.colorimetry, 2)
+        self.assertEqual(data.pictureAspect, 2)
+        self.assertEqual(data.activeFormatAspect, 8)
+        self.assertEqual(data.quantization, 2)
+        self.assertEqual(data.vic, 16)
+        self.assertEqual(data.pixelRepetition, 0)
+
+    def testAviStrings(self):
+        octets = ['%02X' % value
+                  for value in infoframe(0x82, 2, [0x60, 0, 0x80, 97, 0x31])]
+        data = TLqdDecodeInfoframe(octets)
+        self.assertEqual(data.colorSpace, 3)
+        self.assertEqual(data.itContent, 1)
+        self.assertEqual(data.vic, 97)
+        self.assertEqual(data.contentType, 3)
+        self.assertEqual(data.pixelRepetition, 1)
+
+    def testAudio(self):
+        # L-PCM, 8 channels, 48 kHz, 24 bits, CA 0x13, 10 dB, DM_INH
+        data = TLqdDecodeInfoframe(
+            infoframe(0x84, 1, [0x17, 0x0F, 0, 0x13, 0xD0, 0, 0, 0, 0, 0]))
+        self.assertTrue(isinstance(data, TLqdAudioData))
+        self.assertEqual(data.codingType, 1)
+        self.assertEqual(data.channelCount, 8)
+        self.assertEqual(data.sampleFrequency, 3)
+        self.assertEqual(data.sampleSize, 3)
+        self.assertEqual(data.channelAllocation, 0x13)
+        self.assertEqual(data.levelShift, 10)
+        self.assertEqual(data.downmixInhibit, 1)
+
+    def testDrm(self):
+        # ST 2084 with BT.2020 primaries, D65, 1000 and 0.005 cd/m2
+        words = [35400, 14600, 8500, 39850, 6550, 2300, 15635, 16450,
+                 1000, 50, 1000, 400]
+        payload = [2, 0]
+        for word in words:
+            payload += [word & 255, word >> 8]
+        data = TLqdDecodeInfoframe(infoframe(0x87, 1, payload))
+        self.assertTrue(isinstance(data, TLqdDrmData))
+        self.assertEqual(data.eotf, 2)
+        self.assertEqual(data.descriptorId, 0)
+        self.assertEqual(data.primaries,
+                         ((35400, 14600), (8500, 39850), (6550, 2300)))
+        self.assertEqual(data.whitePoint, (15635, 16450))
+        self.assertEqual(data.maxLuminance, 1000)
+        self.assertEqual(data.minLuminance, 50)
+        self.assertEqual(data.maxCll, 1000)
+        self.assertEqual(data.maxFall, 400)
+
+    def testHdmiVsif(self):
+        data = TLqdDecodeInfoframe(
+            infoframe(0x81, 1, [0x03, 0x0C, 0x00, 0x20, 0x01]))
+        self.assertTrue(isinstance(data, TLqdVendorData))
+        self.assertEqual(data.oui, TLqdVendorData.hdmiOui)
+        self.assertEqual(data.videoFormat, 1)
+        self.assertEqual(data.hdmiVic, 1)
+        self.assertEqual(data.allm, 0)
+
+        data = TLqdDecodeInfoframe(
+            infoframe(0x81, 1, [0x03, 0x0C, 0x00, 0x40, 0x60]))
+        self.assertEqual(data.videoFormat, 2)
+        self.assertEqual(data.hdmiVic, 0)
+        self.assertEqual(data.structure3d, 6)
+
+    def testHfVsif(self):
+        data = TLqdDecodeInfoframe(
+            infoframe(0x81, 1, [0xD8, 0x5D, 0xC4, 0x01, 0x23]))
+        self.assertEqual(data.oui, TLqdVendorData.hdmiForumOui)
+        self.assertEqual(data.version, 1)
+        self.assertEqual(data.valid3d, 1)
+        self.assertEqual(data.allm, 1)
+        self.assertEqual(data.ccbpc, 2)
+        self.assertEqual(data.videoFormat, 0)
+
+    def testFreeSync(self):
+        data = TLqdDecodeInfoframe(
+            infoframe(0x81, 1, [0x1A, 0x00, 0x00, 0, 0, 0x07, 48, 144]))
+        self.assertEqual(data.oui, TLqdVendorData.amdOui)
+        self.assertEqual(data.vrrSupported, 1)
+        self.assertEqual(data.vrrEnabled, 1)
+        self.assertEqual(data.vrrActive, 1)
+        self.assertEqual(data.minRefreshRate, 48)
+        self.assertEqual(data.maxRefreshRate, 144)
+
+    def testGcp(self):
+        data = TLqdDecodeInfoframe([0x03, 0, 0, 0x10, 0x25, 0x01, 0, 0])
+        self.assertTrue(isinstance(data, TLqdGcpData))
+        self.assertEqual(data.setAvMute, 0)
+        self.assertEqual(data.clearAvMute, 1)
+        self.assertEqual(data.colorDepth, 10)
+        self.assertEqual(data.packingPhase, 2)
+        self.assertEqual(data.defaultPhase, 1)
+
+    def testPayloadOnly(self):
+        data = TLqdDecodeInfoframe([0x01, 0x11, 0, 0x13, 0], 'Audio')
+        self.assertEqual(data.channelCount, 2)
+        self.assertEqual(data.sampleFrequency, 4)
+        self.assertEqual(data.channelAllocation, 0x13)
+
+    def testPayloadStartingWithPacketType(self):
+        # PB1 0x84 is a packet type, but there's no full header
+        payload = [0x84, 0x08, 0x01, 0x10, 0x00]
+        self.assertEqual(TLqdDecodeInfoframe(payload), None)
+
+        data = TLqdDecodeInfoframe(payload, 'AVI')
+        self.assertEqual(data.colorSpace, 4)
+        self.assertEqual(data.scanInfo, 0)
+        self.assertEqual(data.vic, 16)
+
+    def testBadChecksum(self):
+        octets = infoframe(0x82, 2, [0x40, 0, 0, 16, 0])
+        octets[3] ^= 1
+        self.assertEqual(TLqdDecodeInfoframe(octets), None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+"""Tests for indexing compliance and debug logs"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'lib'))
+
+from tlqd import *
+
+LOG = '''12:00:00.100 boot
+12:00:01 Link Training start
+12:00:01.200 AUX write DPCD 100
+[ignored] aux read 202
+[3723.5] Note_1: sink capabilities read
+12:00:02.000 Fail_1: link training fail
+12:00:03.000 AUX read after
+HPD toggled
+Note_2: done'''
+
+class LogAnalyzerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.fileName = os.path.join(self.folder, 'dp.log')
+        with open(self.fileName, 'wb') as file:
+            file.write(b(LOG.replace('\n', '\r\n')))
+        self.log = TLqdLogAnalyzer(self.fileName, [('hpd', r'HPD\s+toggled')])
+
+    def tearDown(self):
+        self.log.close()
+        shutil.rmtree(self.folder)
+
+    def testCounts(self):
+        # A line matching several kinds is an entry of each
+        self.assertEqual(self.log.counts(),
+                         {'ltStart': 1, 'aux': 3, 'note': 2, 'fail': 1,
+                          'ltFail': 1, 'hpd': 1})
+        kinds = [entry[2] for entry in self.log.entries]
+        self.assertEqual(kinds, ['ltStart', 'aux', 'aux', 'note', 'fail',
+                                 'ltFail', 'aux', 'hpd', 'note'])
+
+    def testLines(self):
+        self.assertEqual(self.log.lines('aux'),
+                         ['12:00:01.200 AUX write DPCD 100',
+                          '[ignored] aux read 202',
+                          '12:00:03.000 AUX read after'])
+        self.assertEqual(self.log.lines('hpd'), ['HPD toggled'])
+        self.assertEqual(self.log.lines('note')[-1], 'Note_2: done')
+        self.assertEqual(self.log.lines('warn'), [])
+
+    def testFindRange(self):
+        fail = self.log.find('fail')[0]
+        self.assertEqual(len(self.log.find('aux', fail)), 1)
+        self.assertEqual(len(self.log.find('aux', 0, fail)), 2)
+        self.assertEqual(len(self.log.find('aux', fail[1])), 1)
+        self.assertEqual(self.log.find('aux', fail, fail), [])
+
+    def testFindBoundaries(self):
+        # Start is inclusive and end exclusive, by line start
+        aux = self.log.find('aux')
+        self.assertEqual(self.log.find('aux', aux[1]), aux[1:])
+        self.assertEqual(self.log.find('aux', aux[1][0] + 1), aux[2:])
+        self.assertEqual(self.log.find('aux', 0, aux[1]), aux[:1])
+        self.assertEqual(self.log.find('aux', 0, aux[1][0] + 1), aux[:2])
+        self.assertEqual(self.log.find('aux', len(LOG) * 2), [])
+
+    def testBetween(self):
+        self.assertEqual(self.log.between('aux', 'ltStart', 'fail'),
+                         ['12:00:01.200 AUX write DPCD 100',
+                          '[ignored] aux read 202'])
+        self.assertEqual(len(self.log.between('aux', 'ltStart', 'warn')), 3)
+        self.assertEqual(self.log.between('aux', 'warn', 'fail'), [])
+
+    def testTime(self):
+        times = [self.log.time(entry) for entry in self.log.entries]
+        self.assertEqual(times[0], 43201)
+        self.assertAlmostEqual(times[1], 43201.2)
+        self.assertEqual(times[2], None)
+        self.assertAlmostEqual(times[3], 3723.5)
+        self.assertAlmostEqual(times[4], 43202.0)
+        self.assertEqual(times[-1], None)
+
+    def testResult(self):
+        result = self.log.result()
+        self.assertEqual(result.status, TLqdStatus.FAIL)
+        self.assertEqual(result.errors,
+                         ['12:00:02.000 Fail_1: link training fail'])
+        self.assertEqual(len(result.info), 2)
+
+    def testEmptyFile(self):
+        fileName = os.path.join(self.folder, 'empty.log')
+        open(fileName, 'wb').close()
+        log = TLqdLogAnalyzer(fileName)
+        self.assertEqual(log.entries, [])
+        self.assertEqual(log.find('aux'), [])
+        self.assertEqual(log.result().status, TLqdStatus.PASS)
+        log.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+"""Tests for progress and ETA reporting"""
+
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'lib'))
+
+from tlqd import *
+
+class FixedModel(TLqdDurationModel):
+    """Duration model estimating ten seconds for every test"""
+
+    def estimate(self, testId, arguments=None):
+        return 10.0
+
+def result(status):
+    return TLqdResult(status, [], [])
+
+class ProgressTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = io.StringIO() if sys.version_info[0] > 2 else \
+            io.BytesIO()
+        plan = [('A', ''), ('B', ''), ('C', '')]
+        self.progress = TLqdProgress(FixedModel(), plan, self.stream)
+        self.table = TLqdResultTable(['test', 'arguments'],
+                                     progress=self.progress)
+
+    def testSkippedRowReplaced(self):
+        self.table.add({'test': 'A', 'arguments': ''},
+                       result(TLqdStatus.PASS))
+        row = self.table.add({'test': 'B', 'arguments': ''},
+                             result(TLqdStatus.SKIPPED))
+        self.assertEqual(self.progress.estimated, 20.0)
+        self.table.add({'test': 'C', 'arguments': ''},
+                       result(TLqdStatus.PASS))
+        self.table.replace(row, result(TLqdStatus.PASS))
+        self.assertEqual(self.progress.done, 3)
+        self.assertEqual(self.progress.estimated, 30.0)
+        self.assertEqual(self.progress.estimatedDone, 30.0)
+        self.assertTrue(self.stream.getvalue().splitlines()[-1].startswith(
+            '3/3 done'))
+
+    def testFinishedRowReplaced(self):
+        row = self.table.add({'test': 'A', 'arguments': ''},
+                             result(TLqdStatus.FAIL))
+        self.table.replace(row, result(TLqdStatus.PASS))
+        self.assertEqual(self.progress.done, 1)
+        self.assertEqual(self.progress.estimatedDone, 10.0)
+
+if __name__ == '__main__':
+    unittest.main()
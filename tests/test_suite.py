@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+"""Tests for running test suites with prerequisites"""
+
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'lib'))
+
+from tlqd import *
+
+class StubInstrument(TLqdInstrument):
+    """Instrument answering each test with a canned status"""
+
+    def __init__(self, statuses):
+        self.cardUsed = None
+        self.timing = {}
+        self.statuses = statuses
+        self.ran = []
+
+def check(qdDev, testId):
+    qdDev.ran.append(testId)
+    status = qdDev.statuses.get(testId, TLqdStatus.PASS)
+    if status is None:
+        raise RuntimeError(testId + ' timed out')
+    return TLqdResult(status, [], [])
+
+class FixedModel(TLqdDurationModel):
+    """Duration model estimating ten seconds for every test"""
+
+    def estimate(self, testId, arguments=None):
+        return 10.0
+
+class SuiteTest(unittest.TestCase):
+
+    def setUp(self):
+        # HF1-12 and HF1-13 need SCDC, HF1-14 needs HF1-13
+        self.suite = TLqdSuite()
+        for testId in ['HF1-12', 'HF1-10', 'HF1-13', 'HF1-14', 'HF1-11',
+                       '7-19']:
+            self.suite.add(testId, check, {'testId': testId})
+        self.suite.addPrerequisites(TLqdSuite.Scdc, ['HF1-12', 'HF1-13'])
+        self.suite.addPrerequisites(['HF1-13'], ['HF1-14'])
+
+    def statuses(self, table):
+        return [(row['test'], row['result'].status) for row in table.rows]
+
+    def testPrerequisitesFirst(self):
+        qdDev = StubInstrument({})
+        table = self.suite.run(qdDev)
+        self.assertEqual(qdDev.ran, ['HF1-10', 'HF1-11', 'HF1-12', 'HF1-13',
+                                     'HF1-14', '7-19'])
+        self.assertEqual(table.counts(), {str(TLqdStatus.PASS): 6})
+
+    def testSkip(self):
+        qdDev = StubInstrument({'HF1-11': TLqdStatus.FAIL})
+        table = self.suite.run(qdDev, TLqdSuite.Skip)
+        self.assertEqual(qdDev.ran, ['HF1-10', 'HF1-11', '7-19'])
+        self.assertEqual(self.statuses(table),
+                         [('HF1-10', TLqdStatus.PASS),
+                          ('HF1-11', TLqdStatus.FAIL),
+                          ('HF1-12', TLqdStatus.SKIPPED),
+                          ('HF1-13', TLqdStatus.SKIPPED),
+                          ('HF1-14', TLqdStatus.SKIPPED),
+                          ('7-19', TLqdStatus.PASS)])
+        self.assertEqual(table.rows[4]['errors'],
+                         ['Prerequisite HF1-13 did not pass'])
+
+    def testException(self):
+        qdDev = StubInstrument({'HF1-10': None})
+        table = self.suite.run(qdDev)
+        self.assertEqual(table.rows[0]['errors'], ['HF1-10 timed out'])
+        self.assertEqual(table.counts(),
+                         {str(TLqdStatus.FAIL): 1, str(TLqdStatus.PASS): 2,
+                          str(TLqdStatus.SKIPPED): 3})
+
+    def testDeprioritise(self):
+        qdDev = StubInstrument({'HF1-11': TLqdStatus.FAIL})
+        table = self.suite.run(qdDev, TLqdSuite.Deprioritise)
+        self.assertEqual(qdDev.ran, ['HF1-10', 'HF1-11', '7-19', 'HF1-12',
+                                     'HF1-13', 'HF1-14'])
+        self.assertEqual(table.counts(), {str(TLqdStatus.FAIL): 1,
+                                          str(TLqdStatus.PASS): 5})
+
+    def testRunAll(self):
+        qdDev = StubInstrument({'HF1-11': TLqdStatus.FAIL})
+        table = self.suite.run(qdDev, TLqdSuite.RunAll)
+        self.assertEqual(len(qdDev.ran), 6)
+        self.assertEqual(table.counts(), {str(TLqdStatus.FAIL): 1,
+                                          str(TLqdStatus.PASS): 5})
+
+    def testRunSkippedAtEnd(self):
+        qdDev = StubInstrument({'HF1-11': TLqdStatus.FAIL,
+                                'HF1-13': TLqdStatus.FAIL})
+        stream = io.StringIO() if sys.version_info[0] > 2 else io.BytesIO()
+        plan = [(entry.testId, entry.describeArgs())
+                for entry in self.suite.tests]
+        progress = TLqdProgress(FixedModel(), plan, stream)
+        table = TLqdResultTable(['test', 'arguments'], progress=progress)
+        self.suite.run(qdDev, TLqdSuite.Skip, True, table)
+
+        self.assertEqual(qdDev.ran, ['HF1-10', 'HF1-11', '7-19', 'HF1-12',
+                                     'HF1-13', 'HF1-14'])
+        # The skipped rows keep their place and get the new results
+        self.assertEqual(self.statuses(table),
+                         [('HF1-10', TLqdStatus.PASS),
+                          ('HF1-11', TLqdStatus.FAIL),
+                          ('HF1-12', TLqdStatus.PASS),
+                          ('HF1-13', TLqdStatus.FAIL),
+                          ('HF1-14', TLqdStatus.PASS),
+                          ('7-19', TLqdStatus.PASS)])
+        self.assertEqual(progress.done, 6)
+        self.assertEqual(progress.estimatedDone, 60.0)
+        self.assertTrue(stream.getvalue().splitlines()[-1].startswith(
+            '6/6 done'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+
+"""Tests for parameter sweeps"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'lib'))
+
+from tlqd import *
+
+class StubInstrument(TLqdInstrument):
+    """Instrument that is never connected"""
+
+    def __init__(self):
+        self.ipAddr = 'stub'
+        self.cardUsed = None
+        self.timing = {}
+
+def failOnVic16(qdDev, vic):
+    if vic == 16:
+        raise RuntimeError('No signal')
+    return TLqdResult(TLqdStatus.PASS, [], [])
+
+class SweepTest(unittest.TestCase):
+
+    def testFailureDoesNotStopSweep(self):
+        sweep = TLqdSweep(failOnVic16)
+        sweep.addAxis('vic', [16, 97, 98])
+        table = sweep.run(StubInstrument())
+        self.assertEqual([row['vic'] for row in table], [16, 97, 98])
+        self.assertEqual([row['status'] for row in table],
+                         [str(TLqdStatus.FAIL), str(TLqdStatus.PASS),
+                          str(TLqdStatus.PASS)])
+        self.assertEqual(table.rows[0]['errors'], ['No signal'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+"""Tests for the video timing and link bandwidth calculator"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'lib'))
+
+from tlqd import *
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+RGB = TLqdSubsampling.RGB444
+SS422 = TLqdSubsampling.SS422
+SS420 = TLqdSubsampling.SS420
+
+# VIC, bits per component, sampling, highest FRL rate, pixel clock and TMDS
+# character rate in MHz, scrambling, TMDS, FRL rate and lanes
+FORMATS = [
+    (16, 8, RGB, 6, 148.5, 148.5, False, True, 1, 3),
+    (97, 8, RGB, 6, 594.0, 594.0, True, True, 2, 3),
+    (97, 10, RGB, 6, 594.0, 742.5, True, False, 3, 4),
+    (97, 10, SS420, 6, 594.0, 371.25, True, True, 2, 3),
+    (97, 12, SS422, 6, 594.0, 594.0, True, True, 2, 3),
+    (118, 8, RGB, 6, 1188.0, 1188.0, True, False, 4, 4),
+    (118, 10, RGB, 6, 1188.0, 1485.0, True, False, 5, 4),
+    (118, 12, RGB, 6, 1188.0, 1782.0, True, False, 6, 4),
+    (118, 12, RGB, 5, 1188.0, 1782.0, True, False, -1, 0),
+    (118, 10, SS420, 6, 1188.0, 742.5, True, False, 3, 4),
+    ]
+
+class CapacityTest(unittest.TestCase):
+
+    def testCapacity(self):
+        calculator = TLqdTimingCalculator()
+        # Lanes times lane rate, less 16b18b coding and 3% overhead
+        for rate, gbps in [(1, 9), (2, 18), (3, 24), (4, 32), (5, 40),
+                           (6, 48)]:
+            self.assertAlmostEqual(calculator.capacity(rate) / 1e9,
+                                   gbps * 16 / 18.0 * 0.97)
+
+    def testOverhead(self):
+        calculator = TLqdTimingCalculator(frlOverhead=0)
+        self.assertAlmostEqual(calculator.capacity(6) / 1e9, 48 * 16 / 18.0)
+
+@unittest.skipIf(numpy is None, 'needs NumPy')
+class CalculateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calculator = TLqdTimingCalculator()
+
+    def testFormats(self):
+        for vic, bitDepth, sampling, maxFrlRate, pixelClock, characterRate, \
+            scrambling, tmds, frlRate, frlLanes in FORMATS:
+            row = self.calculator.calculate([vic], bitDepth, sampling,
+                                            maxFrlRate)[0]
+            context = (vic, bitDepth, sampling, maxFrlRate)
+            self.assertAlmostEqual(row['pixelClock'] / 1e6, pixelClock,
+                                   msg=context)
+            self.assertAlmostEqual(row['characterRate'] / 1e6,
+                                   characterRate, msg=context)
+            self.assertEqual(bool(row['scrambling']), scrambling, context)
+            self.assertEqual(bool(row['tmds']), tmds, context)
+            self.assertEqual(row['frlRate'], frlRate, context)
+            self.assertEqual(row['frlLanes'], frlLanes, context)
+
+    def testBlanking(self):
+        row = self.calculator.calculate([16])[0]
+        self.assertEqual(row['hBlank'], 280)
+        self.assertEqual(row['vBlank'], 45)
+        self.assertEqual(row['bitDepth'], 8)
+        self.assertEqual(row['bitsPerPixel'], 24)
+
+    def testManyFormats(self):
+        rows = self.calculator.calculate([16, 97, 118], 10)
+        self.assertEqual(list(rows['vic']), [16, 97, 118])
+        self.assertEqual(list(rows['frlRate']), [1, 3, 5])
+
+    def testDsc(self):
+        # 8K at 120 Hz only fits compressed
+        row = self.calculator.calculate([201], 10, RGB, 6, dscBpp=8)[0]
+        self.assertEqual(row['frlRate'], -1)
+        self.assertTrue(row['dscFeasible'])
+        self.assertEqual(row['dscMinBpp'], 8)
+        self.assertEqual(row['dscFrlRate'], 6)
+        row = self.calculator.calculate([201], 10, RGB, 6, dscBpp=12)[0]
+        self.assertEqual(row['dscFrlRate'], -1)
+
+    def testUnknownVic(self):
+        self.assertRaises(RuntimeError, self.calculator.calculate, [255])
+
+if __name__ == '__main__':
+    unittest.main()